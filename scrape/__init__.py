@@ -0,0 +1,10 @@
+# The scrapers, run from the root of the repository, e.g.
+#
+#   python -m scrape.fivetools.scrape_spells
+#   python -m scrape.fivetools.scrape_bestiary
+#   python -m scrape.pf2e.forgevtt [pf2e checkout, repository or archive]
+#   python -m scrape.merge_spells file.json ...
+#   python -m scrape.service serve
+#
+# Importing any of their modules only defines things, so the parsers can be
+# used in-process, e.g. from scrape.fivetools.scrape_spells import parse_spell
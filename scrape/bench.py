@@ -0,0 +1,295 @@
+import argparse
+import gc
+import json
+import os
+import pathlib
+import platform
+import re
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from spells_data import filters, search
+
+from .fivetools import parse_bestiary, scrape_spells
+from .fivetools.common import sub_tags
+from .output import RecordWriter
+from .pf2e import forgevtt
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Source books in the formats the scrapers download, so the benchmarks run
+# without the network and always parse the same input.
+FIXTURES = os.path.join(HERE, "fixtures")
+SPELLS = os.path.join(FIXTURES, "5etools", "spells.json")
+BESTIARY = os.path.join(FIXTURES, "5etools", "bestiary.json")
+PF2E = os.path.join(FIXTURES, "pf2e")
+
+BASELINE = os.path.join(HERE, "bench_baseline.json")
+
+# A case is slower than its baseline if it manages this fraction fewer ops
+# per second, as a multiple of the reference's, and uses more memory if its
+# peak or the blocks it retains are this fraction higher.
+THRESHOLD = 0.25
+# Differences in peak memory and in blocks smaller than these are noise.
+MIN_PEAK_CHANGE = 4096
+MIN_BLOCKS_CHANGE = 16
+
+# Each round repeats a case for at least this much CPU time, and the best
+# round counts. CPU rather than wall time keeps other processes out of it.
+MIN_TIME = 0.05
+ROUNDS = 20
+
+def load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+def collect(data, pred, found):
+    if pred(data):
+        found.append(data)
+    if isinstance(data, list):
+        for v in data:
+            collect(v, pred, found)
+    elif isinstance(data, dict):
+        for v in data.values():
+            collect(v, pred, found)
+    return found
+
+def is_table(e):
+    return isinstance(e, dict) and e.get("type") == "table"
+
+def damage_bodies(rank, desc):
+    # The bodies of the @Damage tags in desc, as compile_tag passes them to
+    # compile_damage_body.
+    bodies = []
+    for match in re.finditer(r"@Damage\[", desc):
+        depth = 0
+        for i in range(match.end() - 1, len(desc)):
+            depth += {"[": 1, "]": -1}.get(desc[i], 0)
+            if depth == 0:
+                bodies.append((rank, desc[match.end():i]))
+                break
+    return bodies
+
+def pf2e_sources():
+    sources = []
+    for path in sorted(forgevtt.spell_files(pathlib.Path(PF2E))):
+        system = load(path)["system"]
+        rank = system["level"]["value"]
+        sources.append((rank, system["description"]["value"]))
+    return sources
+
+def write_dataset(path, records, sort_key=None):
+    with RecordWriter(path, sort_key=sort_key) as writer:
+        writer.write_all(records)
+    filters.export(path)
+    search.export(path)
+
+def cases(tmp):
+    """(name, function, [arguments of each call]) of each benchmark."""
+
+    spells = load(SPELLS)["spell"]
+    monsters = load(BESTIARY)["monster"]
+    books = [spells, monsters]
+    pf2e = pf2e_sources()
+
+    traits = [
+        (m[key],) for m in monsters if "_copy" not in m
+        for key in ["trait", "action", "legendary"] if key in m
+    ]
+    damage = [
+        body for rank, desc in pf2e for body in damage_bodies(rank, desc)
+    ]
+
+    def spells_pipeline():
+        parsed = map(scrape_spells.parse_spell, load(SPELLS)["spell"])
+        write_dataset(os.path.join(tmp, "spells.json"), parsed)
+
+    def bestiary_pipeline():
+        parsed = parse_bestiary.parse_json(load(BESTIARY)["monster"])
+        write_dataset(os.path.join(tmp, "bestiary.json"), parsed)
+
+    def pf2e_pipeline():
+        files = forgevtt.spell_files(pathlib.Path(PF2E))
+        write_dataset(
+            os.path.join(tmp, "pf2e_spells.json"),
+            forgevtt.parse_spells(files),
+            sort_key=lambda s: s["name"]
+        )
+
+    return [
+        ("sub_tags", sub_tags,
+            [(s,) for s in collect(books, lambda d: isinstance(d, str), [])]),
+        ("parse_entries", scrape_spells.parse_entries, [(s,) for s in spells]),
+        ("format_table", scrape_spells.format_table,
+            [(t,) for t in collect(spells, is_table, [])]),
+        ("parse_traits", parse_bestiary.parse_traits, traits),
+        ("parse_description", forgevtt.parse_description, pf2e),
+        ("parse_damage_body", forgevtt.parse_damage_body, damage),
+        ("pipeline:spells", spells_pipeline, [()]),
+        ("pipeline:bestiary", bestiary_pipeline, [()]),
+        ("pipeline:pf2e", pf2e_pipeline, [()]),
+    ]
+
+REFERENCE_TAG = re.compile(r"{@\w+ ([^}]*)}")
+REFERENCE_TEXT = json.dumps({
+    "name": "Reference",
+    "entries": ["A {@b bright} streak flashes to a point you choose."] * 8
+})
+
+def reference():
+    """Work of the kind the parsers do, but fixed, so that the speed of the
+    cases can be compared between machines as a multiple of its speed."""
+
+    for _ in range(20):
+        data = json.loads(REFERENCE_TEXT)
+        for entry in data["entries"]:
+            REFERENCE_TAG.sub(r"\1", entry).split()
+
+def run_pass(fn, calls):
+    for args in calls:
+        fn(*args)
+
+def timed_round(fn, calls):
+    # Ops per second over passes taking at least MIN_TIME.
+    passes = 0
+    start = time.process_time()
+    while True:
+        run_pass(fn, calls)
+        passes += 1
+        elapsed = time.process_time() - start
+        if elapsed >= MIN_TIME:
+            return passes * len(calls) / elapsed
+
+def ops_per_sec(fn, calls):
+    """The best ops/sec of a round of fn, and the median of its speed over
+    that of the reference, timed in alternate rounds with it so that a slow
+    spell of the machine slows both."""
+
+    best = 0
+    ratios = []
+    for _ in range(ROUNDS):
+        ref = timed_round(reference, [()])
+        ops = timed_round(fn, calls)
+        best = max(best, ops)
+        ratios.append(ops / ref)
+    return best, statistics.median(ratios)
+
+def memory(fn, calls):
+    """Highest memory use over a pass, above what was in use before it, and
+    how many blocks of memory allocated during it are still retained once
+    it's done, by what each call returned or anything it cached. Python
+    doesn't count every allocation, so this is the nearest tracemalloc
+    gives."""
+
+    tracemalloc.start()
+    try:
+        returned = [fn(*args) for args in calls]
+        peak = tracemalloc.get_traced_memory()[1]
+        # Garbage left in cycles isn't retained, just not yet collected.
+        gc.collect()
+        retained = len(tracemalloc.take_snapshot().traces)
+        del returned
+        return peak, retained
+    finally:
+        tracemalloc.stop()
+
+def measure(fn, calls):
+    # A pass first, so caches are as warm as they are for most of a scrape.
+    run_pass(fn, calls)
+    peak, retained = memory(fn, calls)
+    ops, relative = ops_per_sec(fn, calls)
+    return {
+        "ops": float(f"{ops:.3g}"),
+        "relative": float(f"{relative:.3g}"),
+        "peak": peak,
+        "retained": retained
+    }
+
+def speed_change(result, base):
+    # Relative to the reference, for baselines which have it, so that one
+    # from another machine can be compared with.
+    if "relative" in base:
+        return result["relative"] / base["relative"] - 1
+    return result["ops"] / base["ops"] - 1
+
+def regressions(result, base, change, threshold):
+    found = []
+    if change < -threshold:
+        found.append("slower")
+    if result["peak"] > base["peak"] * (1 + threshold) and \
+        result["peak"] - base["peak"] >= MIN_PEAK_CHANGE:
+        found.append("more memory")
+    # Baselines from before retained blocks were counted have none.
+    if "retained" in base and \
+        result["retained"] > base["retained"] * (1 + threshold) and \
+        result["retained"] - base["retained"] >= MIN_BLOCKS_CHANGE:
+        found.append("more retained blocks")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parsers against the fixtures."
+    )
+    parser.add_argument(
+        "cases",
+        nargs="*",
+        help="only run cases whose names contain one of these"
+    )
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument(
+        "--save",
+        action="store_true",
+        help="record the results as the new baseline"
+    )
+    args = parser.parse_args()
+
+    try:
+        baseline = load(args.baseline)
+    except OSError:
+        baseline = {"cases": {}}
+
+    results = {}
+    flagged = 0
+    print(f"{'case':<20} {'ops/sec':>10} {'baseline':>10} {'change':>7} "
+        f"{'peak KiB':>9} {'retained':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, fn, calls in cases(tmp):
+            if args.cases and not any(c in name for c in args.cases):
+                continue
+            result = measure(fn, calls)
+            results[name] = result
+
+            base = baseline["cases"].get(name)
+            if base is None:
+                change = ""
+                problems = []
+            else:
+                relative = speed_change(result, base)
+                change = f"{relative:+.0%}"
+                problems = regressions(result, base, relative, args.threshold)
+            flagged += bool(problems)
+
+            print(
+                f"{name:<20} {result['ops']:>10,.0f} "
+                f"{base['ops'] if base else 0:>10,.0f} {change:>7} "
+                f"{result['peak'] / 1024:>9,.1f} {result['retained']:>8,}"
+                + ("  " + ", ".join(problems).upper() if problems else "")
+            )
+
+    if args.save:
+        baseline["python"] = platform.python_version()
+        baseline["machine"] = platform.machine()
+        baseline["cases"].update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=4)
+            f.write("\n")
+        print("Saved baseline to", args.baseline)
+    elif flagged:
+        print(f"{flagged} cases regressed by more than {args.threshold:.0%}")
+        exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+import array
+import collections.abc
+import json
+import mmap
+import os
+import struct
+import sys
+
+from spells_data import sidecar
+
+# Compact format for the published datasets, for consumers that load them on
+# every start. Layout, all integers little endian:
+#
+#   magic, u32 header length, header JSON
+#   value table: u32 offsets * (n + 1), then n canonical JSON values
+#   for each fixed field, i32 * count (int fields), u32 * count (indices
+#       into the value table) or, for lists of strings, u32 offsets *
+#       (count + 1) then the indices of their strings in the value table
+#   records: u32 offsets * (count + 1), then each record's remaining fields
+#       as a JSON object
+#
+# Sections start on 4 byte boundaries so they can be viewed in place. The
+# header has the sha256 of the dataset the file was built from, so that load
+# only returns it while it's up to date, and the dataset's size and mtime
+# then, so that it's only hashed again to check once either has changed.
+#
+# The value table is also the dataset's string table. Within the remaining
+# fields and the table's lists and objects, a string repeated across them is
+# written as {"$s": index} of it in the table, and one repeated but for the
+# name of the record it's from, such as the boilerplate header of legendary
+# actions, as {"$t": [index, name]} of the string with each occurrence of
+# the name replaced by {@}. Either is only used for strings of at least
+# SHARED_LENGTH characters, where looking the string up is worth what it
+# saves. Version 1 has neither, nor lists of strings.
+
+MAGIC = b"SPDC"
+VERSION = 2
+VERSIONS = [1, 2]
+EXTENSION = ".compact"
+
+# Values of int fields, and of indices into the value table, which mean the
+# field is null or absent.
+INT_NULL = -2 ** 31
+INT_ABSENT = -2 ** 31 + 1
+INDEX_ABSENT = 2 ** 32 - 1
+
+# A field is interned if it has at most this many distinct values per record.
+INTERN_RATIO = 0.25
+
+STRING = "$s"
+TEMPLATE = "$t"
+PLACEHOLDER = "{@}"
+SHARED_LENGTH = 24
+# How either reference starts, in encoded records.
+REFERENCE = b'{"$'
+
+def canonical(value):
+    return json.dumps(value, separators=(",", ":"))
+
+def field_kinds(records, fields):
+    kinds = {}
+    for field in fields:
+        values = [r[field] for r in records if field in r]
+        if all(
+            v is None or (type(v) is int and INT_ABSENT < v < 2 ** 31)
+            for v in values
+        ):
+            kinds[field] = "int"
+        elif len(set(map(canonical, values))) <= len(records) * INTERN_RATIO:
+            kinds[field] = "value"
+        elif len(values) == len(records) and all(
+            type(v) is list and all(type(e) is str for e in v)
+            for v in values
+        ) and len({e for v in values for e in v}) <= \
+            len(records) * INTERN_RATIO:
+            # E.g. traits, as so many combinations of so few of them.
+            kinds[field] = "strings"
+        else:
+            kinds[field] = "record"
+    return kinds
+
+def little_endian(arr):
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr.tobytes()
+
+def pad(buf):
+    buf.extend(b"\0" * (-len(buf) % 4))
+
+def append_offsets(buf, items):
+    offsets = array.array("I", [0])
+    for item in items:
+        offsets.append(offsets[-1] + len(item))
+    buf.extend(little_endian(offsets))
+    for item in items:
+        buf.extend(item)
+    pad(buf)
+
+def strings(value):
+    # Strings within value, other than the keys of objects.
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, list):
+        for v in value:
+            yield from strings(v)
+    elif isinstance(value, dict):
+        if STRING in value or TEMPLATE in value:
+            raise ValueError(f"{STRING} and {TEMPLATE} are reserved keys")
+        for v in value.values():
+            yield from strings(v)
+
+def template(string, name):
+    # string with name as a parameter, or None if it doesn't contain it.
+    if not isinstance(name, str) or not name or name not in string:
+        return None
+    if PLACEHOLDER in string or PLACEHOLDER in name:
+        return None
+    return string.replace(name, PLACEHOLDER)
+
+class StringTable:
+    """Replaces the strings repeated across values with references into the
+    value table, once every value has been added."""
+
+    def __init__(self, table):
+        self.table = table
+        self.counts = collections.Counter()
+        self.templates = collections.Counter()
+
+    def add(self, value, name):
+        # name is that of the record value is from.
+        for string in strings(value):
+            if len(string) >= SHARED_LENGTH:
+                self.counts[string] += 1
+                t = template(string, name)
+                if t is not None:
+                    self.templates[t] += 1
+
+    def reference(self, kind, string, *params):
+        # The reference to string if it's shorter, adding string to the table.
+        key = canonical(string)
+        index = self.table.get(key, len(self.table))
+        ref = {kind: [index, *params] if params else index}
+        if len(canonical(ref)) >= len(canonical(string)):
+            return None
+        self.table[key] = index
+        return ref
+
+    def replace(self, value, name):
+        if isinstance(value, str):
+            if len(value) < SHARED_LENGTH:
+                return value
+            ref = None
+            if self.counts[value] > 1:
+                ref = self.reference(STRING, value)
+            else:
+                t = template(value, name)
+                if self.templates[t] > 1:
+                    ref = self.reference(TEMPLATE, t, name)
+            return value if ref is None else ref
+        elif isinstance(value, list):
+            return [self.replace(v, name) for v in value]
+        elif isinstance(value, dict):
+            return {k: self.replace(v, name) for k, v in value.items()}
+        return value
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def encode(records, digest=None, stamp=None):
+    fields = list(dict.fromkeys(f for r in records for f in r))
+    kinds = field_kinds(records, fields)
+
+    table = {}
+    # Name of the first record with each value in the table.
+    owners = {}
+    columns = {}
+    for field in fields:
+        if kinds[field] == "int":
+            columns[field] = array.array("i", (
+                (INT_NULL if r[field] is None else r[field])
+                if field in r else INT_ABSENT
+                for r in records
+            ))
+        elif kinds[field] == "value":
+            column = array.array("I")
+            for r in records:
+                if field in r:
+                    i = table.setdefault(canonical(r[field]), len(table))
+                    owners.setdefault(i, r.get("name"))
+                else:
+                    i = INDEX_ABSENT
+                column.append(i)
+            columns[field] = column
+        elif kinds[field] == "strings":
+            offsets = array.array("I", [0])
+            indices = array.array("I")
+            for r in records:
+                for string in r[field]:
+                    indices.append(
+                        table.setdefault(canonical(string), len(table))
+                    )
+                offsets.append(len(indices))
+            columns[field] = offsets + indices
+
+    rest = [
+        {f: v for f, v in r.items() if kinds[f] == "record"}
+        for r in records
+    ]
+    # Names are the parameter of templates, whichever kind of field they are.
+    names = [r.get("name") for r in records]
+    compound = {
+        i: json.loads(v) for v, i in table.items()
+        if i in owners and v[0] in "[{"
+    }
+    string_table = StringTable(table)
+    for i, value in compound.items():
+        string_table.add(value, owners[i])
+    for r, name in zip(rest, names):
+        string_table.add(r, name)
+
+    # Strings referred to are added to the table as references are made.
+    encoded = {
+        i: canonical(string_table.replace(value, owners[i]))
+        for i, value in compound.items()
+    }
+    rest = [
+        canonical(string_table.replace(r, name)).encode()
+        for r, name in zip(rest, names)
+    ]
+    values = [encoded.get(i, v).encode() for i, v in enumerate(table)]
+
+    header = json.dumps({
+        "version": VERSION,
+        "hash": digest,
+        "stamp": stamp,
+        "count": len(records),
+        "values": len(table),
+        "fields": [[f, kinds[f]] for f in fields]
+    }).encode()
+
+    buf = bytearray(MAGIC)
+    buf.extend(struct.pack("<I", len(header)))
+    buf.extend(header)
+    pad(buf)
+    append_offsets(buf, values)
+    for field in fields:
+        if field in columns:
+            buf.extend(little_endian(columns[field]))
+    append_offsets(buf, rest)
+    return bytes(buf)
+
+def write(records, digest, f, stamp=None):
+    f.write(encode(records, digest, stamp))
+
+def export(path, records=None):
+    """Writes the compact form of the dataset at path next to it, returning
+    the path written."""
+
+    stamp = file_stamp(path)
+    return sidecar.export(
+        path,
+        EXTENSION,
+        list,
+        lambda records, digest, f: write(records, digest, f, stamp),
+        records
+    )
+
+def load(path, verify=False):
+    """The compact form saved next to the dataset at path, or None if there's
+    none or it's out of date. The dataset is only hashed to check it's the
+    one the compact form was built from if its size or mtime has changed
+    since, or with verify."""
+
+    try:
+        current = file_stamp(path)
+        dataset = CompactDataset(sidecar.sidecar_path(path, EXTENSION))
+    except (OSError, ValueError):
+        return None
+    if (verify or dataset.stamp != current) and \
+            dataset.hash != sidecar.file_hash(path):
+        dataset.close()
+        return None
+    return dataset
+
+class CompactDataset(collections.abc.Sequence):
+    """A compact dataset, memory mapped. Records are decoded when they're
+    accessed rather than when the file is opened.
+
+    Values of interned fields, and strings from the string table, are shared
+    between the records that have them, so shouldn't be modified; use
+    Record.to_dict for a copy.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.buf)
+
+        if view[:4] != MAGIC:
+            raise ValueError(f"Not a compact dataset: {path}")
+        (length,) = struct.unpack_from("<I", view, 4)
+        header = json.loads(bytes(view[8:8 + length]))
+        if header["version"] not in VERSIONS:
+            raise ValueError(f"Unsupported version {header['version']}")
+
+        # None in files from before the hash or stamp were saved.
+        self.hash = header.get("hash")
+        self.stamp = header.get("stamp")
+        self.count = header["count"]
+        self.fields = [f for f, _ in header["fields"]]
+        self.kinds = dict(header["fields"])
+
+        pos = 8 + length + (-(8 + length) % 4)
+        self.value_offsets, self.value_data, pos = self.offsets(
+            view, pos, header["values"]
+        )
+        self.values = {}
+
+        self.columns = {}
+        for field in self.fields:
+            kind = self.kinds[field]
+            if kind == "strings":
+                n = self.count + 1
+                offsets = self.array(view[pos:pos + 4 * n], "I")
+                pos += 4 * n
+                n = offsets[self.count]
+                indices = self.array(view[pos:pos + 4 * n], "I")
+                pos += 4 * n
+                self.columns[field] = (offsets, indices)
+            elif kind != "record":
+                typecode = "i" if kind == "int" else "I"
+                self.columns[field] = self.array(
+                    view[pos:pos + 4 * self.count], typecode
+                )
+                pos += 4 * self.count
+
+        self.record_offsets, self.record_data, pos = self.offsets(
+            view, pos, self.count
+        )
+
+    def array(self, view, typecode):
+        if sys.byteorder == "big":
+            arr = array.array(typecode, bytes(view))
+            arr.byteswap()
+            return arr
+        return view.cast(typecode)
+
+    def offsets(self, view, pos, n):
+        offsets = self.array(view[pos:pos + 4 * (n + 1)], "I")
+        start = pos + 4 * (n + 1)
+        end = start + offsets[n]
+        return offsets, view[start:end], end + (-end % 4)
+
+    def decode(self, data):
+        # The hook costs a call per object, so only for data that needs it.
+        if REFERENCE not in data:
+            return json.loads(data)
+        return json.loads(data, object_hook=self.resolve)
+
+    def value(self, i):
+        if i not in self.values:
+            start, end = self.value_offsets[i], self.value_offsets[i + 1]
+            self.values[i] = self.decode(bytes(self.value_data[start:end]))
+        return self.values[i]
+
+    def resolve(self, obj):
+        # A reference into the string table, as the string it refers to.
+        if len(obj) == 1:
+            if STRING in obj:
+                return self.value(obj[STRING])
+            if TEMPLATE in obj:
+                index, name = obj[TEMPLATE]
+                return self.value(index).replace(PLACEHOLDER, name)
+        return obj
+
+    def rest(self, i):
+        start, end = self.record_offsets[i], self.record_offsets[i + 1]
+        return self.decode(bytes(self.record_data[start:end]))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.count))]
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return Record(self, i)
+
+    def close(self):
+        # Views of the map must be released before it can be closed.
+        self.columns = self.value_offsets = self.record_offsets = None
+        self.value_data = self.record_data = None
+        self.buf.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Record(collections.abc.Mapping):
+    def __init__(self, dataset, i):
+        self.dataset = dataset
+        self.i = i
+        self.decoded = None
+
+    def fixed(self, field):
+        # Returns the value of a fixed field, or raises KeyError if absent.
+        if self.dataset.kinds[field] == "strings":
+            offsets, indices = self.dataset.columns[field]
+            return [
+                self.dataset.value(j)
+                for j in indices[offsets[self.i]:offsets[self.i + 1]]
+            ]
+        v = self.dataset.columns[field][self.i]
+        if self.dataset.kinds[field] == "int":
+            if v == INT_ABSENT:
+                raise KeyError(field)
+            return None if v == INT_NULL else v
+        if v == INDEX_ABSENT:
+            raise KeyError(field)
+        return self.dataset.value(v)
+
+    def rest(self):
+        if self.decoded is None:
+            self.decoded = self.dataset.rest(self.i)
+        return self.decoded
+
+    def __getitem__(self, field):
+        if field not in self.dataset.kinds:
+            raise KeyError(field)
+        if field in self.dataset.columns:
+            return self.fixed(field)
+        return self.rest()[field]
+
+    def __iter__(self):
+        for field in self.dataset.fields:
+            if field in self:
+                yield field
+
+    def __contains__(self, field):
+        try:
+            self[field]
+            return True
+        except KeyError:
+            return False
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        return json.loads(json.dumps(dict(self)))
+
+def main():
+    # usage: python -m scrape.compact spells.json bestiary.json ...
+    for path in sys.argv[1:]:
+        out = export(path)
+        print(f"{path} ({os.path.getsize(path)} bytes) -> "
+            f"{out} ({os.path.getsize(out)} bytes)")
+
+if __name__ == "__main__":
+    main()
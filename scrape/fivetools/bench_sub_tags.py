@@ -0,0 +1,85 @@
+import glob
+import json
+import os
+import sys
+import time
+
+from .cache import CACHE_DIR
+from .common import sub_tags, sub_tags_regex
+
+FIXTURES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "fixtures",
+    "5etools"
+)
+
+def default_files():
+    # Books cached by the scrapers, or else the fixtures, as both still
+    # contain their tags. The shipped datasets have already been through
+    # sub_tags, so have none left to compare the implementations on.
+    # Only the bodies themselves are used, not the records parsed from them.
+    return sorted(
+        fp for fp in glob.glob(os.path.join(CACHE_DIR, "objects", "*"))
+        if "." not in os.path.basename(fp)
+    ) or [
+        os.path.join(FIXTURES, "spells.json"),
+        os.path.join(FIXTURES, "bestiary.json")
+    ]
+
+ROUNDS = 5
+
+def collect_strings(data, strings):
+    if isinstance(data, str):
+        strings.append(data)
+    elif isinstance(data, list):
+        for v in data:
+            collect_strings(v, strings)
+    elif isinstance(data, dict):
+        for v in data.values():
+            collect_strings(v, strings)
+    return strings
+
+def best_time(fn, strings):
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for s in strings:
+            fn(s)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main():
+    # usage: python -m scrape.fivetools.bench_sub_tags [file.json ...]
+    files = sys.argv[1:] or default_files()
+
+    strings = []
+    for fp in files:
+        with open(fp, "r") as f:
+            collect_strings(json.load(f), strings)
+
+    tagged = sum(1 for s in strings if "{@" in s)
+    print(f"Loaded {len(strings)} strings ({tagged} with tags) from "
+        f"{len(files)} files")
+    if not tagged:
+        print("Nothing to compare, as no string has tags")
+        exit(1)
+
+    mismatches = [s for s in strings if sub_tags(s) != sub_tags_regex(s)]
+    for s in mismatches[:10]:
+        print("Mismatch:", repr(s))
+        print("  sub_tags:      ", repr(sub_tags(s)))
+        print("  sub_tags_regex:", repr(sub_tags_regex(s)))
+
+    old = best_time(sub_tags_regex, strings)
+    new = best_time(sub_tags, strings)
+    print(f"sub_tags_regex: {old * 1000:.1f} ms")
+    print(f"sub_tags:       {new * 1000:.1f} ms ({old / new:.1f}x)")
+
+    if mismatches:
+        print(f"{len(mismatches)} strings differ")
+        exit(1)
+
+if __name__ == "__main__":
+    main()
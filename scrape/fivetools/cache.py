@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+CACHE_DIR = os.path.join("out", "cache")
+
+# 256 MiB, comfortably more than every 5etools spell and bestiary file.
+MAX_SIZE = 256 * 1024 * 1024
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+class DiskCache:
+    """Cache of fetched files, shared by every scraper.
+
+    Bodies are stored once under objects/ named by their hash, and index.json
+    maps each URL (including any version query) to the hash of its body,
+    its validators and when it was last fetched and used.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_size=MAX_SIZE, max_age=0):
+        self.directory = directory
+        self.objects = os.path.join(directory, "objects")
+        self.index_path = os.path.join(directory, "index.json")
+        self.max_size = max_size
+        # Seconds for which a cached response is used without revalidating.
+        self.max_age = max_age
+        self.lock = threading.Lock()
+
+        os.makedirs(self.objects, exist_ok=True)
+        if os.path.isfile(self.index_path):
+            with open(self.index_path, "r") as f:
+                self.entries = json.load(f)
+        else:
+            self.entries = {}
+
+    def object_path(self, digest):
+        return os.path.join(self.objects, digest)
+
+    def get(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+
+            try:
+                with open(self.object_path(entry["hash"]), "rb") as f:
+                    content = f.read()
+            except FileNotFoundError:
+                del self.entries[url]
+                return None
+
+            now = time.time()
+            entry["accessed"] = now
+            return dict(
+                entry,
+                content=content,
+                fresh=now - entry["fetched"] < self.max_age
+            )
+
+    def put(self, url, content, etag=None, last_modified=None):
+        digest = content_hash(content)
+        path = self.object_path(digest)
+        with self.lock:
+            if not os.path.isfile(path):
+                write_atomic(path, content)
+
+            now = time.time()
+            self.entries[url] = {
+                "hash": digest,
+                "size": len(content),
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched": now,
+                "accessed": now
+            }
+            self.evict()
+
+    def revalidated(self, url):
+        with self.lock:
+            if url in self.entries:
+                self.entries[url]["fetched"] = time.time()
+
+    def evict(self):
+        # Least recently used first. A body shared by several URLs is only
+        # counted, and deleted, once.
+        sizes = {}
+        for entry in self.entries.values():
+            sizes[entry["hash"]] = entry["size"]
+        total = sum(sizes.values())
+
+        by_age = sorted(self.entries, key=lambda u: self.entries[u]["accessed"])
+        for url in by_age:
+            if total <= self.max_size:
+                break
+            digest = self.entries.pop(url)["hash"]
+            if any(e["hash"] == digest for e in self.entries.values()):
+                continue
+            total -= sizes[digest]
+            os.remove(self.object_path(digest))
+
+    def save(self):
+        with self.lock:
+            write_atomic(self.index_path, json.dumps(self.entries).encode())
+
+    def close(self):
+        self.save()
+
+def write_atomic(path, content):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
@@ -0,0 +1,320 @@
+import functools
+import re
+
+UNICODE_TRANSLATION = str.maketrans({
+    "\u2014": " - ",
+    "\u2013": " - ",
+    "\u2212": "-",
+    "\u00d7": "x"
+})
+
+# Tags which are replaced verbatim before any pattern is tried.
+EXACT_TAGS = {
+    "{@atk mw}": "Melee weapon attack",
+    "{@atk rw}": "Ranged weapon attack",
+    "{@atk mw,rw}": "Melee or ranged weapon attack",
+    "{@atk ms,rs}": "Melee or ranged spell attack",
+    "{@h}": "On hit: ",
+    "{@recharge}": "(recharge on 6)",
+    "{@hitYourSpellAttack}": "your spell attack modifier"
+}
+
+# (tag names or None for any tag, pattern, replacement), in the same order as
+# the passes of sub_tags_regex. A tag is rewritten by the first pattern which
+# matches it in full.
+TAG_PATTERNS = [
+    (["hit"], r'{@hit (\d+)}', r'+\1'),
+    (["dc"], r'{@dc (\d+)}', r'DC \1'),
+    (["recharge"], r'{@recharge (\d+)}', r'(recharge \1-6)'),
+    (["creature"], r'{@creature ([\w\(\)\, ]*)\|[^{}]+}', r"\1"),
+    (
+        ["creature"],
+        r'{@creature [\w\(\)\, ]*\|[\w\(\)\, ]*\|([\w\,\(\) ]+)}',
+        r"\1"
+    ),
+    (["chance"], r'{@chance (\d+)\|[^\|]*\|[^\|]*}', r'\1%'),
+    (["item"], r"{@item ([\w'\+\-\(\) ]+)\|[\w'\+\-\(\) ]*}", r"\1"),
+    (
+        ["item"],
+        r"{@item [\w'\+\-\(\)\, ]+\|[\w'\+\-\(\)\, ]*\|"
+        r"([\w'\+\-\(\)\, ]*)}",
+        r"\1"
+    ),
+    (["table"], r'{@table ([^\{\}\|]+)(\|(phb|GoS|DMG))?}', r'\1 table'),
+    (
+        ["filter"],
+        r"{@filter ([\w'\+\-\(\) ]+)\|[\w'\+\-\(\) ]*\|"
+        r"[\w'\+\-\(\)\= ]*}",
+        r"\1"
+    ),
+    (
+        ["spell"],
+        r'{@spell [^\{\}\|]+\|[^\{\}\|]*(\|[^\{\}\|]*)?}',
+        r"\1"
+    ),
+    (
+        ["book"],
+        r"{@book ([\w'\+\-\(\) ]+)\|[\w'\+\-\(\) ]*\|"
+        r"[\w'\+\-\(\)\= ]*\|[\w'\+\-\(\)\= ]*}",
+        r"\1"
+    ),
+    (
+        ["condition", "filter", "adventure", "classFeature"],
+        r"{@(condition|filter|adventure|classFeature) ([\w/ ]+)\|[^{}]*}",
+        r"\2"
+    ),
+    (["dice"], r"{@dice ([0-9d\-+ ]+)\|(\d+)}", r"\1 (\2)"),
+    (["chance"], r"{@chance \d+\|([^{}]*)}", r"\1"),
+    (["race"], r"{@race [^{}\|]+\|\|([^{}\|]+)}", r"\1"),
+    (None, r"{@\w+ ([^\{\}\|]+)(\|(phb|GoS|DMG))?}", r"\1"),
+    (None, r"{@\w+ ([^{}\|]+)(\|[^{}]*)?}", r"\1")
+]
+
+# Pass 0 is EXACT_TAGS, so patterns are numbered from 1.
+GENERIC_PASSES = []
+PASSES_BY_TAG = {}
+for i, (tags, pattern, replacement) in enumerate(TAG_PATTERNS, 1):
+    entry = (i, re.compile(pattern), replacement)
+    if tags is None:
+        GENERIC_PASSES.append(entry)
+        for passes in PASSES_BY_TAG.values():
+            passes.append(entry)
+    else:
+        for tag in tags:
+            PASSES_BY_TAG.setdefault(tag, []).append(entry)
+
+# Index of a pass later than every other, marking text which still contains
+# braces and so can't be matched by any pattern.
+UNMATCHED = len(TAG_PATTERNS) + 1
+
+# Either a tag with nothing nested in it or a lone brace.
+TOKEN_REGEX = re.compile(r"{[^{}]*}|[{}]")
+
+@functools.lru_cache(maxsize=4096)
+def rewrite_tag(text, after=-1):
+    """Returns (pass, replacement) for the first pass after `after` which
+    rewrites the tag `text`, or (UNMATCHED, text) if none does."""
+
+    if after < 0 and text in EXACT_TAGS:
+        return 0, EXACT_TAGS[text]
+
+    if not text.startswith("{@"):
+        return UNMATCHED, text
+
+    name = text[2:text.find(" ")]
+    for i, pattern, replacement in PASSES_BY_TAG.get(name, GENERIC_PASSES):
+        if i > after:
+            match = pattern.fullmatch(text)
+            if match:
+                return i, match.expand(replacement)
+    return UNMATCHED, text
+
+def sub_tags(string):
+    """Replaces 5etools {@tag body|...} markup with plain text.
+
+    Equivalent to sub_tags_regex, but tokenizes the string once instead of
+    running each pattern over the whole string in turn. Nested tags are
+    rewritten innermost first, and an enclosing tag only by a pattern which
+    comes after every pattern used on its contents, as the sequential passes
+    would.
+    """
+
+    string = string.translate(UNICODE_TRANSLATION)
+    if "{" not in string:
+        return string
+
+    # Each frame is [parts, last pass used on a nested tag].
+    stack = [[[], -1]]
+    pos = 0
+    for match in TOKEN_REGEX.finditer(string):
+        start, end = match.span()
+        frame = stack[-1]
+        frame[0].append(string[pos:start])
+        pos = end
+
+        if end - start > 1:
+            text = match.group()
+            after = -1
+        elif string[start] == "{":
+            stack.append([[], -1])
+            continue
+        elif len(stack) == 1:
+            frame[0].append("}")
+            continue
+        else:
+            parts, after = stack.pop()
+            frame = stack[-1]
+            text = "{" + "".join(parts) + "}"
+
+        # The first {@chance} pattern can match across braces, so it depends
+        # on the rest of the string. Leave those to the regexes.
+        if text.startswith("{@chance ") and (
+            after >= 0 or string.find("}", end) >= 0
+        ):
+            return sub_tags_regex(string)
+
+        i, text = rewrite_tag(text, after)
+        frame[0].append(text)
+        if i > frame[1]:
+            frame[1] = i
+    stack[-1][0].append(string[pos:])
+
+    # Anything still open was never closed, so is left as is.
+    while len(stack) > 1:
+        parts, _ = stack.pop()
+        text = "{" + "".join(parts)
+        if text.startswith("{@chance "):
+            return sub_tags_regex(string)
+        stack[-1][0].append(text)
+
+    return "".join(stack[0][0])
+
+def sub_tags_regex(string):
+    string = string \
+        .replace("\u2014", " - ") \
+        .replace("\u2013", " - ") \
+        .replace("\u2212", "-") \
+        .replace("\u00d7", "x") \
+        .replace("{@atk mw}", "Melee weapon attack") \
+        .replace("{@atk rw}", "Ranged weapon attack") \
+        .replace("{@atk mw,rw}", "Melee or ranged weapon attack") \
+        .replace("{@atk ms,rs}", "Melee or ranged spell attack") \
+        .replace("{@h}", "On hit: ") \
+        .replace("{@recharge}", "(recharge on 6)") \
+        .replace("{@hitYourSpellAttack}", "your spell attack modifier") \
+        .replace(
+            "rs {@hitYourSpellAttack}",
+            "Ranged spell attack: your spell attack modifier"
+        ) \
+        .replace(
+            "ms {@hitYourSpellAttack}",
+            "Melee spell attack: your spell attack modifier"
+        )
+    # {@hit n} -> +n
+    string = re.sub(
+        r'{@hit (\d+)}',
+        r'+\1',
+        string,
+        flags=re.MULTILINE
+    )
+    # {@dc n} -> DC n
+    string = re.sub(
+        r'{@dc (\d+)}',
+        r'DC \1',
+        string,
+        flags=re.MULTILINE
+    )
+    # {@recharge n} -> (recharge n-6)
+    string = re.sub(
+        r'{@recharge (\d+)}',
+        r'(recharge \1-6)',
+        string,
+        flags=re.MULTILINE
+    )
+    # {@creature in text name|set} -> in text name
+    string = re.sub(
+        r'{@creature ([\w\(\)\, ]*)\|[^{}]+}',
+        r"\1",
+        string,
+        flags=re.MULTILINE
+    )
+    # {@creature 5e.tools name||in text name} -> in text name
+    string = re.sub(
+        r'{@creature [\w\(\)\, ]*\|[\w\(\)\, ]*\|([\w\,\(\) ]+)}',
+        r"\1",
+        string,
+        flags=re.MULTILINE
+    )
+    # {@chance n|n percent|hover text} -> n%
+    string = re.sub(
+        r'{@chance (\d+)\|[^\|]*\|[^\|]*}',
+        r'\1%',
+        string,
+        flags=re.MULTILINE
+    )
+    # {@item name|set} -> name
+    string = re.sub(
+        r"{@item ([\w'\+\-\(\) ]+)\|[\w'\+\-\(\) ]*}",
+        r"\1",
+        string,
+        flags=re.MULTILINE
+    )
+    # {@item name|set|text} -> text
+    string = re.sub(
+        r"{@item [\w'\+\-\(\)\, ]+\|[\w'\+\-\(\)\, ]*\|([\w'\+\-\(\)\, ]*)}",
+        r"\1",
+        string,
+        flags=re.MULTILINE
+    )
+    # {@table name|set} -> name table
+    string = re.sub(
+        r'{@table ([^\{\}\|]+)(\|(phb|GoS|DMG))?}',
+        r'\1 table',
+        string,
+        flags=re.MULTILINE
+    )
+    # {@filter in text name|location|type=name} -> in text name
+    string = re.sub(
+        r"{@filter ([\w'\+\-\(\) ]+)\|[\w'\+\-\(\) ]*\|[\w'\+\-\(\)\= ]*}",
+        r"\1",
+        string,
+        flags=re.MULTILINE
+    )
+    # {@spell link name||in text name} -> in text name
+    string = re.sub(
+        r'{@spell [^\{\}\|]+\|[^\{\}\|]*(\|[^\{\}\|]*)?}',
+        r"\1",
+        string,
+        flags=re.MULTILINE
+    )
+    # {@book in text name|book|chapter|title} -> in text name
+    string = re.sub(
+        r"{@book ([\w'\+\-\(\) ]+)\|[\w'\+\-\(\) ]*\|"
+        r"[\w'\+\-\(\)\= ]*\|[\w'\+\-\(\)\= ]*}",
+        r"\1",
+        string,
+        flags=re.MULTILINE
+    )
+    # {@condition name||other text} -> name
+    string = re.sub(
+        r"{@(condition|filter|adventure|classFeature) ([\w/ ]+)\|[^{}]*}",
+        r"\2",
+        string,
+        flags=re.MULTILINE
+    )
+    # {@dice roll|average} -> average
+    string = re.sub(
+        r"{@dice ([0-9d\-+ ]+)\|(\d+)}",
+        r"\1 (\2)",
+        string,
+        flags=re.MULTILINE
+    )
+    # {@chance chance|in text} -> in text
+    string = re.sub(
+        r"{@chance \d+\|([^{}]*)}",
+        r"\1",
+        string,
+        flags=re.MULTILINE
+    )
+    # {@race internal name||Visible name}
+    string = re.sub(
+        r"{@race [^{}\|]+\|\|([^{}\|]+)}",
+        r"\1",
+        string,
+        flags=re.MULTILINE
+    )
+    # {@x y} -> y
+    string = re.sub(
+        r"{@\w+ ([^\{\}\|]+)(\|(phb|GoS|DMG))?}",
+        r"\1",
+        string,
+        flags=re.MULTILINE
+    )
+    # {x y} -> y
+    string = re.sub(
+        r"{@\w+ ([^{}\|]+)(\|[^{}]*)?}",
+        r"\1",
+        string,
+        flags=re.MULTILINE
+    )
+    return string
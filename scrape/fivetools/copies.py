@@ -0,0 +1,397 @@
+import re
+import traceback
+
+from ..instrument import stats
+
+# 5etools defines variants of creatures as copies of another ("_copy"),
+# naming the base by name and source and listing modifications ("_mod") to
+# make to it. Any other property of the copy replaces the base's, and a null
+# one removes it.
+#
+#   {"name": "Goblin Boss", "source": "MM", "hp": {...},
+#    "_copy": {"name": "Goblin", "source": "MM", "_mod": {
+#        "trait": {"mode": "appendArr", "items": {...}},
+#        "*": {"mode": "replaceTxt", "replace": "goblin", "with": "boss"}}}}
+
+# Properties describing where a creature was published rather than what it
+# is, which a copy doesn't inherit unless they're named in "_preserve".
+NOT_INHERITED = [
+    "_versions", "basicRules", "hasFluff", "hasFluffImages", "hasToken",
+    "isReprinted", "otherSources", "page", "reprintedAs", "srd"
+]
+
+# Properties holding entries, which "*" modifications apply to.
+ENTRY_PROPS = [
+    "action", "bonus", "reaction", "trait", "legendary", "mythic", "variant",
+    "spellcasting", "actionHeader", "bonusHeader", "reactionHeader",
+    "legendaryHeader", "mythicHeader"
+]
+
+# Keys of entries replaceTxt leaves alone.
+NOT_TEXT = {"name", "type", "caption", "style", "colLabels", "colStyles", "id"}
+
+SIZES = "FDTSMLHGCV"
+
+SKILL_ABILITIES = {
+    "acrobatics": "dex", "animal handling": "wis", "arcana": "int",
+    "athletics": "str", "deception": "cha", "history": "int",
+    "insight": "wis", "intimidation": "cha", "investigation": "int",
+    "medicine": "wis", "nature": "int", "perception": "wis",
+    "performance": "cha", "persuasion": "cha", "religion": "int",
+    "sleight of hand": "dex", "stealth": "dex", "survival": "wis"
+}
+
+TAG = re.compile(r"({@[^{}]*(?:{@[^{}]*}[^{}]*)*})")
+JS_GROUP = re.compile(r"\$(\d+|&)")
+
+class CopyError(ValueError):
+    pass
+
+def key(name, source):
+    # 5etools looks creatures up ignoring case.
+    return (name.lower(), (source or "").lower())
+
+def key_of(c):
+    return key(c["name"], c.get("source"))
+
+def clone(v):
+    # Faster than copy.deepcopy for JSON.
+    if isinstance(v, dict):
+        return {k: clone(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [clone(x) for x in v]
+    return v
+
+def as_list(v):
+    return v if isinstance(v, list) else [v]
+
+def find_named(arr, name):
+    for i, item in enumerate(arr):
+        if item == name or isinstance(item, dict) and item.get("name") == name:
+            return i
+    return -1
+
+def find_item(arr, replace):
+    # replace names an item, or is {"index": i} or {"regex": pattern}.
+    if isinstance(replace, str):
+        return find_named(arr, replace)
+    if "index" in replace:
+        return replace["index"] if replace["index"] < len(arr) else -1
+    pattern = re.compile(replace["regex"], js_flags(replace.get("flags")))
+    for i, item in enumerate(arr):
+        name = item if isinstance(item, str) else item.get("name", "")
+        if pattern.search(name):
+            return i
+    return -1
+
+def js_flags(flags):
+    return re.IGNORECASE if flags and "i" in flags else 0
+
+def js_replacement(text):
+    # "$1" and "$&" in a replacement, as JavaScript's String.replace has them.
+    return lambda m: JS_GROUP.sub(
+        lambda g: m.group(0 if g.group(1) == "&" else int(g.group(1))) or "",
+        text
+    )
+
+def replace_text(v, pattern, replacement):
+    # Replaces the text of strings within v, outside of {@tags}.
+    if isinstance(v, str):
+        parts = TAG.split(v)
+        for i in range(0, len(parts), 2):
+            parts[i] = pattern.sub(replacement, parts[i])
+        return "".join(parts)
+    if isinstance(v, list):
+        return [replace_text(x, pattern, replacement) for x in v]
+    if isinstance(v, dict):
+        return {
+            k: x if k in NOT_TEXT else replace_text(x, pattern, replacement)
+            for k, x in v.items()
+        }
+    return v
+
+def proficiency_bonus(c):
+    cr = c.get("cr")
+    if isinstance(cr, dict):
+        cr = cr.get("cr")
+    if not isinstance(cr, str) or "/" in cr:
+        return 2
+    return 2 + (max(int(cr), 1) - 1) // 4
+
+def modifier(c, ability):
+    return (c.get(ability, 10) - 10) // 2
+
+def add_proficiencies(out, prop, ranks, ability_of):
+    # Proficiency (1) or expertise (2) in each, unless the bonus it has
+    # already is higher.
+    bonuses = out.setdefault(prop, {})
+    for name, rank in ranks.items():
+        bonus = modifier(out, ability_of(name)) + proficiency_bonus(out) * rank
+        current = bonuses.get(name)
+        if current is None or int(current) < bonus:
+            bonuses[name] = f"{bonus:+d}"
+
+def add_senses(out, senses):
+    have = out.get("senses") or []
+    for sense in as_list(senses):
+        text = f"{sense['type']} {sense['range']} ft."
+        pattern = re.compile(re.escape(sense["type"]) + r" (\d+) ft", re.I)
+        for i, s in enumerate(have):
+            m = pattern.match(s)
+            if m:
+                if int(m.group(1)) < sense["range"]:
+                    have[i] = text
+                break
+        else:
+            have.append(text)
+    out["senses"] = have
+
+def scale(value, mod, op):
+    if isinstance(value, dict) and "number" in value:
+        value["number"] = scale(value["number"], mod, op)
+        return value
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return value
+    if op == "add":
+        return value + mod["scalar"]
+    value *= mod["scalar"]
+    return int(value) if mod.get("floor") else value
+
+def apply_prop_mod(out, prop, mod):
+    """Applies a modification to out[prop]."""
+
+    if mod == "remove":
+        out.pop(prop, None)
+        return
+    mode = mod["mode"]
+
+    if mode == "replaceTxt":
+        if "props" in mod:
+            raise CopyError("replaceTxt with props isn't supported")
+        pattern = re.compile(mod["replace"], js_flags(mod.get("flags")))
+        replacement = js_replacement(mod["with"])
+        for p in ENTRY_PROPS if prop == "*" else [prop]:
+            if p in out:
+                out[p] = replace_text(out[p], pattern, replacement)
+        return
+    if mode == "appendStr":
+        if out.get(prop):
+            out[prop] += mod.get("joiner", "") + mod["str"]
+        else:
+            out[prop] = mod["str"]
+        return
+    if mode in ("scalarAddProp", "scalarMultProp"):
+        op = "add" if mode == "scalarAddProp" else "mult"
+        target = out.get(prop)
+        if isinstance(target, dict):
+            for k in list(target) if mod["prop"] == "*" else [mod["prop"]]:
+                if k in target:
+                    target[k] = scale(target[k], mod, op)
+        return
+
+    arr = out.setdefault(prop, [])
+    items = clone(as_list(mod.get("items", [])))
+    if mode == "prependArr":
+        arr[:0] = items
+    elif mode == "appendArr":
+        arr.extend(items)
+    elif mode == "appendIfNotExistsArr":
+        arr.extend(item for item in items if item not in arr)
+    elif mode == "insertArr":
+        arr[mod["index"]:mod["index"]] = items
+    elif mode in ("replaceArr", "replaceOrAppendArr"):
+        i = find_item(arr, mod["replace"])
+        if i >= 0:
+            arr[i:i + 1] = items
+        elif mode == "replaceOrAppendArr":
+            arr.extend(items)
+        else:
+            raise CopyError(f"No {mod['replace']!r} in {prop} to replace")
+    elif mode == "removeArr":
+        for name in as_list(mod.get("names", [])):
+            i = find_named(arr, name)
+            if i < 0:
+                raise CopyError(f"No {name!r} in {prop} to remove")
+            del arr[i]
+        for item in items:
+            if item in arr:
+                arr.remove(item)
+    elif mode == "replaceName":
+        pattern = re.compile(mod["replace"], js_flags(mod.get("flags")))
+        replacement = js_replacement(mod["with"])
+        for item in arr:
+            if isinstance(item, dict) and "name" in item:
+                item["name"] = pattern.sub(replacement, item["name"])
+    else:
+        raise CopyError(f"Unsupported _mod mode {mode}")
+    if not arr:
+        del out[prop]
+
+def apply_root_mod(out, mod):
+    """Applies a modification to the creature as a whole ("_")."""
+
+    mode = mod["mode"]
+    if mode == "setProp":
+        *path, last = mod["prop"].split(".")
+        target = out
+        for p in path:
+            target = target.setdefault(p, {})
+        target[last] = clone(mod["value"])
+    elif mode == "addSenses":
+        add_senses(out, mod["senses"])
+    elif mode == "addSaves":
+        add_proficiencies(out, "save", mod["saves"], lambda a: a)
+    elif mode == "addSkills":
+        add_proficiencies(out, "skill", mod["skills"], SKILL_ABILITIES.get)
+    elif mode == "maxSize":
+        limit = SIZES.index(mod["max"])
+        sizes = [
+            s if SIZES.index(s) <= limit else mod["max"]
+            for s in as_list(out["size"])
+        ]
+        out["size"] = sizes if isinstance(out["size"], list) else sizes[0]
+    else:
+        raise CopyError(f"Unsupported _mod mode {mode}")
+
+def apply_copy(base, c):
+    """The creature c copied from base, which is already resolved."""
+
+    copy = c["_copy"]
+    if "_trait" in copy or "_templates" in copy:
+        raise CopyError("Copies with templates or traits aren't supported")
+
+    preserve = copy.get("_preserve") or {}
+    out = {
+        k: clone(v) for k, v in base.items()
+        if preserve.get("*") or k not in NOT_INHERITED or preserve.get(k)
+    }
+    for k, v in c.items():
+        if k == "_copy":
+            continue
+        if v is None:
+            out.pop(k, None)
+        else:
+            out[k] = clone(v)
+
+    for prop, mods in (copy.get("_mod") or {}).items():
+        for mod in as_list(mods):
+            if prop == "_":
+                apply_root_mod(out, mod)
+            else:
+                apply_prop_mod(out, prop, mod)
+    return out
+
+class CopyResolver:
+    """Resolves copies against an index of every creature loaded, by name
+    and source, so a copy can be of a creature in any book.
+
+    Each copy is resolved once, after its base, and remembered, so resolving
+    every creature takes time linear in their number however deep chains of
+    copies go.
+    """
+
+    def __init__(self):
+        self.index = {}
+        # Resolved copies, and the books each came from along the way.
+        self.resolved = {}
+        self.sources = {}
+        # Why each copy that couldn't be resolved couldn't.
+        self.failed = {}
+
+    def add(self, book, creatures):
+        for c in creatures:
+            self.index.setdefault(key_of(c), (book, c))
+
+    def waiting_on(self, creatures):
+        """Keys of the creatures that copies in creatures are of, directly or
+        through other copies, which haven't been added yet. The copies can't
+        be resolved until they are, or until it's known they never will be.
+        """
+
+        missing = set()
+        for c in creatures:
+            seen = set()
+            while "_copy" in c:
+                k = key_of(c)
+                if k in self.resolved or k in seen:
+                    break
+                seen.add(k)
+                copy = c["_copy"]
+                base = key(copy["name"], copy.get("source"))
+                found = self.index.get(base)
+                if found is None:
+                    missing.add(base)
+                    break
+                c = found[1]
+        return missing
+
+    def resolve(self, c):
+        """c with its copy applied, or c itself if it isn't a copy. Raises
+        CopyError if it can't be resolved."""
+
+        # (key, copy, book of its base) from c down to the first creature
+        # already resolved, or that isn't a copy, and the keys in it.
+        chain = []
+        keys = set()
+        while "_copy" in c:
+            k = key_of(c)
+            if k in self.resolved:
+                break
+            if k in self.failed:
+                self.fail(chain, self.failed[k])
+            if k in keys:
+                self.fail(chain, f"The copies of {c['name']} "
+                    f"({c.get('source')}) form a cycle")
+
+            copy = c["_copy"]
+            found = self.index.get(key(copy["name"], copy.get("source")))
+            if found is None:
+                self.fail(chain + [(k, c, None)], f"{c['name']} copies "
+                    f"{copy['name']} ({copy.get('source')}), which doesn't "
+                    "exist")
+            chain.append((k, c, found[0]))
+            keys.add(k)
+            c = found[1]
+
+        if "_copy" in c:
+            base = self.resolved[key_of(c)]
+            books = self.sources[key_of(c)]
+        else:
+            base = c
+            books = frozenset()
+        for i in reversed(range(len(chain))):
+            k, c, book = chain[i]
+            try:
+                base = apply_copy(base, c)
+            except CopyError as e:
+                self.fail(chain[:i + 1], f"{c['name']}: {e}")
+            except Exception as e:
+                self.fail(chain[:i + 1], f"{c['name']}: {e!r}")
+            books = books | {book}
+            self.resolved[k] = base
+            self.sources[k] = books
+        return base
+
+    def fail(self, chain, reason):
+        for k, _, _ in chain:
+            self.failed[k] = reason
+        raise CopyError(reason)
+
+    def resolve_book(self, creatures):
+        """The creatures with their copies resolved, (name, source, error) of
+        each that couldn't be, and the books they were copied from."""
+
+        out = []
+        errors = []
+        books = set()
+        for c in creatures:
+            try:
+                out.append(self.resolve(c))
+            except CopyError as e:
+                error = "".join(traceback.format_exception_only(e))
+                errors.append((c.get("name"), c.get("source"), error))
+                continue
+            if "_copy" in c:
+                stats.count("creatures.copies")
+                books |= self.sources[key_of(c)]
+        return out, errors, books
@@ -0,0 +1,150 @@
+import concurrent.futures
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..instrument import stats
+
+# Status codes worth retrying, as they're usually transient.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class MemoryCache:
+    """Remembers the body and validators of each response, so repeated fetches
+    of a URL in one run can be made conditional."""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        with self.lock:
+            return self.entries.get(url)
+
+    def put(self, url, content, etag=None, last_modified=None):
+        with self.lock:
+            self.entries[url] = {
+                "content": content,
+                "etag": etag,
+                "last_modified": last_modified
+            }
+
+    def revalidated(self, url):
+        pass
+
+    def close(self):
+        pass
+
+class Fetcher:
+    def __init__(
+        self,
+        workers=8,
+        retries=3,
+        backoff=0.5,
+        timeout=30,
+        cache=None
+    ):
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache if cache is not None else MemoryCache()
+
+        # One connection per worker, reused across every file fetched.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=workers,
+            pool_maxsize=workers
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+        self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, url, headers):
+        for attempt in range(self.retries + 1):
+            try:
+                resp = self.session.get(
+                    url,
+                    headers=headers,
+                    timeout=self.timeout
+                )
+                if resp.status_code not in RETRY_STATUSES:
+                    return resp
+                error = requests.HTTPError(
+                    f"{resp.status_code} for {url}",
+                    response=resp
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            if attempt < self.retries:
+                stats.count("fetch.retries")
+                time.sleep(self.backoff * 2 ** attempt)
+        raise error
+
+    def get(self, url):
+        """Returns the body of url. A fresh cached response is returned as is,
+        otherwise its validators are sent so an unchanged file isn't
+        downloaded again."""
+
+        cached = self.cache.get(url)
+        if cached and cached.get("fresh"):
+            stats.count("fetch.cached")
+            return cached["content"]
+
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        resp = self.request(url, headers)
+        if resp.status_code == 304 and cached:
+            stats.count("fetch.revalidated")
+            self.cache.revalidated(url)
+            return cached["content"]
+        resp.raise_for_status()
+        stats.count("fetch.downloaded")
+        stats.count("fetch.bytes", len(resp.content))
+
+        self.cache.put(
+            url,
+            resp.content,
+            resp.headers.get("ETag"),
+            resp.headers.get("Last-Modified")
+        )
+        return resp.content
+
+    def get_json(self, url):
+        return json.loads(self.get(url))
+
+    def get_all(self, urls, fn=None):
+        """Fetches urls concurrently, yielding (url, result, error) in the
+        order given. result is fn applied to the body, or the body itself."""
+
+        def fetch(url):
+            content = self.get(url)
+            return fn(content) if fn else content
+
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+            futures = [(url, pool.submit(fetch, url)) for url in urls]
+            for url, future in futures:
+                try:
+                    yield url, future.result(), None
+                except Exception as e:
+                    yield url, None, e
+
+    def get_all_json(self, urls):
+        return self.get_all(urls, json.loads)
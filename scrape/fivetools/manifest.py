@@ -0,0 +1,128 @@
+import json
+import os
+
+from ..instrument import stats
+from ..output import RecordReader, RecordWriter
+
+class PreviousRecords:
+    """The records of a book in the previous output, read from it as they're
+    iterated rather than held in memory."""
+
+    def __init__(self, reader, spans):
+        self.reader = reader
+        self.spans = spans
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __iter__(self):
+        for span in self.spans:
+            yield self.reader.read(span)
+
+class Manifest:
+    """Records, for each source book that went into an output file, the hash
+    of the book and of the parser and how many records it produced.
+
+    The records of a book are reused from the existing output when neither
+    hash has changed, so a rebuild only parses the books which have. Records
+    are streamed to the new output as they're added, and those reused are
+    read from the previous output only as they're written.
+    """
+
+    def __init__(self, outfile, version):
+        self.outfile = outfile
+        # Named after the whole output name, e.g. out.json.manifest.json, as
+        # the json and jsonl outputs of a name are built separately.
+        self.path = outfile + ".manifest.json"
+        self.version = version
+        self.previous = {}
+        self.reader = None
+        self.books = {}
+        self.count = 0
+        # Books which couldn't be fetched and weren't in the last build.
+        self.missing = []
+
+        if os.path.isfile(self.path) and os.path.isfile(outfile):
+            self.load_previous()
+        self.writer = RecordWriter(outfile)
+
+    def load_previous(self):
+        with open(self.path, "r") as f:
+            manifest = json.load(f)
+        reader = RecordReader(self.outfile)
+        spans = list(reader.spans())
+
+        # The output was changed by something else, so can't be reused.
+        if sum(b["count"] for b in manifest.values()) != len(spans):
+            reader.close()
+            return
+
+        self.reader = reader
+        i = 0
+        for book, entry in manifest.items():
+            records = PreviousRecords(reader, spans[i:i + entry["count"]])
+            self.previous[book] = (entry, records)
+            i += entry["count"]
+
+    def get(self, book, digest):
+        """Returns the records of book from the previous build if it was
+        built from the same bytes with the same parser, otherwise None."""
+
+        if book not in self.previous:
+            return None
+        entry, records = self.previous.pop(book)
+        if entry["hash"] != digest or entry["parser"] != self.version:
+            return None
+        return records
+
+    def stale(self, book):
+        """Returns the records of book from the previous build however it
+        was built, e.g. to keep them when it can't be fetched, or None."""
+
+        entry = self.previous.pop(book, None)
+        return None if entry is None else entry[1]
+
+    def fallback(self, book, url, cache):
+        """What to build book from when it couldn't be fetched from url,
+        rather than drop it: the copy last fetched, in cache, or else its
+        records from the last build. Returns (content, records), one of them
+        set, or (None, None) if there's neither, and book is missing."""
+
+        cached = cache.get(url)
+        if cached is not None:
+            stats.count("books.stale")
+            return cached["content"], None
+        records = self.stale(book)
+        if records is None:
+            self.missing.append(book)
+            return None, None
+        stats.count("books.stale")
+        return None, records
+
+    def exit_if_missing(self):
+        """Exits with an error if a book is missing, leaving the last output
+        as it is rather than replace it with one missing whole books."""
+
+        if self.missing:
+            stats.error(
+                f"Couldn't fetch {', '.join(self.missing)}, {self.outfile} "
+                "not updated"
+            )
+            exit(1)
+
+    def add(self, book, digest, records):
+        self.books[book] = {
+            "hash": digest,
+            "parser": self.version,
+            "count": len(records)
+        }
+        self.writer.write_all(records)
+        self.count += len(records)
+
+    def save(self):
+        # Every record reused has been written by now.
+        if self.reader is not None:
+            self.reader.close()
+        self.writer.close()
+        with open(self.path, "w") as f:
+            json.dump(self.books, f, indent=4)
@@ -0,0 +1,234 @@
+import traceback
+
+from ..instrument import VERBOSE, stats
+from .common import sub_tags
+from .copies import CopyResolver
+
+ZERO_WIDTH_SPACE = "\u200b"
+
+def get_size(c):
+    return {
+        "T": "Tiny",
+        "S": "Small",
+        "M": "Medium",
+        "L": "Large",
+        "H": "Huge",
+        "G": "Gargantuan"
+    }[c["size"]]
+
+def get_ac(c):
+    text = ""
+    for ac in c["ac"]:
+        if text:
+            text += "; "
+
+        if type(ac) is int:
+            text += str(ac)
+            continue
+
+        text += str(ac.get("ac"))
+
+        if "condition" in ac:
+            text += " (" + sub_tags(ac["condition"]) + ")"
+
+        if "from" in ac:
+            text += " (" + ", ".join(sub_tags(s) for s in ac["from"]) + ")"
+    return text
+
+def get_hp(hp):
+    if "average" in hp and "formula" in hp:
+        return str(hp["average"]) + " (" + hp["formula"] + ")"
+    else:
+        return hp["special"]
+
+def get_alignment(c):
+    if not "alignment" in c:
+        return ""
+    if type(c["alignment"][0]) is str:
+        return "".join(c["alignment"])
+    else:
+        entries = []
+        for a in c["alignment"]:
+            if "chance" in a:
+                entries.append(
+                    "".join(a["alignment"]) + "(" + str(a["chance"]) + "%)"
+                )
+            elif "special" in a:
+                entries.append(a["special"])
+            else:
+                entries.append("".join(a["alignment"]))
+
+        return " or ".join(entries)
+
+def parse_traits(l):
+    traits = []
+    for t in l:
+        trait = {"name": sub_tags(t["name"]) if "name" in t else ZERO_WIDTH_SPACE}
+        text = ""
+        for e in t["entries"]:
+            if type(e) is str: # single line of text
+                text += sub_tags(e) + "\n\n"
+            elif "entries" in e and "type" in e and e["type"] == "inline":
+                for i in e["entries"]:
+                    if type(i) is str:
+                        text += sub_tags(i)
+                    else:
+                        text += sub_tags(i["text"])
+            else: # list of items
+                for i in e["items"]:
+                    if type(i) is str:
+                        text += f"\u2022 {sub_tags(i)}\n"
+                    elif "entry" in i:
+                        text += f"\u2022 {sub_tags(i['name'])}" \
+                            f" {sub_tags(i['entry'])}\n"
+                    else:
+                        entry = sub_tags('\n\t'.join(i["entries"]))
+                        text += f"\u2022 {sub_tags(i['name'])} {entry}\n"
+
+        trait["text"] = text[:-2]
+        traits.append(trait)
+    return traits
+
+def parse_legendary_actions(c):
+    LEGENDARY_HEADER = \
+        "The {@} can take 3 legendary actions, choosing from the options " \
+        "below. Only one legendary action can be used at a time and only at " \
+        "the end of another creature's turn. The {@} regains spent legendary " \
+        "actions at the start of its turn."
+    
+    legendary = parse_traits(c.get("legendary", []))
+    if legendary:
+        if "legendaryHeader" in c:
+            legendary.insert(
+                0,
+                {"name": ZERO_WIDTH_SPACE, "text": "\n".join(c["legendaryHeader"])}
+            )
+        else:
+            legendary.insert(
+                0,
+                {
+                    "name": ZERO_WIDTH_SPACE,
+                    "text": LEGENDARY_HEADER.replace("{@}", c["name"])
+                }
+            )
+        return legendary
+    return None
+
+def speed_entry(mode, speed):
+    # Either a number of feet, or one with a condition, e.g.
+    # {"number": 60, "condition": "(hover)"}.
+    if type(speed) is int:
+        return f"{mode} {speed} ft."
+    text = f"{mode} {speed['number']} ft."
+    condition = speed.get("condition")
+    return f"{text} {condition}" if condition else text
+
+def parse_speed(speed, name=None):
+    entries = []
+    for s in speed:
+        try:
+            if type(speed[s]) is bool:
+                continue
+            elif s == "choose":
+                text = f"choose from {', '.join(speed[s]['from'])} " \
+                    f"{speed[s]['amount']} ft."
+                note = speed[s].get("note")
+                entries.append(f"{text} {note}" if note else text)
+            elif s == "alternate":
+                # Other speeds of each mode, e.g. in another form.
+                entries.extend([
+                    speed_entry(mode, alternate)
+                    for mode, alternates in speed[s].items()
+                    for alternate in alternates
+                ])
+            else:
+                entries.append(speed_entry(s, speed[s]))
+        except (KeyError, TypeError, AttributeError):
+            # Left out, rather than lose the rest of the creature.
+            stats.error(f"Don't know how to handle speed {s} of {name}: "
+                f"{speed[s]!r}")
+    return ", ".join(entries)
+
+def parse_creature(c):
+    d = {k: c.get(k) for k in
+        [
+            "name",
+            "size",
+            "type",
+            "str",
+            "dex",
+            "con",
+            "int",
+            "wis",
+            "cha",
+            "languages",
+            "cr",
+            "speed",
+            "save",
+            "skill",
+            "senses"
+        ]
+    }
+
+    d["saves"] = d["save"]
+    del d["save"]
+    d["skills"] = d["skill"]
+    del d["skill"]
+
+    timed = stats.timed
+    d["size"] = get_size(c)
+    d["ac"] = timed("parse.ac", get_ac, c)
+    d["hp"] = get_hp(c["hp"])
+    d["alignment"] = get_alignment(c)
+    d["speed"] = timed(
+        "parse.speed",
+        parse_speed,
+        c.get("speed", {}),
+        c["name"]
+    )
+    d["traits"] = timed("parse.traits", parse_traits, c.get("trait", []))
+    d["actions"] = timed("parse.actions", parse_traits, c.get("action", []))
+    d["legendary_actions"] = timed(
+        "parse.legendary_actions",
+        parse_legendary_actions,
+        c
+    )
+
+    return d
+
+def parse_creatures(creatures):
+    """Parses each creature on its own, so one that fails doesn't take the
+    rest with it. Returns the records in order, and (name, source, traceback)
+    of each creature that failed. Copies must already be resolved."""
+
+    out = []
+    errors = []
+    for c in creatures:
+        try:
+            out.append(parse_creature(c))
+        except Exception as e:
+            error = "".join(traceback.format_exception(e))
+            errors.append((c.get("name"), c.get("source"), error))
+            continue
+        stats.log("Parsed ", c["name"], level=VERBOSE)
+    return out, errors
+
+def parse_json(creatures):
+    # Copies may only be of other creatures in creatures.
+    resolver = CopyResolver()
+    resolver.add(None, creatures)
+    resolved, unresolved, _ = resolver.resolve_book(creatures)
+    out, errors = parse_creatures(resolved)
+    for name, source, error in unresolved + errors:
+        stats.error(error + f"Occurred when parsing {name} ({source})")
+    return out
+
+def parse_book(creatures):
+    out, errors = stats.timed("parse", parse_creatures, creatures)
+    stats.count("creatures.parsed", len(out))
+    return out, errors
+
+def parse_book_in_worker(creatures):
+    # Runs in a worker process, so sends its stats back with the results.
+    stats.reset()
+    return parse_book(creatures), stats.snapshot()
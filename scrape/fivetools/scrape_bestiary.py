@@ -0,0 +1,280 @@
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import traceback
+
+from spells_data import filters, search
+
+from .. import compact
+from ..instrument import Run, add_arguments, stats
+from ..output import FORMATS, with_format
+from ..version import parser_version
+from . import common, copies, parse_bestiary
+from .cache import CACHE_DIR, DiskCache, content_hash
+from .copies import CopyResolver
+from .manifest import Manifest
+
+ROOT_URL = "https://5e.tools/data/bestiary/"
+VERSION = "?v=1.122.8"
+
+OUTFILE = "out.json"
+# Creatures that failed to parse, written next to the output.
+ERRORS_SUFFIX = ".errors.json"
+
+def parse_later(pool, creatures):
+    """Starts parsing a book in pool, or parses it here without one. Either
+    way, returns a future of its (records, errors) and the stats of the
+    worker that parsed it, if any."""
+
+    if pool is not None:
+        return pool.submit(parse_bestiary.parse_book_in_worker, creatures)
+    return done(parse_bestiary.parse_book(creatures))
+
+def done(result):
+    future = concurrent.futures.Future()
+    future.set_result((result, None))
+    return future
+
+def read_book(content):
+    # The creatures in a book, or the traceback of why they can't be read.
+    try:
+        return stats.timed("decode", json.loads, content)["monster"], None
+    except Exception as e:
+        return None, "".join(traceback.format_exception(e))
+
+def has_copies(creatures):
+    return any("_copy" in c for c in creatures)
+
+def save_errors(outfile, errors):
+    path = os.path.splitext(outfile)[0] + ERRORS_SUFFIX
+    if errors:
+        with open(path, "w") as f:
+            json.dump(errors, f, indent=4)
+    elif os.path.isfile(path):
+        os.remove(path)
+
+def main():
+    # Imported here so that importing the parsers doesn't load requests.
+    from .fetch import Fetcher
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root-url", default=ROOT_URL)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument(
+        "--parse-jobs",
+        type=int,
+        default=1,
+        help="processes to parse books in while the rest are fetched"
+    )
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--format", choices=FORMATS, default="json")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="also export the output in the compact format"
+    )
+    parser.add_argument(
+        "--columns",
+        action="store_true",
+        help="also export the creatures' stats as NumPy arrays"
+    )
+    parser.add_argument(
+        "--max-age",
+        type=int,
+        default=0,
+        help="seconds to use cached books without revalidating them"
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    outfile = with_format(OUTFILE, args.format)
+    with Run(args, outfile):
+        with stats.stage("previous"):
+            manifest = Manifest(
+                outfile,
+                parser_version(
+                    parse_bestiary.__file__,
+                    common.__file__,
+                    copies.__file__
+                )
+            )
+        pool = None
+        if args.parse_jobs > 1:
+            pool = concurrent.futures.ProcessPoolExecutor(args.parse_jobs)
+
+        # Copies can be of creatures in any book, so every book is indexed
+        # as it's fetched. Books without copies are parsed straight away,
+        # and the rest as soon as the books they copy from are in.
+        resolver = CopyResolver()
+        digests = {}
+        # Books with copies waiting on their bases, by their place in the
+        # index, with their creatures, errors, and the keys they wait on.
+        deferred = {}
+
+        # (book, digest, errors resolving its copies, future of its records)
+        # in the order of the index, with None for a deferred book, from the
+        # first not yet written. Each book is written once it and all the
+        # books before it are parsed, so the output comes out the same
+        # however the parsing is spread out, and only the books waiting on
+        # one before them are held in memory.
+        books = collections.deque()
+        written = 0
+        errors = []
+
+        def start(book, digest, creatures, unresolved):
+            previous = manifest.get(book, digest)
+            if previous is None:
+                future = parse_later(pool, creatures)
+            else:
+                stats.count("books.reused")
+                future = done((previous, []))
+            return book, digest, unresolved, future
+
+        def resolve(i):
+            book, creatures, failures, _ = deferred.pop(i)
+            resolved, unresolved, sources = stats.timed(
+                "resolve",
+                resolver.resolve_book,
+                creatures
+            )
+            # The book's records depend on the books it copies from too.
+            digest = digests[book]
+            for other in sorted(sources - {book}):
+                digest = content_hash((digest + digests[other]).encode())
+            books[i - written] = start(
+                book,
+                digest,
+                resolved,
+                failures + unresolved
+            )
+
+        def write(book, digest, unresolved, future):
+            try:
+                (parsed, failed), snapshot = stats.timed("wait", future.result)
+            except Exception as e:
+                error = "".join(traceback.format_exception(e))
+                stats.error(error + "Occurred when parsing " + book)
+                errors.append({
+                    "book": book,
+                    "name": None,
+                    "source": None,
+                    "error": error
+                })
+                return
+            if snapshot is not None:
+                stats.merge(snapshot)
+            failed = unresolved + failed
+            for name, source, error in failed:
+                if name is None:
+                    stats.error(error + "Occurred when reading " + book)
+                else:
+                    stats.error(
+                        error + f"Occurred when parsing {name} ({source})"
+                    )
+                errors.append({
+                    "book": book,
+                    "name": name,
+                    "source": source,
+                    "error": error
+                })
+            # A book with failures is parsed again next time, to report them.
+            with stats.stage("write"):
+                manifest.add(book, None if failed else digest, parsed)
+
+        def flush(wait):
+            # Writes the books at the front which are parsed, or waits for
+            # them to be, until one that's deferred.
+            nonlocal written
+            while books and books[0] is not None and \
+                (wait or books[0][3].done()):
+                write(*books.popleft())
+                written += 1
+
+        cache = DiskCache(args.cache_dir, max_age=args.max_age)
+        with Fetcher(workers=args.jobs, cache=cache) as fetcher:
+            index = stats.timed(
+                "fetch",
+                fetcher.get_json,
+                args.root_url + "index.json" + VERSION
+            )
+            urls = [args.root_url + f + VERSION for f in index.values()]
+            fetched = stats.iterate("fetch", fetcher.get_all(urls))
+            for i, ((url, content, error), book) in \
+                enumerate(zip(fetched, index)):
+                flush(False)
+                # Errors are reported along with the rest of the book's, and
+                # a book with any is parsed again next time.
+                failures = []
+                if error:
+                    failures.append(
+                        (None, None, f"Couldn't fetch {url}: {error!r}\n")
+                    )
+                    content, previous = manifest.fallback(book, url, cache)
+                    if content is None:
+                        books.append(
+                            (book, None, failures, done((previous or [], [])))
+                        )
+                        continue
+                stats.log("Loading book", book)
+                stats.count("books")
+
+                digest = content_hash(content)
+                creatures, error = read_book(content)
+                if error is not None:
+                    failures.append((None, None, error))
+                    books.append((book, None, failures, done(([], []))))
+                    continue
+                digests[book] = digest
+                resolver.add(book, creatures)
+                if has_copies(creatures):
+                    deferred[i] = (book, creatures, failures, None)
+                    books.append(None)
+                else:
+                    books.append(start(book, digest, creatures, failures))
+
+                added = {copies.key_of(c) for c in creatures}
+                for j, (other, waiting, failed, keys) in \
+                    list(deferred.items()):
+                    if keys is None or keys & added:
+                        keys = resolver.waiting_on(waiting)
+                        deferred[j] = (other, waiting, failed, keys)
+                    if not keys:
+                        resolve(j)
+
+        # Those still waiting copy creatures that don't exist, which is
+        # reported as they're resolved.
+        for i in sorted(deferred):
+            resolve(i)
+        flush(True)
+        if pool is not None:
+            pool.shutdown()
+        stats.count(
+            "creatures.failed",
+            sum(1 for e in errors if e["name"] is not None)
+        )
+
+        with stats.stage("write"):
+            save_errors(outfile, errors)
+        manifest.exit_if_missing()
+        with stats.stage("write"):
+            manifest.save()
+        with stats.stage("export.filters"):
+            filters.export(outfile)
+        with stats.stage("export.search"):
+            search.export(outfile)
+        if args.compact:
+            with stats.stage("export.compact"):
+                compact.export(outfile)
+        if args.columns:
+            # Imported here as NumPy is only needed for the columns.
+            from spells_data import columns
+            with stats.stage("export.columns"):
+                columns.export(outfile)
+        stats.count("creatures", manifest.count)
+
+    stats.log(f"Parsed {manifest.count} creatures, saved to {outfile}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+import argparse
+import json
+import os
+import re
+import traceback
+
+from spells_data import filters, search
+
+from .. import compact
+from ..instrument import VERBOSE, Run, add_arguments, stats
+from ..output import FORMATS, with_format
+from ..version import parser_version
+from . import common
+from .cache import CACHE_DIR, DiskCache, content_hash
+from .common import sub_tags
+from .manifest import Manifest
+
+ROOT_URL = "https://5e.tools/data/spells/"
+
+OUTDIR = "out"
+OUTFILE = os.path.join(OUTDIR, "scraped.json")
+
+# Map single character schools used by 5etools to full word schools used in
+# spells.json
+SCHOOL_MAPPING = {
+    "A": "Abjuration",
+    "C": "Conjuration",
+    "D": "Divination",
+    "E": "Enchantment",
+    "I": "Illusion",
+    "N": "Necromancy",
+    "T": "Transmutation",
+    "V": "Evocation"
+}
+
+# Map time units used by 5etools to those used in spells.json
+CAST_TIME_MAPPING = {
+    "bonus": "Bonus Action"
+}
+
+# Seconds in each unit of time 5etools gives cast times and durations in.
+SECONDS = {
+    "round": 6,
+    "minute": 60,
+    "hour": 60 * 60,
+    "day": 24 * 60 * 60,
+    "week": 7 * 24 * 60 * 60,
+    "year": 365 * 24 * 60 * 60
+}
+
+# Feet in each unit of distance.
+FEET = {
+    "feet": 1,
+    "miles": 5280
+}
+
+# Range types which are the shape of an area around the caster.
+AREA_SHAPES = ["radius", "sphere", "hemisphere", "cone", "line", "cube"]
+
+BULLET_POINT = "\u2022"
+
+# maximum number of cells in a table row before we just use dotpoints instead
+MAX_CELL_CHARACTERS = 32
+
+def parse_cast_time(spell):
+    cast_time_info = spell["time"][0]
+    n = cast_time_info["number"]
+    unit = cast_time_info["unit"]
+
+    if unit in CAST_TIME_MAPPING:
+        unit = CAST_TIME_MAPPING[unit]
+    else:
+        unit = unit.capitalize()
+
+    ret = f"{n} {unit}" 
+
+    # 10 Minute -> 10 Minutes
+    if n > 1:
+        ret += "s"
+
+    return ret
+
+def parse_range(spell):
+    rnge = spell["range"]
+    dst = rnge.get("distance", {})
+
+    if rnge["type"] == "point":
+        if dst["type"] == "touch":
+            return "Touch"
+        elif dst["type"] == "self":
+            return "Self"
+        elif dst["type"] == "sight":
+            return "Sight"
+        elif dst["type"] == "unlimited":
+            return "Unlimited"
+        elif dst["type"] == "feet":
+            return str(dst["amount"]) + " feet"
+        elif dst["type"] == "miles":
+            if dst["amount"] == 1:
+                return "1 mile"
+            else:
+                return str(dst["amount"]) + " miles"
+    elif rnge["type"] == "radius":
+        if dst["type"] == "feet":
+            return "Self (" + str(dst["amount"]) + "-foot radius)"
+        elif dst["type"] == "miles":
+            return "Self (" + str(dst["amount"]) + "-mile radius)"
+    elif rnge["type"] == "sphere":
+        return "Self (" + str(dst["amount"]) + "-foot-radius sphere)"
+    elif rnge["type"] == "hemisphere":
+        return "Self (" + str(dst["amount"]) + "-foot-radius hemisphere)"
+    elif rnge["type"] == "cone":
+        if dst["type"] == "feet":
+            return "Self (" + str(dst["amount"]) + "-foot cone)"
+    elif rnge["type"] == "line":
+        if dst["type"] == "feet":
+            return "Self (" + str(dst["amount"]) + "-foot line)"
+    elif rnge["type"] == "cube":
+        if dst["type"] == "feet":
+            return "Self (" + str(dst["amount"]) + "-foot cube)"
+    elif rnge["type"] == "special":
+        return "Special"
+
+    stats.error(f"Couldn't parse range for {spell['name']}: ", rnge)
+    return ""
+
+def parse_components(spell):
+    comps = spell["components"]
+    
+    ret = ""
+    for c in ["v", "s"]:
+        if c in comps:
+            if ret:
+                ret += ", "
+            ret += c.upper()
+
+    if "m" in comps:
+        if ret:
+            ret += ", "
+
+        if isinstance(comps["m"], dict):
+            ret += "M (" + comps["m"]["text"] + ")"
+        elif isinstance(comps["m"], str):
+            ret += "M (" + comps["m"] + ")"
+        else:
+            stats.error(
+                "Failed to parse components for " + spell["name"] + ":",
+                comps
+            )
+
+    if ret[-2:] == ", ":
+        return ret[:-2]
+
+    return ret
+
+def parse_duration(spell):
+    durn = spell["duration"][0]
+
+    if durn["type"] == "timed":
+        n = durn["duration"]["amount"]
+        unit = durn["duration"]["type"]
+
+        ret = f"{n} {unit}"
+        if n > 1:
+            ret += "s"
+        
+        if durn.get("concentration"):
+            return "Concentration, up to " + ret
+        return ret
+    elif durn["type"] == "instant":
+        return "Instantaneous"
+    elif durn["type"] == "permanent":
+        if "ends" in durn:
+            if "dispel" in durn["ends"]:
+                return "Until dispelled"
+        return "Permanent"
+    elif durn["type"] == "special":
+        return "Special"
+
+# The same fields as the strings above, as values to filter and sort by. Units
+# are 5etools' own, e.g. "bonus" for a bonus action.
+
+def parse_cast_time_values(spell):
+    cast_time_info = spell["time"][0]
+    n = cast_time_info["number"]
+    unit = cast_time_info["unit"]
+    return {
+        "amount": n,
+        "unit": unit,
+        # Actions take no time of their own, so have no seconds.
+        "seconds": n * SECONDS[unit] if unit in SECONDS else None,
+        "condition": cast_time_info.get("condition")
+    }
+
+def parse_range_values(spell):
+    rnge = spell["range"]
+    dst = rnge.get("distance", {})
+    n = dst.get("amount")
+    unit = dst.get("type")
+    return {
+        # Of the area for shapes, which are all around the caster.
+        "distance": n,
+        "unit": unit,
+        "feet": n * FEET[unit] if n is not None and unit in FEET else None,
+        "shape": rnge["type"] if rnge["type"] in AREA_SHAPES else None
+    }
+
+def parse_components_values(spell):
+    comps = spell["components"]
+    m = comps.get("m")
+    if isinstance(m, dict):
+        material = m["text"]
+    elif isinstance(m, str):
+        material = m
+    else:
+        material = None
+    return {
+        "v": "v" in comps,
+        "s": "s" in comps,
+        "m": material is not None,
+        "material": material,
+        # In copper pieces. consumed is "optional" for some materials.
+        "cost": m.get("cost") if isinstance(m, dict) else None,
+        "consumed": m.get("consume", False) if isinstance(m, dict) else False
+    }
+
+def parse_duration_values(spell):
+    durn = spell["duration"][0]
+    n = None
+    unit = None
+    if durn["type"] == "timed":
+        n = durn["duration"]["amount"]
+        unit = durn["duration"]["type"]
+    return {
+        "type": durn["type"],
+        "amount": n,
+        "unit": unit,
+        "seconds": n * SECONDS[unit] if unit in SECONDS else None,
+        "concentration": durn.get("concentration", False),
+        "ends": durn.get("ends", [])
+    }
+
+def parse_values(spell):
+    return {
+        "cast": parse_cast_time_values(spell),
+        "range": parse_range_values(spell),
+        "components": parse_components_values(spell),
+        "duration": parse_duration_values(spell)
+    }
+
+def pad_all_to_max_length(strings):
+    l = max(len(s) for s in strings)
+    return [s.ljust(l) for s in strings]
+
+def parse_cell(cell):
+    if isinstance(cell, str):
+        return cell
+    elif isinstance(cell, dict):
+        if cell["type"] == "cell":
+            r = cell["roll"]
+            if "exact" in r:
+                return str(r["exact"])
+            
+            ret = ""
+            if "min" in r:
+                ret += str(r["min"]) + "-"
+            if "max" in r:
+                if not ret:
+                    ret = "-"
+                ret += str(r["max"])
+            return ret
+    
+    stats.error("Failed to parse cell:", cell)
+    raise ValueError
+
+def format_as_dotpoints(cols):
+    ret = ""
+    
+    for i in range(len(cols[0])):
+        ret += BULLET_POINT + " " + cols[0][i] + ": "
+        for j in range(1, len(cols)):
+            ret += cols[j][i] + " "
+        ret = ret[:-1]
+
+    return ret
+
+def format_as_table(cols):
+    ret = ""
+    cols = list(map(pad_all_to_max_length, cols))
+    for i in range(len(cols[0])):
+        for j in range(len(cols)):
+            ret += cols[j][i] + " "
+        ret = ret[:-1] + "\n"
+    return f"```\n{ret}```"
+
+def format_table(entry):
+    rows = [entry["colLabels"]] + entry["rows"]
+    cols = [
+        [sub_tags(parse_cell(row[i])) for row in rows]
+        for i in range(len(rows[0]))
+    ]
+
+    as_dotpoints = False
+    for col in cols:
+        done = False
+        for row in col:
+            if len(row) > MAX_CELL_CHARACTERS:
+                as_dotpoints = True
+                done = True
+                break
+        if done:
+            break
+
+    if "caption" in entry:
+        ret = entry["caption"] + "\n"
+    else:
+        ret = ""
+
+    if as_dotpoints:
+        return ret + format_as_dotpoints(cols)
+    else:
+        return ret + format_as_table(cols)
+
+def parse_entries(spell):
+    ret = ""
+    for e in spell["entries"]:
+        if isinstance(e, str):
+            ret += sub_tags(e)
+        elif e["type"] == "table":
+            ret += format_table(e)
+        elif e["type"] == "entries":
+            ret += e["name"] + ": " + parse_entries(e)
+        elif e["type"] == "list":
+            return "\n".join(BULLET_POINT + " " + sub_tags(i) for i in e["items"])
+        elif e["type"] == "quote":
+            continue
+        else:
+            stats.error("Don't know how to handle type: " + e["type"])
+            return ""
+
+        ret += "\n\n"
+
+    ret = re.sub(r"\n{3,}", "\n\n", ret)
+    ret = re.sub(r"\n+$", "", ret)
+
+    return ret
+
+def parse_spell(spell, structured=False):
+    # With structured, the cast time, range, components and duration are
+    # also given as values, under "structured".
+    timed = stats.timed
+    record = {
+        "name": spell["name"],
+        "school": SCHOOL_MAPPING[spell["school"]],
+        "level": spell["level"],
+        "cast": timed("parse.cast", parse_cast_time, spell),
+        "range": timed("parse.range", parse_range, spell),
+        "components": timed("parse.components", parse_components, spell),
+        "duration": timed("parse.duration", parse_duration, spell),
+        "description": timed("parse.description", parse_entries, spell),
+        "ritual": spell.get("meta", {}).get("ritual", False),
+        "classes": [
+            c["name"] for c in spell.get("classes", {}).get("fromClassList", [])
+        ],
+        "subclasses": [
+            c["class"]["name"] + " (" + c["subclass"]["name"] + ")"
+            for c in spell.get("classes", {}).get("fromSubclass", [])
+        ],
+        "alt_names": [spell["srd"]] if isinstance(spell.get("srd"), str) else []
+    }
+    if structured:
+        record["structured"] = timed("parse.structured", parse_values, spell)
+    return record
+
+def main():
+    # Imported here so that importing the parsers doesn't load requests,
+    # which takes longer than everything else they need together.
+    from .fetch import Fetcher
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root-url", default=ROOT_URL)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--format", choices=FORMATS, default="json")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="also export the output in the compact format"
+    )
+    parser.add_argument(
+        "--structured",
+        action="store_true",
+        help="also give each spell's cast time, range, components and "
+            "duration as numbers and flags"
+    )
+    parser.add_argument(
+        "--max-age",
+        type=int,
+        default=0,
+        help="seconds to use cached books without revalidating them"
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if not os.path.isdir(OUTDIR):
+        os.mkdir(OUTDIR)
+
+    outfile = with_format(OUTFILE, args.format)
+    version = parser_version(__file__, common.__file__)
+    if args.structured:
+        # So records parsed without it aren't reused, and vice versa.
+        version += "+structured"
+    with Run(args, outfile):
+        with stats.stage("previous"):
+            manifest = Manifest(outfile, version)
+        cache = DiskCache(args.cache_dir, max_age=args.max_age)
+        with Fetcher(workers=args.jobs, cache=cache) as fetcher:
+            index = stats.timed(
+                "fetch",
+                fetcher.get_json,
+                args.root_url + "index.json"
+            )
+            urls = [args.root_url + index[book] for book in index]
+
+            books = stats.iterate("fetch", fetcher.get_all(urls))
+            for (url, content, error), book in zip(books, index):
+                if error:
+                    stats.error("Failed to fetch", url, error)
+                    content, previous = manifest.fallback(book, url, cache)
+                    if content is None:
+                        if previous is not None:
+                            # Without a hash, so they're never taken as
+                            # current.
+                            with stats.stage("write"):
+                                manifest.add(book, None, previous)
+                        continue
+                stats.log("Loading book", book)
+                stats.count("books")
+
+                # Books unchanged since the last run needn't be parsed again.
+                digest = content_hash(content)
+                parsed = manifest.get(book, digest)
+                if parsed is not None:
+                    stats.count("books.reused")
+                    with stats.stage("write"):
+                        manifest.add(book, digest, parsed)
+                    continue
+
+                parsed = []
+                data = stats.timed("decode", json.loads, content)
+                for spell in data["spell"]:
+                    try:
+                        parsed.append(stats.timed(
+                            "parse",
+                            parse_spell,
+                            spell,
+                            args.structured
+                        ))
+                        stats.log("Parsed ", spell["name"], level=VERBOSE)
+                    except:
+                        stats.error("Failed to parse ", spell["name"])
+                        traceback.print_exc()
+                        exit(1)
+                stats.count("spells.parsed", len(parsed))
+                with stats.stage("write"):
+                    manifest.add(book, digest, parsed)
+
+        manifest.exit_if_missing()
+        with stats.stage("write"):
+            manifest.save()
+        with stats.stage("export.filters"):
+            filters.export(outfile)
+        with stats.stage("export.search"):
+            search.export(outfile)
+        if args.compact:
+            with stats.stage("export.compact"):
+                compact.export(outfile)
+        stats.count("spells", manifest.count)
+
+    stats.log(f"Parsed {manifest.count} spells, saved to {outfile}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+# How much the scrapers print. Errors are always printed, to stderr.
+QUIET = 0
+NORMAL = 1
+VERBOSE = 2
+
+# Functions and allocation sites listed in the summary of a profiled run.
+TOP = 25
+
+SUFFIX = ".stats.json"
+
+class Stats:
+    """Time spent in each stage of a run and how many times it ran, along
+    with counters of what went through it.
+
+    Stages are named like "parse.description" and may nest, so the time of
+    a stage includes that of any stages within it. The scrapers share the
+    module level instance, stats.
+    """
+
+    def __init__(self):
+        self.verbosity = NORMAL
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+
+    def add(self, name, seconds, calls=1):
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = [seconds, calls]
+        else:
+            stage[0] += seconds
+            stage[1] += calls
+
+    def timed(self, name, fn, *args):
+        """Calls fn(*args), adding the time it takes to stage name. Cheaper
+        than a context manager, for stages run once per record."""
+
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def stage(self, name):
+        return Stage(self, name)
+
+    def iterate(self, name, iterable):
+        """Yields the items of iterable, adding the time spent waiting for
+        each to stage name."""
+
+        it = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self.add(name, time.perf_counter() - start)
+            yield item
+
+    def count(self, name, n=1):
+        # Counted from the fetcher's threads too.
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def log(self, *args, level=NORMAL):
+        if self.verbosity >= level:
+            print(*args)
+
+    def error(self, *args):
+        self.count("errors")
+        print(*args, file=sys.stderr)
+
+    def snapshot(self):
+        return {"stages": self.stages, "counters": self.counters}
+
+    def merge(self, snapshot):
+        # Stats collected in another process, e.g. a parser worker.
+        for name, (seconds, calls) in snapshot["stages"].items():
+            self.add(name, seconds, calls)
+        for name, n in snapshot["counters"].items():
+            self.count(name, n)
+
+    def summary(self):
+        return {
+            "elapsed": time.perf_counter() - self.started,
+            "stages": {
+                name: {"seconds": seconds, "calls": calls}
+                for name, (seconds, calls) in sorted(self.stages.items())
+            },
+            "counters": dict(sorted(self.counters.items()))
+        }
+
+class Stage:
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.add(self.name, time.perf_counter() - self.start)
+
+stats = Stats()
+
+def add_arguments(parser):
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "-q", "--quiet",
+        action="store_const",
+        const=QUIET,
+        dest="verbosity",
+        default=NORMAL,
+        help="only print errors"
+    )
+    group.add_argument(
+        "-v", "--verbose",
+        action="store_const",
+        const=VERBOSE,
+        dest="verbosity",
+        help="print every record as it's parsed"
+    )
+    parser.add_argument(
+        "--stats",
+        help="where to write the summary of the run, - for stdout (default: "
+            "next to the output as <name>" + SUFFIX + ")"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="profile the run, adding the slowest functions to the summary"
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="trace allocations, adding the largest to the summary"
+    )
+
+def stats_path(outfile):
+    return os.path.splitext(outfile)[0] + SUFFIX
+
+class Run:
+    """Instruments a run of a scraper configured by the arguments from
+    add_arguments, writing the summary when it ends.
+
+        with Run(args, outfile):
+            ...
+    """
+
+    def __init__(self, args, outfile):
+        self.args = args
+        self.path = args.stats or stats_path(outfile)
+        self.profiler = None
+
+    def __enter__(self):
+        stats.reset()
+        stats.verbosity = self.args.verbosity
+        if self.args.trace_memory:
+            tracemalloc.start()
+        if self.args.profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return stats
+
+    def __exit__(self, exc_type, exc, tb):
+        summary = stats.summary()
+        if self.profiler is not None:
+            self.profiler.disable()
+            summary["profile"] = profile_summary(self.profiler)
+        if self.args.trace_memory:
+            summary["memory"] = memory_summary()
+            tracemalloc.stop()
+        if exc_type is not None:
+            summary["failed"] = repr(exc)
+
+        if self.path == "-":
+            json.dump(summary, sys.stdout, indent=4)
+            print()
+        else:
+            with open(self.path, "w") as f:
+                json.dump(summary, f, indent=4)
+            print_summary(summary)
+
+def profile_summary(profiler):
+    listing = pstats.Stats(profiler, stream=io.StringIO())
+    functions = []
+    for (path, line, name), (_, calls, own, total, _) in \
+        listing.stats.items():
+        functions.append({
+            "function": f"{os.path.basename(path)}:{line}({name})",
+            "calls": calls,
+            "own": own,
+            "total": total
+        })
+    functions.sort(key=lambda f: f["own"], reverse=True)
+    return functions[:TOP]
+
+def memory_summary():
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, cProfile.__file__),
+        tracemalloc.Filter(False, tracemalloc.__file__)
+    ])
+    top = snapshot.statistics("lineno")[:TOP]
+    return {
+        "current": current,
+        "peak": peak,
+        "top": [
+            {"line": str(s.traceback), "size": s.size, "count": s.count}
+            for s in top
+        ]
+    }
+
+def print_summary(summary):
+    if stats.verbosity < NORMAL:
+        return
+    print(f"Finished in {summary['elapsed']:.2f}s")
+    for name, stage in summary["stages"].items():
+        print(f"  {name:<24} {stage['seconds']:>8.3f}s {stage['calls']:>8}")
+    for name, n in summary["counters"].items():
+        print(f"  {name:<24} {n:>18}")
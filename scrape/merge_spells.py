@@ -1,35 +1,98 @@
+import argparse
 import json
 import os
-import sys
 
-PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__)) 
+from spells_data import filters, search
+
+from . import compact
+from .instrument import Run, add_arguments, stats
+from .output import FORMATS, RecordWriter, read_records, with_format
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MASTER = os.path.join(PROJECT_ROOT, "spells.json")
 
-# usage: python merge.py file.json other.json third.json
-merge_files = sys.argv[1:]
+def normalise(name):
+    return " ".join(name.replace("\u2019", "'").casefold().split())
+
+def aliases(spell):
+    return {normalise(n) for n in [spell["name"]] + spell["alt_names"]}
+
+def merge(master, others):
+    """Adds each of others to master unless it's already there by its name
+    or one of its alt names, ignoring case, spacing and the style of
+    apostrophes. One matching several master spells is reported as a
+    conflict, and left out."""
+
+    # Normalised name or alt name -> indices of the master spells with it.
+    index = {}
 
-with open(MASTER, "r") as f:
-    master = json.load(f)
+    def add_to_index(i):
+        for alias in aliases(master[i]):
+            index.setdefault(alias, []).append(i)
 
-others = []
-for fp in merge_files:
-    with open(fp, "r") as f:
-        others.extend(json.load(f))
+    for i in range(len(master)):
+        add_to_index(i)
 
-for a in others:
-    for b in master:
-        if (
-            set([a["name"]] + a["alt_names"]).intersection(
-                set([b["name"]] + b["alt_names"])
+    for a in others:
+        matches = set()
+        for alias in aliases(a):
+            matches.update(index.get(alias, []))
+
+        if not matches:
+            stats.log("Adding to master list:", a["name"])
+            stats.count("spells.added")
+            master.append(a)
+            add_to_index(len(master) - 1)
+        elif len(matches) > 1:
+            stats.error(
+                "Conflict:", a["name"], "matches",
+                ", ".join(master[i]["name"] for i in sorted(matches))
             )
-        ):
-            break
-    else:
-        print("Adding to master list:", a["name"])
-        master.append(a)
+            stats.count("spells.conflicts")
+        else:
+            stats.count("spells.matched")
+    return master
+
+def main():
+    # usage: python -m scrape.merge_spells file.json other.json third.json
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--format", choices=FORMATS, default="json")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="also export the output in the compact format"
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    outfile = with_format(
+        os.path.join(PROJECT_ROOT, "merged_spells.json"),
+        args.format
+    )
+    with Run(args, outfile):
+        with stats.stage("read"):
+            with open(MASTER, "r") as f:
+                master = json.load(f)
+            others = []
+            for fp in args.files:
+                others.extend(read_records(fp))
+
+        master = stats.timed("merge", merge, master, others)
 
+        with stats.stage("write"):
+            with RecordWriter(outfile, sort_key=lambda s: s["name"]) as writer:
+                writer.write_all(master)
+        with stats.stage("export.filters"):
+            filters.export(outfile)
+        with stats.stage("export.search"):
+            search.export(outfile)
+        if args.compact:
+            with stats.stage("export.compact"):
+                compact.export(outfile)
+        stats.count("spells", writer.count)
 
-master = sorted(master, key=lambda s: s["name"])
+    stats.log(f"Merged {writer.count} spells, saved to {outfile}")
 
-with open(os.path.join(PROJECT_ROOT, "merged_spells.json"), "w") as f:
-    json.dump(master, f, indent=4)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import json
+import mmap
+import os
+import tempfile
+
+from spells_data.reader import record_spans
+
+# Output formats, chosen by the extension of the output file. "json" is an
+# indented array, as json.dump(records, f, indent=4) would write, and "jsonl"
+# is one record per line.
+FORMATS = {"json": ".json", "jsonl": ".jsonl"}
+
+INDENT = 4
+
+def format_of(path):
+    return "jsonl" if path.endswith(FORMATS["jsonl"]) else "json"
+
+def with_format(path, fmt):
+    return os.path.splitext(path)[0] + FORMATS[fmt]
+
+def read_records(path):
+    with open(path, "r") as f:
+        if format_of(path) == "jsonl":
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+class RecordReader:
+    """Reads the records of an output one at a time, from a memory map of it,
+    rather than loading the whole list as read_records does."""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        if os.fstat(self.file.fileno()).st_size:
+            self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.buf = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def spans(self):
+        """Yields the (start, end) offsets of each record, in order."""
+
+        return record_spans(self.buf)
+
+    def read(self, span):
+        start, end = span
+        return json.loads(self.buf[start:end])
+
+    def __iter__(self):
+        for span in self.spans():
+            yield self.read(span)
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self.file.close()
+
+class RecordWriter:
+    """Writes records to path as they're produced instead of dumping a list
+    at the end.
+
+    Records go to path + ".partial", which is renamed over path once every
+    record has been written, so a failed run never replaces a good output
+    and leaves what it managed to write behind. If sort_key is given,
+    records are spooled to a temporary file and only their keys are kept in
+    memory, then written out in sorted order on close.
+    """
+
+    def __init__(self, path, sort_key=None):
+        self.path = path
+        self.partial = path + ".partial"
+        self.format = format_of(path)
+        self.sort_key = sort_key
+        self.count = 0
+
+        self.file = open(self.partial, "w")
+        if sort_key is not None:
+            self.spool = tempfile.TemporaryFile("w+b")
+            self.keys = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    def write(self, record):
+        if self.sort_key is None:
+            self.emit(record)
+            return
+
+        line = json.dumps(record).encode() + b"\n"
+        self.keys.append((self.sort_key(record), self.spool.tell(), len(line)))
+        self.spool.write(line)
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def emit(self, record):
+        if self.format == "jsonl":
+            self.file.write(json.dumps(record) + "\n")
+        else:
+            text = json.dumps(record, indent=INDENT)
+            prefix = "[\n" if self.count == 0 else ",\n"
+            self.file.write(prefix + indent(text))
+        self.count += 1
+
+    def close(self):
+        if self.sort_key is not None:
+            # Stable, so records with equal keys keep the order written.
+            self.keys.sort(key=lambda k: k[0])
+            for _, offset, length in self.keys:
+                self.spool.seek(offset)
+                self.emit(json.loads(self.spool.read(length)))
+            self.spool.close()
+
+        if self.format == "json":
+            self.file.write("\n]" if self.count else "[]")
+        self.file.close()
+        os.replace(self.partial, self.path)
+
+def indent(text):
+    pad = " " * INDENT
+    return pad + text.replace("\n", "\n" + pad)
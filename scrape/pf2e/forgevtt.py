@@ -1,11 +1,31 @@
+import argparse
+import collections
+import concurrent.futures
+import functools
+import heapq
+import itertools
 import json
 import math
-import os.path
 import pathlib
-import subprocess
-import tempfile
+import re
 import traceback
-import sys
+from typing import Any, Callable, Iterable, Iterator
+
+from spells_data import filters, search
+
+from .. import compact
+from ..instrument import VERBOSE, Run, add_arguments, stats
+from ..output import FORMATS, RecordReader, RecordWriter, with_format
+from ..version import parser_version
+from .incremental import load_manifest, previous_records, save_manifest
+from .sources import CACHE_DIR, DirectorySource, GitSource, SpellFile, \
+    open_source, spell_name
+
+# Spells can be heightened up to rank 10.
+MAX_RANK = 10
+
+# Files sent to a worker process at a time.
+CHUNK_SIZE = 32
 
 def clean_unicode(text: str) -> str:
     return text.replace('\u2010', '-') \
@@ -16,23 +36,8 @@ def clean_unicode(text: str) -> str:
         .replace('\u00d7', '*')
 
 
-def clone_repository() -> pathlib.Path: 
-    directory = tempfile.mkdtemp()
-    repository = "https://github.com/foundryvtt/pf2e.git"
-    subprocess.check_call(["git", "clone", repository, str(directory)])
-    return pathlib.Path(directory)
-
 def spell_files(repo: pathlib.Path) -> list[pathlib.Path]:
-    files = []
-    spells_dir = repo.joinpath("packs/spells")
-    for entry in os.listdir(spells_dir):
-        dir = spells_dir.joinpath(entry)
-        if os.path.isdir(dir):
-            for entry in os.listdir(dir):
-                file = dir.joinpath(entry)
-                if os.path.isfile(file):
-                    files.append(file)
-    return files
+    return list(DirectorySource(repo).read())
 
 def strip_trailing_brackets(string: str, max: int = 1) -> str:
     i = 0
@@ -65,15 +70,74 @@ def round_off(string: str) -> str:
     else:
         return string
 
-def parse_damage_body(rank: int, text: str) -> str:
-    # Examples:
-    #   @Damage[@item.level[persistent,acid]]
-    #   @Damage[2d8[piercing],2d4[slashing]|options:area-damage]
-    #   @Damage[(1d4+((@item.level)-1))[persistent,electricity]]
-    #   @Damage[(@item.level)d4[persistent,mental]]
-    #   @Damage[(2*ceil(@item.rank/2)-1)[bleed]]
-    # This function accepts the body of the tag.
-    # If item.level or item.rank are present, they should be treated as 1.
+# A compiled operand of a damage formula is either its value, if it doesn't
+# depend on the rank, or a function giving its value at a rank. Values are
+# strings, as a roll such as "2d6" is an operand as much as a number is.
+Operand = str | Callable[[int], str]
+
+DAMAGE_FUNCS = ["ceil", "floor", "ternary", "gte", "max"]
+DAMAGE_OPS = ["+", "-", "*", "/"]
+
+def evaluate(operand: Operand, rank: int) -> str:
+    return operand if isinstance(operand, str) else operand(rank)
+
+def lift(fn: Callable[..., str], *operands: Operand) -> Operand:
+    # fn of the values of operands, computed now if none depend on the rank.
+    if all(isinstance(o, str) for o in operands):
+        return fn(*operands)
+    return lambda rank: fn(*[evaluate(o, rank) for o in operands])
+
+def item_level(rank: int) -> str:
+    return str(rank)
+
+def apply_op(op: str, lhs: str, rhs: str) -> str:
+    if str_is_valid_float(lhs) and str_is_valid_float(rhs):
+        rhs = float(rhs)
+        lhs = float(lhs)
+        if op == "+":
+            return str(lhs + rhs)
+        elif op == "-":
+            return str(lhs - rhs)
+        elif op == "*":
+            return str(lhs * rhs)
+        else:
+            return str(lhs / rhs)
+    elif lhs == "0" or lhs == "0.0":
+        return rhs
+    elif rhs == "0" or rhs == "0.0":
+        return lhs
+    else:
+        return f"{round_off(lhs)} {op} {round_off(rhs)}"
+
+def apply_ceil(val: str) -> str:
+    return str(math.ceil(float(val)))
+
+def apply_floor(val: str) -> str:
+    return str(math.floor(float(val)))
+
+def apply_ternary(boolval: str, if_true: str, if_false: str) -> str:
+    return if_true if boolval == "True" else if_false
+
+def apply_gte(lhs: str, rhs: str) -> str:
+    return str(float(lhs) >= float(rhs))
+
+def apply_max(lhs: str, rhs: str) -> str:
+    return rhs if float(rhs) > float(lhs) else lhs
+
+def prepend_roll(operand: str, roll: str) -> str:
+    return round_off(operand) + roll
+
+@functools.lru_cache(maxsize=4096)
+def compile_damage_body(text: str) -> tuple[tuple[Operand, str], ...]:
+    """Compiles the body of a @Damage tag into its rolls, each a dice
+    expression, which may depend on the rank, and the damage types.
+
+    The formula is only tokenized and run through the shunting yard here,
+    once per distinct formula. Which operations are applied to which
+    operands doesn't depend on the rank, only their values, so those are
+    left as functions of it, and folded now where they don't.
+    """
+
     [text, *_] = text.split("|") # Discard tags.
 
     i = 0
@@ -82,53 +146,28 @@ def parse_damage_body(rank: int, text: str) -> str:
     tok = ""
     rolls = []
 
-    FUNCS = ["ceil", "floor", "ternary", "gte", "max"]
-    OPS = ["+", "-", "*", "/"]
-    XML_ROLLS = True
-
     def finish_tok():
         nonlocal tok
         if not tok:
             return
-        elif tok in FUNCS:
+        elif tok in DAMAGE_FUNCS:
             operator_stack.append(tok)
         elif tok == "@item.level" or tok == "@item.rank":
-            operand_stack.append(str(rank))
+            operand_stack.append(item_level)
         else:
             operand_stack.append(tok)
         tok = ""
 
     def precedence(op) -> int:
-        if op in OPS:
-            return OPS.index(op)
+        if op in DAMAGE_OPS:
+            return DAMAGE_OPS.index(op)
         else:
             return -1
 
     def process_op(op):
         rhs = operand_stack.pop()
         lhs = operand_stack.pop()
-        if str_is_valid_float(lhs) and str_is_valid_float(rhs):
-            rhs = float(rhs)
-            lhs = float(lhs)
-            if op == "+":
-                result = lhs + rhs
-            elif op == "-":
-                result = lhs - rhs
-            elif op == "*":
-                result = lhs * rhs
-            elif op == "/":
-                result = lhs / rhs
-            else:
-                raise Exception(f"Unhandled operator '{op}' in: {text}")
-            operand_stack.append(str(result))
-        elif lhs == "0" or lhs == "0.0":
-            operand_stack.append(rhs)
-        elif rhs == "0" or rhs == "0.0":
-            operand_stack.append(lhs)
-        else:
-            lhs = round_off(lhs)
-            rhs = round_off(rhs)
-            operand_stack.append(f"{lhs} {op} {rhs}")
+        operand_stack.append(lift(lambda l, r: apply_op(op, l, r), lhs, rhs))
 
     while i < len(text):
         c = text[i]
@@ -140,9 +179,9 @@ def parse_damage_body(rank: int, text: str) -> str:
 
             # Concatenate all values inside current brackets. To handle e.g.
             # (@spell.level - 1)d4[type] as 1d4 type.
-            roll = round_off(operand_stack.pop())
+            roll = lift(round_off, operand_stack.pop())
             while operand_stack and operand_stack[-1] != "(":
-                roll = round_off(operand_stack.pop()) + roll
+                roll = lift(prepend_roll, operand_stack.pop(), roll)
 
             types = text[i + 1:j].replace(",", " ")
             if types == "bleed":
@@ -154,7 +193,7 @@ def parse_damage_body(rank: int, text: str) -> str:
             i = j + 1
         elif c.isalnum() or c in ['@', '.']:
             tok += c
-        elif c in OPS:
+        elif c in DAMAGE_OPS:
             finish_tok()
             while operator_stack and \
                 precedence(operator_stack[-1]) > precedence(c):
@@ -169,55 +208,89 @@ def parse_damage_body(rank: int, text: str) -> str:
             while op != "(":
                 process_op(op)
                 op = operator_stack.pop()
-            if operator_stack and operator_stack[-1] in FUNCS:
+            if operator_stack and operator_stack[-1] in DAMAGE_FUNCS:
                 func = operator_stack.pop()
                 if func == "ceil":
-                    val = float(operand_stack.pop())
-                    operand_stack.append(str(math.ceil(val)))
-                if func == "floor":
-                    val = float(operand_stack.pop())
-                    operand_stack.append(str(math.floor(val)))
+                    operand_stack.append(lift(apply_ceil, operand_stack.pop()))
+                elif func == "floor":
+                    operand_stack.append(
+                        lift(apply_floor, operand_stack.pop())
+                    )
                 elif func == "ternary":
                     if_false = operand_stack.pop()
                     if_true = operand_stack.pop()
                     boolval = operand_stack.pop()
-
-                    if boolval == "True":
-                        operand_stack.append(if_true)
-                    else:
-                        operand_stack.append(if_false)
+                    operand_stack.append(
+                        lift(apply_ternary, boolval, if_true, if_false)
+                    )
                 elif func == "gte":
                     rhs = operand_stack.pop()
                     lhs = operand_stack.pop()
-                    operand_stack.append(str(float(lhs) >= float(rhs)))
+                    operand_stack.append(lift(apply_gte, lhs, rhs))
                 elif func == "max":
                     rhs = operand_stack.pop()
                     lhs = operand_stack.pop()
-                    if float(rhs) > float(lhs):
-                        operand_stack.append(rhs)
-                    else:
-                        operand_stack.append(lhs)
+                    operand_stack.append(lift(apply_max, lhs, rhs))
         elif c in [" ", ","]:
             finish_tok()
         else:
             raise Exception("Need to parse damage text: " + text)
         i += 1
 
-    if XML_ROLLS:
-        ret = "<roll>"
-        for (roll, types) in rolls:
-            ret += f'<r dice="{roll}" type="{types}"/>'
-        ret += "</roll>"
-    else:
-        ret = ""
-        for (roll, types) in rolls:
-            if ret:
-                ret += " and "
-            ret += roll + " " + types
+    return tuple(rolls)
 
+def render_rolls(rolls: Iterable[tuple[str, str]]) -> str:
+    ret = "<roll>"
+    for (roll, types) in rolls:
+        ret += f'<r dice="{roll}" type="{types}"/>'
+    ret += "</roll>"
     return ret
 
-def normalise_tag_to_text(rank: int, tag: str) -> str:
+def parse_damage_body(rank: int, text: str) -> str:
+    # Examples:
+    #   @Damage[@item.level[persistent,acid]]
+    #   @Damage[2d8[piercing],2d4[slashing]|options:area-damage]
+    #   @Damage[(1d4+((@item.level)-1))[persistent,electricity]]
+    #   @Damage[(@item.level)d4[persistent,mental]]
+    #   @Damage[(2*ceil(@item.rank/2)-1)[bleed]]
+    # This function accepts the body of the tag.
+    # @item.level and @item.rank are the rank the spell is cast at.
+    rolls = compile_damage_body(text)
+    return render_rolls((evaluate(r, rank), types) for r, types in rolls)
+
+# A rendered roll of dice and a flat bonus, e.g. 2d6 or 1d4 + 1.
+DICE = re.compile(r"(\d+)d(\d+)(?: ([+-]) (\d+))?")
+
+def roll_dice(roll: str) -> tuple[int, int, int] | None:
+    """(count, die, bonus) of a rendered roll, with no dice for a flat
+    amount, e.g. (2, 6, 0) of 2d6 and (0, 0, 3) of 3, or None if it's any
+    other expression."""
+
+    match = DICE.fullmatch(roll)
+    if match is not None:
+        count, die, sign, bonus = match.groups()
+        bonus = int(bonus or 0) * (-1 if sign == "-" else 1)
+        return int(count), int(die), bonus
+    try:
+        return 0, 0, int(roll)
+    except ValueError:
+        return None
+
+def damage_values(rolls: Iterable[tuple[str, str]]) -> list[dict[str, Any]]:
+    """Rendered rolls as values rather than the markup render_rolls makes
+    of them, e.g. [{"roll": "2d6", "dice": (2, 6, 0), "types": ["fire"]}].
+    """
+
+    return [
+        {"roll": roll, "dice": roll_dice(roll), "types": types.split()}
+        for roll, types in rolls
+    ]
+
+# A part of a compiled description: either literal text, or the body of a
+# @Damage tag and its compiled rolls, which are rendered at a rank.
+Part = str | tuple[str, tuple[tuple[Operand, str], ...]]
+
+def compile_tag(tag: str) -> Part:
     [tagname, body] = tag.split("[", 1)
     body = strip_trailing_brackets(body, 1)
     if tagname == "UUID":
@@ -226,10 +299,11 @@ def normalise_tag_to_text(rank: int, tag: str) -> str:
         return body.rsplit(".", 1)[1]
     elif tagname == "Damage":
         try:
-            return parse_damage_body(rank, body) 
+            return (body, compile_damage_body(body))
         except Exception as e:
-            print("Failed to parse damage: " + body)
-            raise e
+            # Left as it's written, rather than lose the rest of the spell.
+            stats.error(f"Failed to parse damage {body}: {e!r}")
+            return body
     elif tagname == "Check":
         # E.g. Check[flat|dc:3], Check[fortitude|against:spell]
         params = parse_tag_body(body)
@@ -274,44 +348,288 @@ def normalise_tag_to_text(rank: int, tag: str) -> str:
     else:
         raise Exception("unknown tag: " + tag)
 
-def parse_description(rank: int, desc: str) -> str:
+def render_part(part: Part, rank: int) -> str:
+    if isinstance(part, str):
+        return part
+    body, rolls = part
+    try:
+        return render_rolls((evaluate(r, rank), types) for r, types in rolls)
+    except Exception as e:
+        stats.error(f"Failed to render damage {body} at rank {rank}: {e!r}")
+        return body
+
+# Characters that matter inside a tag, and inside the {label} after one.
+BRACKET = re.compile(r"[\[\]]")
+LABEL_SPECIAL = re.compile(r"[@{}]")
+
+def tag_end(desc: str, start: int) -> int | None:
+    # End of the tag whose name starts at start, after its brackets balance.
+    depth = 0
+    for match in BRACKET.finditer(desc, start):
+        if match.group() == "[":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return None
+
+def compile_description(desc: str) -> list[Part]:
+    """Parses desc into the literal text and @Damage tags it's made of, so
+    it can be rendered at any rank without being parsed again.
+
+    Text is copied a run at a time between the characters that can start
+    or end a tag or label, so this is linear in the length of desc. A tag
+    may be followed by a {label}, which is added after the tag's text.
+    Unterminated tags and labels are dropped.
+    """
+
     desc = clean_unicode(desc)
-    ret = ""
-    tag = None 
-    tag_body = None
-    tag_just_ended = None
-    for c in desc:
-        if tag is not None:
-            tag += c
-            if c == "]": 
-                if tag.count("[") == tag.count("]"):
-                    text = normalise_tag_to_text(rank, tag)
-                    tag_just_ended = tag
-                    tag = None
-                    ret += text
-        elif c == "@":
-            tag = ""
-        elif c == "{" and tag_just_ended:
-            tag_body = ""
-        elif c == "}" and tag_body and tag_just_ended:
-            ret = ret.removesuffix(tag_just_ended) + tag_body
-            tag_body = None
-            tag_just_ended = None
-        elif tag_body is not None:
-            tag_body += c
+    parts = []
+    text = [] # Literal text since the last @Damage tag.
+    label = None # Text of the label being read, if any.
+    after_tag = False
+    i = 0
+    while i < len(desc):
+        if label is None:
+            if after_tag and desc[i] == "{":
+                label = []
+                i += 1
+                continue
+            if desc[i] != "@":
+                j = desc.find("@", i + 1)
+                if j == -1:
+                    j = len(desc)
+                text.append(desc[i:j])
+                after_tag = False
+                i = j
+                continue
         else:
-            tag_just_ended = None
-            ret += c
+            match = LABEL_SPECIAL.search(desc, i)
+            if match is None:
+                break
+            label.append(desc[i:match.start()])
+            c = match.group()
+            if c == "@":
+                i = match.start()
+            elif c == "{":
+                label = []
+                i = match.end()
+                continue
+            else:
+                if any(label):
+                    text.append("".join(label))
+                    label = None
+                    after_tag = False
+                else:
+                    label.append(c)
+                i = match.end()
+                continue
 
-    return ret
+        # An @ starting a tag, which runs until its brackets balance.
+        i += 1
+        end = tag_end(desc, i)
+        if end is None:
+            break
+        part = compile_tag(desc[i:end])
+        if isinstance(part, str):
+            text.append(part)
+        else:
+            parts.append("".join(text))
+            parts.append(part)
+            text = []
+        after_tag = True
+        i = end
+
+    parts.append("".join(text))
+    return parts
+
+def render_description(parts: list[Part], rank: int) -> str:
+    return "".join(render_part(part, rank) for part in parts)
+
+def parse_description(rank: int, desc: str) -> str:
+    return render_description(compile_description(desc), rank)
+
+def description_damage(parts: list[Part], rank: int) -> list[dict[str, Any]]:
+    # Values of the rolls of every @Damage tag in the description, in order.
+    return damage_values(
+        (evaluate(r, rank), types)
+        for part in parts if not isinstance(part, str)
+        for r, types in part[1]
+    )
+
+def heightened_edits(
+    parts: list[Part],
+    rank: int,
+    ranks: Iterable[int] = range(1, MAX_RANK + 1)
+) -> dict[str, list[tuple[int, int, str]]]:
+    """How the description made of parts changes when heightened from rank
+    to each of ranks, as (start, end, text) edits of the description at
+    rank, with offsets in characters. Ranks it's the same at are left out.
+    """
+
+    base = [render_part(part, rank) for part in parts]
+    slots = []
+    start = 0
+    for part, text in zip(parts, base):
+        if not isinstance(part, str):
+            slots.append((part, start, start + len(text), text))
+        start += len(text)
+
+    edits = {}
+    for heightened in ranks:
+        changes = []
+        for part, start, end, text in slots:
+            new = render_part(part, heightened)
+            if new != text:
+                changes.append((start, end, new))
+        if changes:
+            edits[str(heightened)] = changes
+    return edits
+
+# A term of a roll that's a sum of dice and flat amounts, e.g. 2d8 + 1d6 + 3.
+DICE_TERM = re.compile(r"(\d+)d(\d+)|(\d+)")
+
+def add_dice(roll: str, increment: str, times: int) -> str:
+    """roll with increment added to it times, adding up dice of the same
+    size, e.g. 10d6 of 6d6 plus 2d6 twice. If either isn't a sum of dice and
+    flat amounts, the increments are added as they are."""
 
-def parse_spell_file(path: pathlib.Path) -> dict:
-    with open(path, "r") as f:
-        data = json.load(f)
+    if times <= 0:
+        return roll
+    dice = {}
+    flat = 0
+    for terms in [roll] + [increment] * times:
+        for term in terms.split("+"):
+            match = DICE_TERM.fullmatch(term.strip())
+            if match is None:
+                return " + ".join([roll] + [increment] * times)
+            count, die, amount = match.groups()
+            if amount is not None:
+                flat += int(amount)
+            else:
+                dice[die] = dice.get(die, 0) + int(count)
+    terms = [f"{count}d{die}" for die, count in dice.items()]
+    if flat:
+        terms.append(str(flat))
+    return " + ".join(terms)
+
+def heighten_interval(
+    roll: str,
+    rank: int,
+    interval: int,
+    increment: str,
+    heightened: int
+) -> str:
+    return add_dice(roll, increment, (heightened - rank) // interval)
+
+def heighten_fixed(
+    roll: str,
+    levels: list[tuple[int, str]],
+    heightened: int
+) -> str:
+    for level, formula in reversed(levels):
+        if level <= heightened:
+            return formula
+    return roll
+
+def damage_types(damage: dict) -> frozenset[str]:
+    # Types of the @Damage rolls of a system.damage entry, as compile_tag
+    # gives them. Healing rolls have none.
+    if "damage" not in damage.get("kinds", ["damage"]):
+        return frozenset()
+    return frozenset([damage.get("type"), damage.get("category")]) - {None}
+
+def heightened_damage(
+    system: dict,
+    rank: int
+) -> dict[tuple[str, frozenset[str]], Callable[[int], str]]:
+    """The formula of each system.damage entry at any rank, according to
+    system.heightening, keyed by its formula and types at rank.
+
+    Foundry heightens these entries rather than the @Damage tags in the
+    description, so spells with fixed dice in their text, e.g. 6d6, only
+    heighten through them.
+    """
+
+    heightening = system.get("heightening") or {}
+    formulas = {}
+    for id, damage in (system.get("damage") or {}).items():
+        roll = damage.get("formula")
+        if not roll:
+            continue
+        if heightening.get("type") == "interval":
+            increment = (heightening.get("damage") or {}).get(id)
+            if not increment:
+                continue
+            formula = functools.partial(
+                heighten_interval,
+                roll,
+                rank,
+                max(heightening.get("interval") or 1, 1),
+                increment
+            )
+        elif heightening.get("type") == "fixed":
+            levels = sorted(
+                (int(level), entry["damage"][id]["formula"])
+                for level, entry in heightening.get("levels", {}).items()
+                if (entry.get("damage") or {}).get(id, {}).get("formula")
+            )
+            if not levels:
+                continue
+            formula = functools.partial(heighten_fixed, roll, levels)
+        else:
+            continue
+        formulas[(roll, damage_types(damage))] = formula
+    return formulas
+
+def heighten_parts(parts: list[Part], system: dict, rank: int) -> list[Part]:
+    # parts with the rolls of @Damage tags that match a system.damage entry
+    # heightened as it is. Rolls that depend on the rank are left as they are.
+    formulas = heightened_damage(system, rank)
+    if not formulas:
+        return parts
+    heightened = []
+    for part in parts:
+        if not isinstance(part, str):
+            body, rolls = part
+            part = (body, tuple(
+                (
+                    formulas.get((roll, frozenset(types.split())), roll)
+                        if isinstance(roll, str) else roll,
+                    types
+                )
+                for roll, types in rolls
+            ))
+        heightened.append(part)
+    return heightened
+
+def file_name(file: SpellFile) -> str:
+    return file[0] if isinstance(file, tuple) else str(file)
+
+def parse_spell_file(
+    file: SpellFile,
+    heightened: bool = False,
+    structured: bool = False
+) -> dict:
+    # With heightened, the spell's description at each rank above its own
+    # is included, as edits of its description. With structured, so are the
+    # values of its damage rolls.
+    if isinstance(file, tuple):
+        content = file[1]
+    else:
+        with open(file, "rb") as f:
+            content = f.read()
+    data = stats.timed("decode", json.loads, content)
     sys = data["system"]
     rank = sys["level"]["value"]
+    parts = stats.timed(
+        "parse.description",
+        compile_description,
+        sys["description"]["value"]
+    )
 
-    return {
+    spell = {
         "name": clean_unicode(data["name"]),
         "rank": sys["level"]["value"],
         "rarity": sys["traits"]["rarity"],
@@ -320,28 +638,379 @@ def parse_spell_file(path: pathlib.Path) -> dict:
         "time": clean_unicode(sys["time"]["value"]),
         "duration": clean_unicode(sys["duration"]["value"]),
         "sustained": sys["duration"]["sustained"],
-        "description": parse_description(rank, sys["description"]["value"]),
+        "description": stats.timed(
+            "render.description",
+            render_description,
+            parts,
+            rank
+        ),
         "traditions": sys["traits"]["traditions"],
         "traits": sys["traits"]["value"],
         "publication": clean_unicode(sys["publication"]["title"]),
     }
+    if heightened:
+        spell["heightened"] = stats.timed(
+            "render.heightened",
+            heightened_edits,
+            heighten_parts(parts, sys, rank),
+            rank,
+            range(rank + 1, MAX_RANK + 1)
+        )
+    if structured:
+        spell["structured"] = {
+            "damage": stats.timed(
+                "parse.structured",
+                description_damage,
+                parts,
+                rank
+            )
+        }
+    return spell
 
 
-if len(sys.argv) < 2:
-    repo_path = clone_repository()
-else:
-    repo_path = pathlib.Path(sys.argv[1])
+def parse_spell_files(
+    files: list[SpellFile],
+    heightened: bool = False,
+    structured: bool = False
+) -> list[tuple[str, dict | None, str | None]]:
+    # Returns (name, spell, None) or (name, None, traceback) for each file, so
+    # a failure doesn't lose the rest of a chunk parsed in another process.
+    results = []
+    for file in files:
+        try:
+            results.append(
+                (
+                    file_name(file),
+                    stats.timed(
+                        "parse",
+                        parse_spell_file,
+                        file,
+                        heightened,
+                        structured
+                    ),
+                    None
+                )
+            )
+        except Exception as e:
+            error = "".join(traceback.format_exception(e))
+            results.append((file_name(file), None, error))
+    return results
 
-spells = []
-for spell_file in spell_files(repo_path):
-    try:
-        spells.append(parse_spell_file(spell_file))
-    except Exception as e:
-        traceback.print_exception(e)
-        print("Occurred when parsing " + str(spell_file))
-        print()
-spells = list(sorted(spells, key=lambda spell: spell["name"]))
+def parse_batches(
+    batches: Iterable[
+        tuple[list[SpellFile], list[tuple[str, dict | None, str | None]]]
+    ]
+) -> Iterator[tuple[str, dict | None]]:
+    # Takes each batch of files with their results, and yields the path and
+    # spell of each file, with None for the spell of those that failed.
+    for files, batch in batches:
+        for file, (name, spell, error) in zip(files, batch):
+            stats.count("files")
+            if error is None:
+                stats.log("Parsed", spell["name"], level=VERBOSE)
+            else:
+                stats.error(error + "Occurred when parsing " + name)
+            yield file_path(file), spell
+
+def parse_chunk(
+    files: list[SpellFile],
+    heightened: bool = False,
+    structured: bool = False
+) -> tuple[list[tuple[str, dict | None, str | None]], dict]:
+    # Runs in a worker process, so sends its stats back with the results.
+    stats.reset()
+    results = parse_spell_files(files, heightened, structured)
+    return results, stats.snapshot()
+
+def chunked(
+    files: Iterable[SpellFile],
+    size: int
+) -> Iterator[list[SpellFile]]:
+    it = iter(files)
+    while chunk := list(itertools.islice(it, size)):
+        yield chunk
+
+def map_chunks(
+    pool: concurrent.futures.Executor,
+    parse: Callable[[list[SpellFile]], tuple[list, dict]],
+    chunks: Iterable[list[SpellFile]],
+    limit: int
+) -> Iterator[tuple[list[SpellFile], list]]:
+    # Like pool.map, but only takes another chunk once one is done, so no
+    # more than limit are read at a time, and merges the stats of each.
+    pending = collections.deque()
+
+    def finish():
+        chunk, future = pending.popleft()
+        results, snapshot = future.result()
+        stats.merge(snapshot)
+        return chunk, results
+
+    for chunk in chunks:
+        if len(pending) == limit:
+            yield finish()
+        pending.append((chunk, pool.submit(parse, chunk)))
+    while pending:
+        yield finish()
+
+def parse_results(
+    files: Iterable[SpellFile],
+    jobs: int = 1,
+    heightened: bool = False,
+    structured: bool = False
+) -> Iterator[tuple[str, dict | None]]:
+    # Yields the path and spell of each of files in order, as they're
+    # parsed, with None for the spell of those that fail. Files are taken
+    # as they're needed, so a source can read them one at a time.
+    if jobs <= 1:
+        yield from parse_batches(
+            ([f], parse_spell_files([f], heightened, structured))
+            for f in files
+        )
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+        parse = functools.partial(
+            parse_chunk,
+            heightened=heightened,
+            structured=structured
+        )
+        # A few chunks per worker keeps them all busy to the end without
+        # paying for a round trip per file.
+        yield from parse_batches(
+            map_chunks(pool, parse, chunked(files, CHUNK_SIZE), jobs * 4)
+        )
+
+def parse_spells(
+    files: Iterable[SpellFile],
+    jobs: int = 1,
+    heightened: bool = False,
+    structured: bool = False
+) -> Iterator[dict]:
+    # Yields spells in the order of files, as they're parsed.
+    for _, spell in parse_results(files, jobs, heightened, structured):
+        if spell is not None:
+            yield spell
+
+def file_path(file: SpellFile) -> str:
+    # Path of the file within the repository, as the other sources name it.
+    return file[0] if isinstance(file, tuple) else spell_name(file.as_posix())
+
+def spell_names(files: Iterable[SpellFile]) -> dict[str, str | None]:
+    # Name of the spell in each file, without parsing the rest of it.
+    names = {}
+    for file in files:
+        try:
+            names[file_path(file)] = clean_unicode(json.loads(file[1])["name"])
+        except (ValueError, KeyError, TypeError):
+            names[file_path(file)] = None
+    return names
+
+def previous_build(
+    source: GitSource,
+    outfile: str,
+    since: str | None,
+    parser: str,
+    heightened: bool,
+    structured: bool
+) -> tuple[dict[str, tuple[int, int] | None], str] | None:
+    """Where in outfile the record of each file of its previous build lies,
+    by the path of the file, and the revision it was built from, or None if
+    they can't be reused. since overrides the revision in its manifest.
+
+    Without a manifest matching since, which files the records came from is
+    worked out from the names of the spells at since, so an output from
+    before manifests were saved can still be updated.
+    """
+
+    manifest = load_manifest(outfile)
+    if manifest is not None and (
+        manifest.get("parser") != parser
+        or manifest.get("heightened") != heightened
+        or manifest.get("structured", False) != structured
+    ):
+        stats.log(outfile, "was built by another parser or with other "
+            "options")
+        return None
+
+    if since is None:
+        if manifest is None or manifest.get("rev") is None:
+            stats.log("No revision to update", outfile, "from")
+            return None
+        since = manifest["rev"]
+    else:
+        since = GitSource(source.repo, since).commit()
+
+    if manifest is not None and manifest.get("rev") == since:
+        files = manifest["files"]
+    else:
+        files = spell_names(GitSource(source.repo, since).read())
+    previous = previous_records(outfile, files)
+    if previous is None:
+        stats.log(outfile, "doesn't match the spells at", since)
+    return None if previous is None else (previous, since)
+
+def merge_builds(
+    reader: RecordReader,
+    previous: dict[str, tuple[int, int] | None],
+    results: Iterable[tuple[str, dict | None]]
+) -> Iterator[tuple[str, dict | None]]:
+    """Yields the path and spell of each file kept from the previous build,
+    read from reader at its span in previous, and each of results, merged
+    in path order. Both are in path order already, so records are written
+    in the same order as a full build writes them, and are only read from
+    the previous output as they're reached."""
+
+    kept = (
+        (path, None if span is None else reader.read(span))
+        for path, span in previous.items()
+    )
+    return heapq.merge(kept, results, key=lambda result: result[0])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "repo",
+        nargs="?",
+        type=pathlib.Path,
+        help="a checkout, git repository or archive of the pf2e repository "
+            "(default: a clone of it cached in --cache-dir)"
+    )
+    parser.add_argument(
+        "--rev",
+        help="revision of the git repository to read the spells from"
+    )
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--format", choices=FORMATS, default="json")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="also export the output in the compact format"
+    )
+    parser.add_argument(
+        "--heightened",
+        action="store_true",
+        help="include how each spell's description changes at higher ranks"
+    )
+    parser.add_argument(
+        "--structured",
+        action="store_true",
+        help="include the dice of each spell's damage rolls"
+    )
+    parser.add_argument(
+        "--output",
+        default="pf2e_spells.json",
+        help="where to write the spells, with the extension of --format"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only parse the files changed since the revision the output "
+            "was last built from, taking the rest from the output"
+    )
+    parser.add_argument(
+        "--since",
+        metavar="REV",
+        help="with --incremental, the revision the output was built from "
+            "(default: the one saved in its manifest)"
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    outfile = with_format(args.output, args.format)
+    parser_hash = parser_version(__file__)
+    with Run(args, outfile):
+        source = stats.timed(
+            "fetch",
+            open_source,
+            args.repo,
+            args.rev,
+            args.cache_dir
+        )
+
+        previous = None
+        if args.incremental or args.since:
+            if not isinstance(source, GitSource):
+                parser.error("--incremental needs a git repository")
+            previous = stats.timed(
+                "previous",
+                previous_build,
+                source,
+                outfile,
+                args.since,
+                parser_hash,
+                args.heightened,
+                args.structured
+            )
+
+        if previous is None:
+            files = stats.iterate("read", source.read())
+            results = parse_results(
+                files,
+                args.jobs,
+                args.heightened,
+                args.structured
+            )
+            reader = None
+        else:
+            spans, since = previous
+            changes = stats.timed("diff", source.changes, since)
+            stats.log(f"Updating {len(changes)} changed files since {since}")
+            changed = []
+            for status, path in changes:
+                stats.count({
+                    "A": "files.added",
+                    "M": "files.modified",
+                    "D": "files.deleted"
+                }[status])
+                spans.pop(path, None)
+                if status != "D":
+                    changed.append(path)
+            files = stats.iterate("read", source.read_paths(changed))
+            reader = RecordReader(outfile)
+            results = merge_builds(
+                reader,
+                spans,
+                parse_results(
+                    files,
+                    args.jobs,
+                    args.heightened,
+                    args.structured
+                )
+            )
+
+        # The name of the spell in each file, None where it failed.
+        names = {}
+        writer = RecordWriter(outfile, sort_key=lambda s: s["name"])
+        for path, spell in results:
+            names[path] = None if spell is None else spell["name"]
+            if spell is not None:
+                stats.timed("write", writer.write, spell)
+        if reader is not None:
+            reader.close()
+        with stats.stage("write"):
+            writer.close()
+        stats.count("spells", writer.count)
+
+        save_manifest(
+            outfile,
+            source.commit() if isinstance(source, GitSource) else None,
+            parser_hash,
+            args.heightened,
+            args.structured,
+            names
+        )
+
+        with stats.stage("export.filters"):
+            filters.export(outfile)
+        with stats.stage("export.search"):
+            search.export(outfile)
+        if args.compact:
+            with stats.stage("export.compact"):
+                compact.export(outfile)
 
-with open("pf2e_spells.json", "w") as f:
-    json.dump(spells, f, indent=4)
+    stats.log(f"Parsed {writer.count} spells, saved to {outfile}")
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import json
+
+from ..output import RecordReader
+
+# What went into an output file, saved next to it as e.g.
+# spells.json.manifest.json, one per output rather than per name as the json
+# and jsonl outputs of a name are built from different revisions:
+#
+#   {"rev": commit of the repository, "parser": hash of the parser,
+#    "heightened": bool, "structured": bool,
+#    "files": {path: name of its spell, or null}}
+#
+# so that a later build can take the records of the files which haven't
+# changed since rev from the output instead of parsing them again. Files are
+# listed in path order, and a file that failed to parse has no name.
+
+SUFFIX = ".manifest.json"
+
+def manifest_path(outfile: str) -> str:
+    return outfile + SUFFIX
+
+def load_manifest(outfile: str) -> dict | None:
+    try:
+        with open(manifest_path(outfile), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_manifest(
+    outfile: str,
+    rev: str | None,
+    parser: str,
+    heightened: bool,
+    structured: bool,
+    files: dict[str, str | None]
+):
+    manifest = {
+        "rev": rev,
+        "parser": parser,
+        "heightened": heightened,
+        "structured": structured,
+        "files": dict(sorted(files.items()))
+    }
+    with open(manifest_path(outfile), "w") as f:
+        json.dump(manifest, f, indent=4)
+
+def previous_records(
+    outfile: str,
+    files: dict[str, str | None]
+) -> dict[str, tuple[int, int] | None] | None:
+    """Where in outfile the record parsed from each of files lies, given the
+    name of the spell each produced, or None if outfile doesn't match them.
+    Only the names are kept while checking, so the records can be read from
+    outfile one at a time as they're needed.
+
+    Records are written sorted by name, and files with the same name in path
+    order, so sorting the files the same way lines them up with the records.
+    A named file without a record is taken to have failed to parse.
+    """
+
+    named = [(path, name) for path, name in sorted(files.items()) if name]
+    named.sort(key=lambda file: file[1])
+
+    previous = dict.fromkeys(sorted(files))
+    i = 0
+    try:
+        with RecordReader(outfile) as reader:
+            for span in reader.spans():
+                name = reader.read(span).get("name")
+                while i < len(named) and named[i][1] != name:
+                    i += 1
+                if i == len(named):
+                    return None
+                previous[named[i][0]] = span
+                i += 1
+    except (OSError, ValueError):
+        return None
+    return previous
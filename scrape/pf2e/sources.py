@@ -0,0 +1,218 @@
+import os
+import pathlib
+import subprocess
+import tarfile
+import threading
+import zipfile
+from typing import Iterable, Iterator
+
+# Where the spells are kept in the pf2e repository, each in a directory per
+# rank, e.g. packs/spells/rank-3/fireball.json.
+SPELLS_DIR = "packs/spells/"
+
+REPOSITORY = "https://github.com/foundryvtt/pf2e.git"
+CACHE_DIR = os.path.join("out", "cache")
+
+# A spell file, either on disk or its name and contents.
+SpellFile = pathlib.Path | tuple[str, bytes]
+
+def is_spell_file(name: str) -> bool:
+    # Only files directly inside the directories under SPELLS_DIR count.
+    if not name.startswith(SPELLS_DIR):
+        return False
+    return name[len(SPELLS_DIR):].count("/") == 1 and not name.endswith("/")
+
+def spell_name(name: str) -> str | None:
+    # The path of an archive member within the repository, given it may be
+    # under a top level directory, as GitHub's archives are.
+    if not name.startswith(SPELLS_DIR):
+        i = name.find("/" + SPELLS_DIR)
+        if i == -1:
+            return None
+        name = name[i + 1:]
+    return name if is_spell_file(name) else None
+
+class DirectorySource:
+    """Spells in a checkout of the repository, read by the parsers."""
+
+    def __init__(self, repo: pathlib.Path):
+        self.repo = repo
+
+    def read(self) -> Iterator[SpellFile]:
+        spells_dir = self.repo.joinpath(SPELLS_DIR)
+        for entry in sorted(os.listdir(spells_dir)):
+            dir = spells_dir.joinpath(entry)
+            if os.path.isdir(dir):
+                for entry in sorted(os.listdir(dir)):
+                    file = dir.joinpath(entry)
+                    if os.path.isfile(file):
+                        yield file
+
+class GitSource:
+    """Spells at a revision of a git repository, which may be bare, read
+    straight from its object store."""
+
+    def __init__(self, repo: pathlib.Path, rev: str = "HEAD"):
+        self.repo = repo
+        self.rev = rev
+
+    def git(self, *args: str, **kwargs) -> bytes:
+        return subprocess.check_output(
+            ["git", "-C", str(self.repo), *args],
+            **kwargs
+        )
+
+    def commit(self) -> str:
+        return self.git("rev-parse", "--verify", self.rev + "^{commit}") \
+            .decode().strip()
+
+    def blobs(self) -> list[tuple[str, str]]:
+        """(path, object id) of each spell file at the revision."""
+
+        listing = self.git(
+            "ls-tree", "-r", "-z", "--full-tree", self.rev, "--", SPELLS_DIR
+        )
+        blobs = []
+        for entry in listing.split(b"\0"):
+            if not entry:
+                continue
+            meta, path = entry.decode().split("\t", 1)
+            _, kind, oid = meta.split()
+            if kind == "blob" and is_spell_file(path):
+                blobs.append((path, oid))
+        return sorted(blobs)
+
+    def cat(self, oids: Iterable[str]) -> Iterator[bytes]:
+        """Contents of each object, from a single git cat-file process."""
+
+        oids = list(oids)
+        proc = subprocess.Popen(
+            ["git", "-C", str(self.repo), "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE
+        )
+
+        # Requests are written from another thread so neither end of the
+        # pipe can fill up waiting for the other.
+        def request():
+            try:
+                for oid in oids:
+                    proc.stdin.write(oid.encode() + b"\n")
+                proc.stdin.close()
+            except BrokenPipeError:
+                # git was stopped before every object was read.
+                pass
+
+        writer = threading.Thread(target=request, daemon=True)
+        writer.start()
+        try:
+            for oid in oids:
+                header = proc.stdout.readline().split()
+                if len(header) != 3:
+                    raise ValueError(f"Couldn't read {oid} from {self.repo}")
+                content = proc.stdout.read(int(header[2]))
+                proc.stdout.read(1) # Newline after the contents.
+                yield content
+        finally:
+            # Stopped first, as otherwise if not every object was read, git
+            # may be waiting to write the rest and the writer to send more.
+            proc.stdout.close()
+            proc.kill()
+            writer.join()
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            proc.wait()
+
+    def read(self) -> Iterator[SpellFile]:
+        # Only the listing is read up front, and each file as it's reached.
+        blobs = self.blobs()
+        contents = self.cat(oid for _, oid in blobs)
+        for (path, _), content in zip(blobs, contents):
+            yield path, content
+
+    def read_paths(self, paths: list[str]) -> Iterator[SpellFile]:
+        contents = self.cat(f"{self.rev}:{path}" for path in paths)
+        yield from zip(paths, contents)
+
+    def changes(self, since: str) -> list[tuple[str, str]]:
+        """(status, path) of each spell file added (A), modified (M) or
+        deleted (D) between since and the revision."""
+
+        listing = self.git(
+            "diff-tree", "-r", "-z", "--no-renames", "--name-status",
+            since, self.rev, "--", SPELLS_DIR
+        )
+        fields = listing.decode().split("\0")
+        changes = []
+        for status, path in zip(fields[0::2], fields[1::2]):
+            if is_spell_file(path):
+                # A file replaced by e.g. a symlink is a modification.
+                changes.append(("M" if status == "T" else status, path))
+        return sorted(changes, key=lambda change: change[1])
+
+class ArchiveSource:
+    """Spells in a tar or zip archive of the repository."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+
+    def read(self) -> Iterator[SpellFile]:
+        # One member is read at a time. A zip's members are read in path
+        # order, but a tar's in the order they're stored, as going back in a
+        # compressed tar means decompressing it again from the start. Archives
+        # made by git store them in path order anyway.
+        if zipfile.is_zipfile(self.path):
+            with zipfile.ZipFile(self.path) as archive:
+                members = []
+                for info in archive.infolist():
+                    name = spell_name(info.filename)
+                    if name is not None and not info.is_dir():
+                        members.append((name, info))
+                members.sort(key=lambda member: member[0])
+                for name, info in members:
+                    yield name, archive.read(info)
+        else:
+            with tarfile.open(self.path) as archive:
+                for member in archive:
+                    name = spell_name(member.name)
+                    if name is not None and member.isfile():
+                        yield name, archive.extractfile(member).read()
+
+def is_archive(path: pathlib.Path) -> bool:
+    return path.is_file() and \
+        (zipfile.is_zipfile(path) or tarfile.is_tarfile(path))
+
+def fetch_repository(cache_dir: str = CACHE_DIR) -> pathlib.Path:
+    """A bare clone of the pf2e repository in cache_dir, cloned the first
+    time and fetched into after that."""
+
+    repo = pathlib.Path(cache_dir, "pf2e.git")
+    if repo.is_dir():
+        subprocess.check_call([
+            "git", "-C", str(repo), "fetch", "--prune", "--tags", "origin",
+            "+refs/heads/*:refs/heads/*"
+        ])
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        subprocess.check_call(
+            ["git", "clone", "--bare", REPOSITORY, str(repo)]
+        )
+    return repo
+
+def open_source(
+    location: pathlib.Path | None,
+    rev: str | None = None,
+    cache_dir: str = CACHE_DIR
+) -> DirectorySource | GitSource | ArchiveSource:
+    """The spells at location: a checkout, a git repository at rev, or an
+    archive. Without a location, the repository cached in cache_dir."""
+
+    if location is None:
+        return GitSource(fetch_repository(cache_dir), rev or "HEAD")
+    if is_archive(location):
+        return ArchiveSource(location)
+    if rev is not None or not location.joinpath(SPELLS_DIR).is_dir():
+        return GitSource(location, rev or "HEAD")
+    return DirectorySource(location)
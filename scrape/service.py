@@ -0,0 +1,407 @@
+import argparse
+import concurrent.futures
+import http.client
+import http.server
+import json
+import os
+import pathlib
+import socket
+import socketserver
+import threading
+import time
+import traceback
+import urllib.parse
+
+from .fivetools import parse_bestiary, scrape_spells
+from .fivetools.copies import CopyResolver
+from .instrument import NORMAL, QUIET, VERBOSE, stats
+from .pf2e import forgevtt
+
+# Converts source records to the datasets' records on demand, in a pool of
+# worker processes which keep the parsers imported and their caches warm.
+#
+#   POST /spells     5etools spells          -> spells.json records
+#   POST /bestiary   5etools monsters        -> bestiary.json records
+#   POST /pf2e       Foundry pf2e spell items -> pf2e/spells.json records
+#
+# Each takes a JSON array and returns {"records": [...], "errors": [{"index":
+# i, "name": name, "error": traceback}]}, records in the order of the items
+# that parsed. /pf2e takes ?heightened=1 as forgevtt's --heightened, and
+# /spells and /pf2e take ?structured=1 as the scrapers' --structured. Copies
+# in a bestiary batch may only be of other creatures in the same batch.
+#
+#   python -m scrape.service serve [--port 8642 | --socket path]
+#   python -m scrape.service load [--url ... | --socket path] --kind spells
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures")
+
+PORT = 8642
+# Items of a batch are split between the workers in chunks of this many, so
+# a large batch is parsed in parallel while a small one costs one round trip.
+CHUNK = 64
+# Largest request body accepted.
+MAX_BODY = 64 * 1024 * 1024
+
+def failure(index, item, e):
+    return {
+        "index": index,
+        "name": item.get("name") if isinstance(item, dict) else None,
+        "error": "".join(traceback.format_exception(e))
+    }
+
+def parse_spells(items, start, structured=False):
+    records = []
+    errors = []
+    for i, spell in enumerate(items, start):
+        try:
+            records.append(scrape_spells.parse_spell(spell, structured))
+        except Exception as e:
+            errors.append(failure(i, spell, e))
+    return records, errors
+
+def parse_bestiary_batch(items, start):
+    resolver = CopyResolver()
+    resolver.add(
+        None,
+        [c for c in items if isinstance(c, dict) and "name" in c]
+    )
+    records = []
+    errors = []
+    for i, creature in enumerate(items, start):
+        try:
+            resolved = resolver.resolve(creature)
+            records.append(parse_bestiary.parse_creature(resolved))
+        except Exception as e:
+            errors.append(failure(i, creature, e))
+    return records, errors
+
+def parse_pf2e(items, start, heightened=False, structured=False):
+    records = []
+    errors = []
+    for i, item in enumerate(items, start):
+        try:
+            file = (str(i), json.dumps(item).encode())
+            records.append(
+                forgevtt.parse_spell_file(file, heightened, structured)
+            )
+        except Exception as e:
+            errors.append(failure(i, item, e))
+    return records, errors
+
+# kind -> (parser, whether a batch can be split between workers)
+PARSERS = {
+    "spells": (parse_spells, True),
+    "bestiary": (parse_bestiary_batch, False),
+    "pf2e": (parse_pf2e, True)
+}
+
+def parse(kind, items, start=0, **options):
+    # Runs in a worker. start is the index of items[0] in the whole batch.
+    return PARSERS[kind][0](items, start, **options)
+
+def load_fixtures():
+    with open(os.path.join(FIXTURES, "5etools", "spells.json"), "r") as f:
+        spells = json.load(f)["spell"]
+    with open(os.path.join(FIXTURES, "5etools", "bestiary.json"), "r") as f:
+        monsters = json.load(f)["monster"]
+    pf2e = []
+    for path in forgevtt.spell_files(pathlib.Path(FIXTURES, "pf2e")):
+        with open(path, "r") as f:
+            pf2e.append(json.load(f))
+    return {"spells": spells, "bestiary": monsters, "pf2e": pf2e}
+
+def warm():
+    # Initializer of each worker: the parsers are imported by now, so this
+    # only fills their caches, e.g. of compiled damage formulas.
+    stats.verbosity = QUIET
+    try:
+        fixtures = load_fixtures()
+    except OSError:
+        return
+    for kind, items in fixtures.items():
+        parse(kind, items)
+
+def ready(_):
+    time.sleep(0.1)
+    return os.getpid()
+
+class Service:
+    def __init__(self, jobs):
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            jobs,
+            initializer=warm
+        )
+        # Workers start on demand, so give every one of them something to do
+        # before the first request has to wait for them.
+        pids = set(self.pool.map(ready, range(jobs)))
+        stats.log(f"Started {len(pids)} workers")
+
+    def parse(self, kind, items, **options):
+        parser, splits = PARSERS[kind]
+        size = CHUNK if splits else max(1, len(items))
+        futures = [
+            self.pool.submit(parse, kind, items[i:i + size], i, **options)
+            for i in range(0, len(items), size)
+        ]
+        records = []
+        errors = []
+        for future in futures:
+            chunk_records, chunk_errors = future.result()
+            records.extend(chunk_records)
+            errors.extend(chunk_errors)
+        return {"records": records, "errors": errors}
+
+    def close(self):
+        self.pool.shutdown()
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, status, value, close=False):
+        body = json.dumps(value).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if close:
+            # Which also closes it here once the response is sent.
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"kinds": sorted(PARSERS)})
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        kind = url.path.strip("/")
+        # A body left unread would be taken for the next request on the
+        # connection, so the connection is closed after any that is.
+        if kind not in PARSERS:
+            self.send_json(404, {"error": "Not found"}, close=True)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self.send_json(
+                400,
+                {"error": "Invalid Content-Length"},
+                close=True
+            )
+            return
+        if length > MAX_BODY:
+            self.send_json(413, {"error": "Request too large"}, close=True)
+            return
+        try:
+            items = json.loads(self.rfile.read(length))
+            if not isinstance(items, list):
+                raise ValueError("Expected a JSON array")
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        options = {}
+        query = urllib.parse.parse_qs(url.query)
+        if kind == "pf2e":
+            options["heightened"] = query.get("heightened") == ["1"]
+        if kind in ["spells", "pf2e"]:
+            options["structured"] = query.get("structured") == ["1"]
+        start = time.perf_counter()
+        try:
+            result = self.server.service.parse(kind, items, **options)
+        except Exception as e:
+            # Only if a worker died, as the parsers' own errors are returned.
+            stats.error("".join(traceback.format_exception(e)))
+            self.send_json(500, {"error": repr(e)})
+            return
+        stats.log(
+            f"{kind}: {len(items)} items in "
+            f"{(time.perf_counter() - start) * 1000:.1f}ms",
+            level=VERBOSE
+        )
+        self.send_json(200, result)
+
+    def address_string(self):
+        # Clients of a Unix socket have no address.
+        return self.client_address[0] if self.client_address else "local"
+
+    def log_message(self, format, *args):
+        stats.log(format % args, level=VERBOSE)
+
+class TCPHandler(Handler):
+    # The headers and body are written separately, and waiting to send the
+    # body until the headers are acknowledged adds 40ms to every response.
+    disable_nagle_algorithm = True
+
+class TCPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+class UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+def serve(args):
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixServer(args.socket, Handler)
+        where = args.socket
+    else:
+        server = TCPServer((args.host, args.port), TCPHandler)
+        where = f"http://{args.host}:{args.port}"
+    server.service = Service(args.jobs)
+    stats.log("Listening on", where)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+        if args.socket:
+            os.remove(args.socket)
+
+class UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+def connect(args):
+    if args.socket:
+        return UnixConnection(args.socket)
+    url = urllib.parse.urlsplit(args.url)
+    return http.client.HTTPConnection(url.hostname, url.port or 80)
+
+def percentile(values, p):
+    # Of values already sorted.
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+def load(args):
+    """Sends batches of the fixtures from concurrent clients, each over a
+    connection it keeps open, and reports the latency of the requests."""
+
+    items = load_fixtures()[args.kind]
+    batch = (items * (args.batch // len(items) + 1))[:args.batch]
+    body = json.dumps(batch).encode()
+    path = "/" + args.kind
+
+    latencies = []
+    failed = []
+    sent = 0
+    lock = threading.Lock()
+
+    def client():
+        nonlocal sent
+        conn = connect(args)
+        try:
+            while True:
+                with lock:
+                    if sent == args.requests:
+                        return
+                    sent += 1
+                start = time.perf_counter()
+                conn.request("POST", path, body, {
+                    "Content-Type": "application/json"
+                })
+                resp = conn.getresponse()
+                result = json.loads(resp.read())
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if resp.status != 200 or result["errors"]:
+                        failed.append(resp.status)
+        except OSError as e:
+            with lock:
+                failed.append(repr(e))
+        finally:
+            conn.close()
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=client) for _ in range(args.concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    if not latencies:
+        print("No requests succeeded:", failed[0])
+        exit(1)
+    latencies.sort()
+    print(f"{len(latencies)} requests of {args.batch} {args.kind} items "
+        f"from {args.concurrency} clients in {elapsed:.2f}s")
+    print(f"  {len(latencies) / elapsed:,.1f} requests/s, "
+        f"{len(latencies) * args.batch / elapsed:,.0f} items/s")
+    for p in [0.5, 0.9, 0.99]:
+        print(f"  p{p * 100:g} {percentile(latencies, p) * 1000:8.2f}ms")
+    if failed:
+        print(f"{len(failed)} requests failed")
+        exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert source records on demand."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the service")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=PORT)
+    serve_parser.add_argument(
+        "--socket",
+        help="listen on this Unix socket instead of a port"
+    )
+    serve_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="worker processes"
+    )
+    serve_parser.add_argument(
+        "-v", "--verbose",
+        action="store_const",
+        const=VERBOSE,
+        default=NORMAL,
+        dest="verbosity",
+        help="log every request"
+    )
+
+    load_parser = commands.add_parser(
+        "load",
+        help="load test a running service with the fixtures"
+    )
+    load_parser.add_argument("--url", default=f"http://127.0.0.1:{PORT}")
+    load_parser.add_argument("--socket")
+    load_parser.add_argument(
+        "--kind",
+        choices=sorted(PARSERS),
+        default="spells"
+    )
+    load_parser.add_argument(
+        "--batch",
+        type=int,
+        default=50,
+        help="items per request"
+    )
+    load_parser.add_argument("--requests", type=int, default=500)
+    load_parser.add_argument("--concurrency", type=int, default=8)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        stats.verbosity = args.verbosity
+        serve(args)
+    else:
+        load(args)
+
+if __name__ == "__main__":
+    main()
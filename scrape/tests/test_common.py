@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+
+from scrape.fivetools import common
+from scrape.fivetools.bench_sub_tags import collect_strings
+from scrape.fivetools.common import sub_tags, sub_tags_regex
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(os.path.dirname(HERE), "fixtures", "5etools")
+
+@pytest.mark.parametrize("name", ["spells.json", "bestiary.json"])
+def test_matches_regexes_on_fixtures(name):
+    with open(os.path.join(FIXTURES, name), "r") as f:
+        strings = collect_strings(json.load(f), [])
+    tagged = [s for s in strings if "{@" in s]
+    assert tagged
+    for s in tagged:
+        assert sub_tags(s) == sub_tags_regex(s), s
+
+@pytest.fixture
+def fallbacks(monkeypatch):
+    # Strings sub_tags leaves to sub_tags_regex.
+    calls = []
+
+    def spy(string):
+        calls.append(string)
+        return sub_tags_regex(string)
+
+    monkeypatch.setattr(common, "sub_tags_regex", spy)
+    return calls
+
+@pytest.mark.parametrize("string,text", [
+    (
+        "{@atk mw} {@hit 5} to hit. {@h}7 ({@damage 2d6}) slashing damage.",
+        "Melee weapon attack +5 to hit. On hit: 7 (2d6) slashing damage."
+    ),
+    (
+        "{@dc 15} Wisdom, {@recharge 5}, {@recharge}",
+        "DC 15 Wisdom, (recharge 5-6), (recharge on 6)"
+    ),
+    (
+        "{@creature goblin|MM|goblins} and {@creature Lich|MM}",
+        "goblin and Lich"
+    ),
+    (
+        "{@dice 1d6+2|5} and {@condition frightened||scared}",
+        "1d6+2 (5) and frightened"
+    ),
+    ("{@chance 25|a quarter} of the time", "a quarter of the time"),
+    # Nested tags, innermost first.
+    ("{@note see {@spell fireball}}", "see fireball"),
+    ("{@i {@b bold}} text", "bold text"),
+    # The outer tag is rewritten by a pattern after the inner one's, as the
+    # regexes are applied in turn.
+    ("Roll {@dice {@damage 2d6}|7} now", "Roll 2d6 now"),
+    # Lone braces are left as they are.
+    ("a lone { and } and {} here", "a lone { and } and {} here"),
+    ("}{", "}{"),
+    # So are tags never closed, and what's in them.
+    ("an {@spell unclosed", "an {@spell unclosed"),
+    (
+        "{@spell fireball} then {@b never {@i closed}",
+        "fireball then {@b never closed"
+    )
+])
+def test_sub_tags(fallbacks, string, text):
+    assert sub_tags(string) == text
+    assert sub_tags_regex(string) == text
+    assert fallbacks == []
+
+@pytest.mark.parametrize("string,text", [
+    # The first {@chance} pattern can match across braces.
+    ("{@chance 50|half|hover {@b x}} bold", "50% bold"),
+    ("{@chance 50|{@b half}}", "50"),
+    ("{@chance 50} and } later", "50 and } later"),
+    ("{@chance 50|half and never closed", "{@chance 50|half and never closed")
+])
+def test_chance_fallback(fallbacks, string, text):
+    assert sub_tags(string) == text
+    assert fallbacks == [string]
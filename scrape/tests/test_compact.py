@@ -0,0 +1,101 @@
+import os
+import shutil
+
+import pytest
+
+from scrape import compact
+from scrape.output import read_records
+from spells_data import BESTIARY, PF2E_SPELLS, SPELLS, sidecar
+
+@pytest.fixture(params=[SPELLS, BESTIARY, PF2E_SPELLS])
+def dataset(request, tmp_path):
+    # A copy, so the compact form is written next to it rather than the
+    # shipped one.
+    path = tmp_path / os.path.basename(request.param)
+    shutil.copy(request.param, path)
+    return str(path)
+
+def test_round_trip(dataset):
+    compact.export(dataset)
+    with compact.load(dataset) as loaded:
+        records = read_records(dataset)
+        assert len(loaded) == len(records)
+        assert [record.to_dict() for record in loaded] == records
+        # Fields are read without decoding the rest of the record too.
+        assert [record["name"] for record in loaded] == \
+            [record["name"] for record in records]
+
+def test_shares_repeated_strings(dataset):
+    compact.export(dataset)
+    with compact.load(dataset) as loaded:
+        assert "strings" in loaded.kinds.values() or \
+            compact.REFERENCE in bytes(loaded.record_data)
+
+def test_round_trip_references(tmp_path):
+    header = "The {@} can take 3 legendary actions, choosing from below."
+    shared = "A long sentence that every one of the records has."
+    names = ["Lich", "Kraken", "Tarrasque", "Adult Red Dragon", "Solar"] * 4
+    traits = ["Fire", "Cantrip", "Evocation"]
+    records = [
+        {
+            "name": f"{name} {i}",
+            "level": i if i % 4 else None,
+            # More combinations than are worth interning, of few traits.
+            "traits": [t for j, t in enumerate(traits) if i >> j & 1],
+            "legendary": header.replace("{@}", f"{name} {i}"),
+            "entries": [f"Entry {i}", shared],
+            "notes": {"text": shared}
+        }
+        for i, name in enumerate(names)
+    ]
+    del records[3]["level"]
+    data = compact.encode(records)
+    assert b'{"$t":' in data and b'{"$s":' in data
+
+    path = tmp_path / "records.compact"
+    path.write_bytes(data)
+    with compact.CompactDataset(str(path)) as loaded:
+        assert loaded.kinds["traits"] == "strings"
+        assert loaded.kinds["level"] == "int"
+        assert loaded.kinds["notes"] == "value"
+        assert [record.to_dict() for record in loaded] == records
+        assert "level" not in loaded[3]
+
+def test_rejects_reserved_keys():
+    with pytest.raises(ValueError):
+        compact.encode([{"name": "A", "data": {"$s": 1}}])
+
+def test_rejects_a_changed_dataset(dataset):
+    compact.export(dataset)
+    with open(dataset, "ab") as f:
+        f.write(b"\n")
+    assert compact.load(dataset) is None
+
+def test_only_hashes_a_touched_dataset(dataset, monkeypatch):
+    compact.export(dataset)
+    hashed = []
+    file_hash = sidecar.file_hash
+    monkeypatch.setattr(
+        sidecar,
+        "file_hash",
+        lambda path: hashed.append(path) or file_hash(path)
+    )
+    compact.load(dataset).close()
+    assert hashed == []
+
+    # Touched but not changed, so still loaded once it's been hashed.
+    stat = os.stat(dataset)
+    os.utime(dataset, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    compact.load(dataset).close()
+    assert hashed == [dataset]
+
+def test_verify_catches_a_change_keeping_the_stamp(dataset):
+    compact.export(dataset)
+    stat = os.stat(dataset)
+    with open(dataset, "r+b") as f:
+        first = f.read(1)
+        f.seek(0)
+        f.write(b" " if first != b" " else b"\n")
+    os.utime(dataset, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    compact.load(dataset).close()
+    assert compact.load(dataset, verify=True) is None
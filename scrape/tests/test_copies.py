@@ -0,0 +1,201 @@
+import pytest
+
+from scrape.fivetools.copies import CopyError, CopyResolver
+
+def creature(name, source="MM", **props):
+    return {"name": name, "source": source, **props}
+
+def copy(name, base, mod=None, source="MM", base_source="MM", **props):
+    _copy = {"name": base, "source": base_source}
+    if mod is not None:
+        _copy["_mod"] = mod
+    return creature(name, source, _copy=_copy, **props)
+
+GOBLIN = creature(
+    "Goblin",
+    page=166,
+    str=8,
+    dex=14,
+    cr="1/4",
+    speed={"walk": 30},
+    skill={"stealth": "+6"},
+    trait=[{"name": "Nimble Escape", "entries": ["The goblin can flee."]}],
+    action=[
+        {"name": "Scimitar", "entries": ["The goblin hits with a scimitar."]},
+        {"name": "Shortbow", "entries": ["The goblin shoots a shortbow."]}
+    ]
+)
+
+def resolve(*creatures, book="MM"):
+    resolver = CopyResolver()
+    resolver.add(book, creatures)
+    return resolver.resolve(creatures[-1])
+
+def names(entries):
+    return [entry["name"] for entry in entries]
+
+def test_copy_replaces_and_removes_properties():
+    boss = resolve(GOBLIN, copy("Goblin Boss", "Goblin", cr="1", str=None))
+    assert boss["name"] == "Goblin Boss"
+    assert boss["cr"] == "1"
+    assert "str" not in boss
+    assert boss["dex"] == 14
+    # Where the base was published isn't inherited.
+    assert "page" not in boss
+    assert "_copy" not in boss
+    # The base is left as it was.
+    assert GOBLIN["str"] == 8
+
+def test_replace_arr():
+    mod = {"action": {
+        "mode": "replaceArr",
+        "replace": "Scimitar",
+        "items": {"name": "Morningstar", "entries": ["A morningstar."]}
+    }}
+    boss = resolve(GOBLIN, copy("Goblin Boss", "Goblin", mod))
+    assert names(boss["action"]) == ["Morningstar", "Shortbow"]
+
+    missing = dict(mod["action"], replace="Club")
+    with pytest.raises(CopyError, match="No 'Club' in action"):
+        resolve(GOBLIN, copy("Goblin Boss", "Goblin", {"action": missing}))
+
+def test_append_arr():
+    mod = {"trait": {
+        "mode": "appendArr",
+        "items": [{"name": "Redirect Attack", "entries": ["Swap places."]}]
+    }}
+    boss = resolve(GOBLIN, copy("Goblin Boss", "Goblin", mod))
+    assert names(boss["trait"]) == ["Nimble Escape", "Redirect Attack"]
+
+def test_insert_arr():
+    mod = {"action": {
+        "mode": "insertArr",
+        "index": 1,
+        "items": {"name": "Multiattack", "entries": ["Two attacks."]}
+    }}
+    boss = resolve(GOBLIN, copy("Goblin Boss", "Goblin", mod))
+    assert names(boss["action"]) == ["Scimitar", "Multiattack", "Shortbow"]
+
+def test_remove_arr():
+    mod = {"action": {"mode": "removeArr", "names": "Shortbow"}}
+    boss = resolve(GOBLIN, copy("Goblin Boss", "Goblin", mod))
+    assert names(boss["action"]) == ["Scimitar"]
+
+    # Removing every item removes the property.
+    mod = {"trait": {"mode": "removeArr", "names": ["Nimble Escape"]}}
+    boss = resolve(GOBLIN, copy("Goblin Boss", "Goblin", mod))
+    assert "trait" not in boss
+
+def test_replace_txt():
+    mod = {"*": {"mode": "replaceTxt", "replace": "goblin", "with": "boss"}}
+    boss = resolve(GOBLIN, copy("Goblin Boss", "Goblin", mod))
+    assert boss["trait"][0]["entries"] == ["The boss can flee."]
+    assert boss["action"][1]["entries"] == ["The boss shoots a shortbow."]
+    # Names aren't text to replace.
+    assert names(boss["action"]) == ["Scimitar", "Shortbow"]
+
+def test_replace_txt_leaves_tags():
+    base = creature(
+        "Goblin",
+        trait=[{"name": "T", "entries": ["A goblin {@spell goblin ward}."]}]
+    )
+    mod = {"trait": {
+        "mode": "replaceTxt",
+        "replace": "(gob)lin",
+        "with": "$1bo",
+        "flags": "i"
+    }}
+    boss = resolve(base, copy("Goblin Boss", "Goblin", mod))
+    assert boss["trait"][0]["entries"] == ["A gobbo {@spell goblin ward}."]
+
+def test_scalar_prop_modes():
+    mod = {"speed": [
+        {"mode": "scalarAddProp", "prop": "walk", "scalar": 10},
+        {"mode": "scalarMultProp", "prop": "*", "scalar": 1.5, "floor": True}
+    ]}
+    boss = resolve(GOBLIN, copy("Goblin Boss", "Goblin", mod))
+    assert boss["speed"] == {"walk": 60}
+
+def test_root_mods():
+    mod = {"_": [
+        {"mode": "setProp", "prop": "speed.fly", "value": 30},
+        {"mode": "addSkills", "skills": {"athletics": 1}},
+        {"mode": "addSenses", "senses": {"type": "darkvision", "range": 60}}
+    ]}
+    boss = resolve(GOBLIN, copy("Goblin Boss", "Goblin", mod))
+    assert boss["speed"] == {"walk": 30, "fly": 30}
+    assert boss["skill"] == {"stealth": "+6", "athletics": "+1"}
+    assert boss["senses"] == ["darkvision 60 ft."]
+
+def test_unsupported_mode():
+    mod = {"action": {"mode": "shuffleArr"}}
+    with pytest.raises(CopyError, match="Unsupported _mod mode shuffleArr"):
+        resolve(GOBLIN, copy("Goblin Boss", "Goblin", mod))
+
+def test_copy_of_a_copy():
+    boss = copy("Goblin Boss", "Goblin", cr="1")
+    mod = {"*": {"mode": "replaceTxt", "replace": "goblin", "with": "king"}}
+    king = copy("Goblin King", "Goblin Boss", mod, hp={"special": "20"})
+    resolver = CopyResolver()
+    resolver.add("MM", [king, boss, GOBLIN])
+    resolved, errors, books = resolver.resolve_book([king, boss, GOBLIN])
+    assert errors == []
+    assert books == {"MM"}
+    assert [c["name"] for c in resolved] == [
+        "Goblin King", "Goblin Boss", "Goblin"
+    ]
+    assert resolved[0]["cr"] == "1"
+    assert resolved[0]["hp"] == {"special": "20"}
+    assert resolved[0]["trait"][0]["entries"] == ["The king can flee."]
+
+def test_copy_from_another_book():
+    boss = copy("Goblin Boss", "Goblin", source="VGM", cr="1")
+    resolver = CopyResolver()
+    resolver.add("MM", [GOBLIN])
+    resolver.add("VGM", [boss])
+    # Looked up ignoring case, as 5etools does.
+    boss["_copy"]["source"] = "mm"
+    resolved, errors, books = resolver.resolve_book([boss])
+    assert errors == []
+    assert books == {"MM"}
+    assert resolved[0]["dex"] == 14
+    assert resolved[0]["source"] == "VGM"
+
+def test_waiting_on():
+    boss = copy("Goblin Boss", "Goblin", source="VGM")
+    king = copy("Goblin King", "Goblin Boss", base_source="VGM")
+    resolver = CopyResolver()
+    resolver.add("MM", [king])
+    assert resolver.waiting_on([king]) == {("goblin boss", "vgm")}
+    resolver.add("VGM", [boss])
+    # Through the copy it's of, too.
+    assert resolver.waiting_on([king]) == {("goblin", "mm")}
+    resolver.add("MM", [GOBLIN])
+    assert resolver.waiting_on([king, GOBLIN]) == set()
+    assert resolver.resolve(king)["str"] == 8
+
+def test_copy_cycle():
+    a = copy("A", "B")
+    b = copy("B", "C")
+    c = copy("C", "A")
+    resolver = CopyResolver()
+    resolver.add("MM", [a, b, c])
+    resolved, errors, _ = resolver.resolve_book([a, b, c])
+    assert resolved == []
+    assert [name for name, _, _ in errors] == ["A", "B", "C"]
+    assert all("form a cycle" in error for _, _, error in errors)
+
+def test_copy_of_itself():
+    with pytest.raises(CopyError, match="form a cycle"):
+        resolve(copy("Goblin", "Goblin"))
+
+def test_missing_source():
+    boss = copy("Goblin Boss", "Hobgoblin")
+    king = copy("Goblin King", "Goblin Boss")
+    resolver = CopyResolver()
+    resolver.add("MM", [GOBLIN, boss, king])
+    resolved, errors, _ = resolver.resolve_book([GOBLIN, king, boss])
+    assert resolved == [GOBLIN]
+    assert [name for name, _, _ in errors] == ["Goblin King", "Goblin Boss"]
+    assert all("Hobgoblin (MM), which doesn't exist" in error
+        for _, _, error in errors)
@@ -0,0 +1,270 @@
+import functools
+import http.server
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+import pytest
+import requests
+
+from scrape.fivetools import fetch
+from scrape.fivetools.cache import DiskCache
+from scrape.fivetools.fetch import Fetcher
+from scrape.output import read_records
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+FIXTURES = os.path.join(os.path.dirname(HERE), "fixtures", "5etools")
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    """Serves a copy of the fixtures, failing each request for a path with
+    the statuses queued for it first, and logs the status of every
+    response."""
+
+    def do_GET(self):
+        failing = self.server.failing.get(self.path.split("?")[0])
+        if failing:
+            self.send_error(failing.pop(0))
+        else:
+            super().do_GET()
+
+    def log_request(self, code="-", size="-"):
+        self.server.log.append((self.path.split("?")[0], int(code)))
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server(tmp_path):
+    root = tmp_path / "www"
+    shutil.copytree(FIXTURES, root)
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0),
+        functools.partial(Handler, directory=str(root))
+    )
+    server.root = root
+    server.url = f"http://127.0.0.1:{server.server_port}/"
+    server.failing = {}
+    server.log = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def statuses(server):
+    return [status for _, status in server.log]
+
+def change(path, old, new):
+    # Moved forward in time too, as Last-Modified is only to the second.
+    path.write_bytes(path.read_bytes().replace(old, new))
+    mtime = path.stat().st_mtime + 10
+    os.utime(path, (mtime, mtime))
+
+def test_retries_with_backoff(server, monkeypatch):
+    delays = []
+    monkeypatch.setattr(fetch.time, "sleep", delays.append)
+    server.failing["/index.json"] = [503, 502]
+    with Fetcher(workers=1, retries=3, backoff=0.5) as fetcher:
+        index = fetcher.get_json(server.url + "index.json")
+    assert index == {"MM": "bestiary.json"}
+    assert delays == [0.5, 1.0]
+    assert statuses(server) == [503, 502, 200]
+
+def test_gives_up_after_retries(server, monkeypatch):
+    monkeypatch.setattr(fetch.time, "sleep", lambda delay: None)
+    server.failing["/index.json"] = [503] * 4
+    with Fetcher(workers=1, retries=3) as fetcher:
+        with pytest.raises(requests.HTTPError):
+            fetcher.get(server.url + "index.json")
+    assert statuses(server) == [503] * 4
+
+def test_does_not_retry_missing_files(server, monkeypatch):
+    delays = []
+    monkeypatch.setattr(fetch.time, "sleep", delays.append)
+    with Fetcher(workers=1) as fetcher:
+        urls = [server.url + "index.json", server.url + "missing.json"]
+        results = list(fetcher.get_all(urls))
+    assert results[0][2] is None
+    assert isinstance(results[1][2], requests.HTTPError)
+    assert delays == []
+    assert statuses(server) == [200, 404]
+
+def test_revalidates_cached_files(server, tmp_path):
+    url = server.url + "bestiary.json"
+    cache_dir = str(tmp_path / "cache")
+    with Fetcher(cache=DiskCache(cache_dir)) as fetcher:
+        content = fetcher.get(url)
+    with Fetcher(cache=DiskCache(cache_dir)) as fetcher:
+        assert fetcher.get(url) == content
+    assert statuses(server) == [200, 304]
+
+    # Used without asking while it's fresh.
+    with Fetcher(cache=DiskCache(cache_dir, max_age=60)) as fetcher:
+        assert fetcher.get(url) == content
+    assert statuses(server) == [200, 304]
+
+    change(server.root / "bestiary.json", b'"Lich"', b'"Demilich"')
+    with Fetcher(cache=DiskCache(cache_dir)) as fetcher:
+        assert b'"Demilich"' in fetcher.get(url)
+    assert statuses(server) == [200, 304, 200]
+
+def scrape_bestiary(server, cwd, *args):
+    return subprocess.run(
+        [
+            sys.executable, "-m", "scrape.fivetools.scrape_bestiary",
+            "--root-url", server.url, "--cache-dir", str(cwd / "cache"),
+            "--quiet", *args
+        ],
+        cwd=cwd,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        capture_output=True,
+        text=True
+    )
+
+def names(path):
+    return [record["name"] for record in read_records(str(path))]
+
+def test_keeps_books_that_fail_to_fetch(server, tmp_path):
+    work = tmp_path / "work"
+    work.mkdir()
+    assert scrape_bestiary(server, work).returncode == 0
+    creatures = names(work / "out.json")
+    assert len(creatures) == 7
+
+    # Built again from the cached copy.
+    (server.root / "bestiary.json").unlink()
+    assert scrape_bestiary(server, work).returncode == 0
+    assert names(work / "out.json") == creatures
+    with open(work / "out.errors.json", "r") as f:
+        errors = json.load(f)
+    assert [(e["book"], e["name"]) for e in errors] == [("MM", None)]
+    assert "Couldn't fetch" in errors[0]["error"]
+
+    # Kept from the last build.
+    shutil.rmtree(work / "cache")
+    assert scrape_bestiary(server, work).returncode == 0
+    assert names(work / "out.json") == creatures
+
+    # With neither, the run fails rather than write an output without it.
+    shutil.rmtree(work / "cache")
+    os.remove(work / "out.json")
+    result = scrape_bestiary(server, work)
+    assert result.returncode == 1
+    assert "Couldn't fetch MM" in result.stderr
+    assert not (work / "out.json").exists()
+
+def scrape_spells(server, cwd):
+    return subprocess.run(
+        [
+            sys.executable, "-m", "scrape.fivetools.scrape_spells",
+            "--root-url", server.url + "spells/",
+            "--cache-dir", str(cwd / "cache"), "--quiet"
+        ],
+        cwd=cwd,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        capture_output=True,
+        text=True
+    )
+
+def test_keeps_spell_books_that_fail_to_fetch(server, tmp_path):
+    # The spells are served from a directory of their own, as on 5etools.
+    spells = server.root / "spells"
+    spells.mkdir()
+    shutil.move(server.root / "spells.json", spells / "spells.json")
+    (spells / "index.json").write_text(json.dumps({"PHB": "spells.json"}))
+
+    work = tmp_path / "work"
+    work.mkdir()
+    output = work / "out" / "scraped.json"
+    assert scrape_spells(server, work).returncode == 0
+    names_before = names(output)
+    assert len(names_before) == 14
+
+    (spells / "spells.json").unlink()
+    assert scrape_spells(server, work).returncode == 0
+    assert names(output) == names_before
+
+    shutil.rmtree(work / "cache")
+    assert scrape_spells(server, work).returncode == 0
+    assert names(output) == names_before
+
+    shutil.rmtree(work / "cache")
+    os.remove(output)
+    result = scrape_spells(server, work)
+    assert result.returncode == 1
+    assert "Couldn't fetch PHB" in result.stderr
+    assert not output.exists()
+
+def test_formats_keep_separate_manifests(server, tmp_path):
+    work = tmp_path / "work"
+    work.mkdir()
+    assert scrape_bestiary(server, work).returncode == 0
+    change(server.root / "bestiary.json", b'"Lich"', b'"Demilich"')
+    assert scrape_bestiary(server, work, "--format", "jsonl").returncode == 0
+    assert scrape_bestiary(server, work).returncode == 0
+    assert "Demilich" in names(work / "out.jsonl")
+    assert "Demilich" in names(work / "out.json")
+
+def counters(cwd):
+    with open(cwd / "out.stats.json", "r") as f:
+        return json.load(f)["counters"]
+
+def test_reuses_unchanged_books(server, tmp_path):
+    # A second book, so that one can change while the other doesn't.
+    shutil.copy(server.root / "bestiary.json", server.root / "vgm.json")
+    (server.root / "index.json").write_text(
+        json.dumps({"MM": "bestiary.json", "VGM": "vgm.json"})
+    )
+    work = tmp_path / "work"
+    work.mkdir()
+    assert scrape_bestiary(server, work).returncode == 0
+    assert counters(work)["creatures.parsed"] == 14
+    assert "books.reused" not in counters(work)
+
+    change(server.root / "vgm.json", b'"Lich"', b'"Demilich"')
+    assert scrape_bestiary(server, work).returncode == 0
+    # Only the book which changed was parsed again.
+    assert counters(work)["books.reused"] == 1
+    assert counters(work)["creatures.parsed"] == 7
+    creatures = names(work / "out.json")
+
+    full = tmp_path / "full"
+    full.mkdir()
+    assert scrape_bestiary(server, full).returncode == 0
+    assert read_records(str(work / "out.json")) == \
+        read_records(str(full / "out.json"))
+    assert creatures.count("Lich") == 1
+    assert creatures.count("Demilich") == 1
+
+@pytest.mark.parametrize("parse_jobs", ["1", "2"])
+def test_copies_from_later_books(server, tmp_path, parse_jobs):
+    # The first two books copy from the last, one through the other, so
+    # wait for it, and are still written in the order of the index.
+    (server.root / "vgm.json").write_text(json.dumps({"monster": [{
+        "name": "Goblin Chief",
+        "source": "VGM",
+        "_copy": {"name": "Goblin", "source": "MM"}
+    }]}))
+    (server.root / "dmg.json").write_text(json.dumps({"monster": [{
+        "name": "Goblin Chief's Pet",
+        "source": "DMG",
+        "_copy": {"name": "Goblin Chief", "source": "VGM"}
+    }]}))
+    (server.root / "index.json").write_text(json.dumps({
+        "VGM": "vgm.json",
+        "DMG": "dmg.json",
+        "MM": "bestiary.json"
+    }))
+    work = tmp_path / "work"
+    work.mkdir()
+    result = scrape_bestiary(server, work, "--parse-jobs", parse_jobs)
+    assert result.returncode == 0, result.stderr
+    with open(server.root / "bestiary.json", "r") as f:
+        mm = [c["name"] for c in json.load(f)["monster"]]
+    assert names(work / "out.json") == \
+        ["Goblin Chief", "Goblin Chief's Pet"] + mm
+    assert counters(work)["creatures.copies"] == 3
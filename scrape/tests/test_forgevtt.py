@@ -0,0 +1,182 @@
+import json
+import os
+
+import pytest
+
+from scrape.instrument import stats
+from scrape.pf2e.forgevtt import compile_damage_body, parse_damage_body, \
+    parse_spell_file
+from spells_data import heightened_description
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SPELLS = os.path.join(
+    os.path.dirname(HERE), "fixtures", "pf2e", "packs", "spells"
+)
+
+def spell_file(path, **system):
+    # The fixture spell at path, with the given system fields replaced.
+    with open(os.path.join(SPELLS, path), "r") as f:
+        data = json.load(f)
+    data["system"].update(system)
+    return path, json.dumps(data).encode()
+
+def damage_text(spell, rank):
+    description = heightened_description(spell, rank)
+    return description[description.index("dealing"):description.index(" in")]
+
+def test_interval_heightening():
+    spell = parse_spell_file(
+        spell_file("rank-3/lightning-bolt.json"),
+        heightened=True
+    )
+    # 4d12, increased by 1d12 a rank.
+    assert damage_text(spell, 3) == \
+        'dealing <roll><r dice="4d12" type="electricity"/></roll> damage'
+    assert [damage_text(spell, rank) for rank in range(4, 11)] == [
+        f'dealing <roll><r dice="{dice}d12" type="electricity"/></roll> '
+        "damage"
+        for dice in range(5, 12)
+    ]
+
+def test_interval_of_two_ranks():
+    spell = parse_spell_file(
+        spell_file("rank-2/acid-grip.json"),
+        heightened=True
+    )
+    rolls = [
+        [text for _, _, text in spell["heightened"].get(str(rank), [])]
+        for rank in range(3, 7)
+    ]
+    # The initial damage every other rank, and the persistent damage from
+    # its own formula.
+    assert rolls == [
+        ['<roll><r dice="1" type="persistent acid"/></roll>'],
+        [
+            '<roll><r dice="4d8" type="acid"/></roll>',
+            '<roll><r dice="1" type="persistent acid"/></roll>'
+        ],
+        [
+            '<roll><r dice="4d8" type="acid"/></roll>',
+            '<roll><r dice="2" type="persistent acid"/></roll>'
+        ],
+        [
+            '<roll><r dice="6d8" type="acid"/></roll>',
+            '<roll><r dice="2" type="persistent acid"/></roll>'
+        ]
+    ]
+
+def test_fixed_heightening():
+    spell = parse_spell_file(
+        spell_file(
+            "rank-3/lightning-bolt.json",
+            heightening={
+                "type": "fixed",
+                "levels": {
+                    "5": {"damage": {"0": {"formula": "6d12"}}},
+                    "7": {"area": {"type": "line", "value": 240}},
+                    "9": {"damage": {"0": {"formula": "10d12"}}}
+                }
+            }
+        ),
+        heightened=True
+    )
+    assert list(spell["heightened"]) == ["5", "6", "7", "8", "9", "10"]
+    assert [damage_text(spell, rank) for rank in range(3, 11)] == [
+        f'dealing <roll><r dice="{dice}" type="electricity"/></roll> damage'
+        for dice in ["4d12"] * 2 + ["6d12"] * 4 + ["10d12"] * 2
+    ]
+
+def test_heightening_only_matching_damage():
+    # Damage of another type, or another formula, isn't the entry's.
+    for damage in [
+        {"formula": "4d12", "kinds": ["damage"], "type": "fire"},
+        {"formula": "3d12", "kinds": ["damage"], "type": "electricity"}
+    ]:
+        spell = parse_spell_file(
+            spell_file("rank-3/lightning-bolt.json", damage={"0": damage}),
+            heightened=True
+        )
+        assert spell["heightened"] == {}
+
+def test_reports_damage_it_cannot_parse(capsys):
+    stats.reset()
+    spell = parse_spell_file(spell_file(
+        "rank-3/lightning-bolt.json",
+        description={"value": "Deals @Damage[4d12![electricity]] damage, "
+            "or @Damage[ceil(2d6)[fire]] to plants."}
+    ))
+    # The rest of the spell is kept.
+    assert spell["description"] == \
+        "Deals 4d12![electricity] damage, or ceil(2d6)[fire] to plants."
+    assert stats.counters == {"errors": 2}
+    err = capsys.readouterr().err
+    assert "Failed to parse damage 4d12![electricity]" in err
+    assert "Failed to parse damage ceil(2d6)[fire]" in err
+
+def rolls(*rolls):
+    return "<roll>" + "".join(
+        f'<r dice="{dice}" type="{types}"/>' for dice, types in rolls
+    ) + "</roll>"
+
+# What parse_damage_body gave before formulas were compiled, at ranks 1, 3
+# and 5.
+@pytest.mark.parametrize("body,expected", [
+    # Plain formulas.
+    ("6d6[fire]", [rolls(("6d6", "fire"))] * 3),
+    (
+        "2d8[piercing],2d4[slashing]|options:area-damage",
+        [rolls(("2d8", "piercing"), ("2d4", "slashing"))] * 3
+    ),
+    # Arithmetic on the rank.
+    (
+        "(@item.level*2)d6[fire]",
+        [rolls((f"{n}d6", "fire")) for n in [2, 6, 10]]
+    ),
+    (
+        "(1d4+((@item.level)-1))[persistent,electricity]",
+        [
+            rolls((dice, "persistent electricity"))
+            for dice in ["1d4", "1d4 + 2", "1d4 + 4"]
+        ]
+    ),
+    (
+        "(@item.level - 1)d4[cold]",
+        [rolls((f"{n}d4", "cold")) for n in [0, 2, 4]]
+    ),
+    # Functions of it.
+    (
+        "(2*ceil(@item.rank/2)-1)[bleed]",
+        [rolls((n, "persistent bleed")) for n in [1, 3, 5]]
+    ),
+    (
+        "(floor(@item.level/2)*3+2)d6[mental]",
+        [rolls((f"{n}d6", "mental")) for n in [2, 5, 8]]
+    ),
+    (
+        "(ceil(@item.level/2)-1)[persistent,acid]",
+        [rolls((n, "persistent acid")) for n in [0, 1, 2]]
+    ),
+    (
+        "max(4,(@item.level))d6[fire]",
+        [rolls((f"{n}d6", "fire")) for n in [4, 4, 5]]
+    ),
+    # Persistent, splash and healing types.
+    ("3[persistent,fire]", [rolls(("3", "persistent fire"))] * 3),
+    (
+        "(@item.level)d6[fire],(@item.level)[splash,fire]",
+        [rolls((f"{n}d6", "fire"), (n, "splash fire")) for n in [1, 3, 5]]
+    ),
+    ("(@item.level*8)[healing]", [rolls((n, "")) for n in [8, 24, 40]])
+])
+def test_damage_body(body, expected):
+    assert [parse_damage_body(rank, body) for rank in [1, 3, 5]] == expected
+
+def test_compiles_each_formula_once():
+    rolls = compile_damage_body("6d6[fire],(@item.level)d4[persistent,fire]")
+    assert compile_damage_body(
+        "6d6[fire],(@item.level)d4[persistent,fire]"
+    ) is rolls
+    # Folded where it doesn't depend on the rank.
+    [(fixed, _), (heightened, _)] = rolls
+    assert fixed == "6d6"
+    assert heightened(7) == "7d4"
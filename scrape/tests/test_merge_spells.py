@@ -0,0 +1,61 @@
+import pytest
+
+from scrape.instrument import stats
+from scrape.merge_spells import merge
+
+def spell(name, *alt_names, source="PHB"):
+    return {"name": name, "alt_names": list(alt_names), "source": source}
+
+@pytest.fixture
+def counters():
+    stats.reset()
+    return stats.counters
+
+def names(spells):
+    return [s["name"] for s in spells]
+
+def test_adds_new_spells(counters, capsys):
+    master = [spell("Fireball")]
+    merged = merge(master, [spell("Haste"), spell("Slow")])
+    assert names(merged) == ["Fireball", "Haste", "Slow"]
+    assert counters == {"spells.added": 2}
+    assert "Adding to master list: Haste" in capsys.readouterr().out
+
+def test_alias_match(counters):
+    master = [spell("Tasha's Hideous Laughter", "Hideous Laughter")]
+    merged = merge(master, [spell("Hideous Laughter", source="SRD")])
+    assert merged == master
+    assert counters == {"spells.matched": 1}
+
+    # Either way round.
+    master = [spell("Hideous Laughter")]
+    merge(master, [spell("Tasha's Hideous Laughter", "Hideous Laughter")])
+    assert names(master) == ["Hideous Laughter"]
+
+def test_normalised_name_match(counters):
+    master = [spell("Tasha's Hideous Laughter"), spell("Magic Missile")]
+    others = [
+        spell("Tasha’s hideous laughter"),
+        spell("MAGIC  missile"),
+        # Not the same spell, however similar.
+        spell("Magic Missiles")
+    ]
+    merged = merge(master, others)
+    assert names(merged) == [
+        "Tasha's Hideous Laughter", "Magic Missile", "Magic Missiles"
+    ]
+    assert counters == {"spells.matched": 2, "spells.added": 1}
+
+def test_reports_conflicts(counters, capsys):
+    master = [spell("Otto's Irresistible Dance"), spell("Irresistible Dance")]
+    others = [spell("Irresistible Dance", "Otto's Irresistible Dance")]
+    merged = merge(master, others)
+    assert names(merged) == ["Otto's Irresistible Dance", "Irresistible Dance"]
+    assert counters == {"errors": 1, "spells.conflicts": 1}
+    assert "Conflict: Irresistible Dance matches Otto's Irresistible " \
+        "Dance, Irresistible Dance" in capsys.readouterr().err
+
+def test_matches_spells_added_before(counters):
+    merged = merge([], [spell("Haste"), spell("haste", source="SRD")])
+    assert names(merged) == ["Haste"]
+    assert counters == {"spells.added": 1, "spells.matched": 1}
@@ -0,0 +1,66 @@
+import json
+import os
+
+import pytest
+
+from scrape.fivetools.parse_bestiary import parse_creatures
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(os.path.dirname(HERE), "fixtures", "5etools")
+
+def goblin(speed):
+    with open(os.path.join(FIXTURES, "bestiary.json"), "r") as f:
+        creatures = json.load(f)["monster"]
+    [creature] = [c for c in creatures if c["name"] == "Goblin"]
+    return dict(creature, speed=speed)
+
+@pytest.mark.parametrize("speed,text", [
+    ({"walk": 30}, "walk 30 ft."),
+    ({"walk": 0, "fly": 30}, "walk 0 ft., fly 30 ft."),
+    (
+        {"walk": 30, "fly": {"number": 60, "condition": "(hover)"}},
+        "walk 30 ft., fly 60 ft. (hover)"
+    ),
+    ({"walk": {"number": 30}}, "walk 30 ft."),
+    ({"walk": 30, "fly": 60, "canHover": True}, "walk 30 ft., fly 60 ft."),
+    (
+        {
+            "walk": 30,
+            "choose": {
+                "from": ["climb", "fly"],
+                "amount": 30,
+                "note": "(in bat form)"
+            }
+        },
+        "walk 30 ft., choose from climb, fly 30 ft. (in bat form)"
+    ),
+    (
+        {"walk": 30, "choose": {"from": ["climb", "swim"], "amount": 30}},
+        "walk 30 ft., choose from climb, swim 30 ft."
+    ),
+    (
+        {
+            "walk": 30,
+            "alternate": {
+                "walk": [{"number": 40, "condition": "(wolf form)"}],
+                "climb": [{"number": 30, "condition": "(spider form)"}]
+            }
+        },
+        "walk 30 ft., walk 40 ft. (wolf form), climb 30 ft. (spider form)"
+    ),
+])
+def test_speeds(speed, text, capsys):
+    records, errors = parse_creatures([goblin(speed)])
+    assert errors == []
+    assert records[0]["speed"] == text
+    assert capsys.readouterr().err == ""
+
+def test_unknown_speed_keeps_the_creature(capsys):
+    records, errors = parse_creatures(
+        [goblin({"walk": 30, "burrow": {"feet": 10}, "fly": 20})]
+    )
+    assert errors == []
+    assert records[0]["speed"] == "walk 30 ft., fly 20 ft."
+    err = capsys.readouterr().err
+    assert "speed burrow of Goblin" in err
+    assert "walk" not in err
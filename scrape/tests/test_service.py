@@ -0,0 +1,120 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from scrape import service
+from scrape.service import Service, TCPHandler, TCPServer
+
+@pytest.fixture(scope="module")
+def server():
+    server = TCPServer(("127.0.0.1", 0), TCPHandler)
+    server.service = Service(1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    server.service.close()
+
+def connect(server):
+    return http.client.HTTPConnection("127.0.0.1", server.server_port)
+
+def post(server, path, body):
+    conn = connect(server)
+    try:
+        conn.request("POST", path, body)
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+def post_items(server, path, items):
+    return post(server, path, json.dumps(items).encode())
+
+@pytest.fixture(scope="module")
+def fixtures():
+    return service.load_fixtures()
+
+BROKEN = {"name": "Broken"}
+
+@pytest.mark.parametrize("kind,copies", [
+    # Enough spells to be split into chunks, with the broken one in the
+    # second.
+    ("spells", 5),
+    ("bestiary", 1),
+    ("pf2e", 1)
+])
+def test_parses_a_batch(server, fixtures, kind, copies):
+    items = fixtures[kind] * copies
+    bad = len(items) - 3
+    items.insert(bad, BROKEN)
+    assert kind != "spells" or bad >= service.CHUNK
+
+    status, result = post_items(server, "/" + kind, items)
+    assert status == 200
+    # Records in the order of the items that parsed.
+    expected = [item["name"] for item in items if item is not BROKEN]
+    assert [record["name"] for record in result["records"]] == expected
+    [error] = result["errors"]
+    assert error["index"] == bad
+    assert error["name"] == "Broken"
+    assert "Traceback" in error["error"]
+
+def test_options(server, fixtures):
+    status, result = post_items(
+        server, "/pf2e?heightened=1&structured=1", fixtures["pf2e"]
+    )
+    assert status == 200
+    assert result["errors"] == []
+    assert all(
+        "heightened" in record and "structured" in record
+        for record in result["records"]
+    )
+
+    status, result = post_items(server, "/pf2e", fixtures["pf2e"][:1])
+    assert "heightened" not in result["records"][0]
+
+def test_not_an_array(server):
+    status, result = post(server, "/spells", b'{"name": "Fireball"}')
+    assert status == 400
+    assert result == {"error": "Expected a JSON array"}
+
+    status, result = post(server, "/spells", b"[{")
+    assert status == 400
+
+def test_unknown_kind(server):
+    status, result = post_items(server, "/wizards", [])
+    assert status == 404
+
+def test_too_large(server):
+    conn = connect(server)
+    try:
+        # Refused from its Content-Length, without reading the body.
+        conn.putrequest("POST", "/spells")
+        conn.putheader("Content-Length", str(service.MAX_BODY + 1))
+        conn.endheaders()
+        resp = conn.getresponse()
+        assert resp.status == 413
+        assert resp.getheader("Connection") == "close"
+        assert json.loads(resp.read()) == {"error": "Request too large"}
+    finally:
+        conn.close()
+
+def test_keeps_the_connection_open(server, fixtures):
+    conn = connect(server)
+    try:
+        for kind in ["spells", "pf2e"]:
+            body = json.dumps(fixtures[kind][:2])
+            conn.request("POST", "/" + kind, body)
+            resp = conn.getresponse()
+            assert resp.status == 200
+            assert len(json.loads(resp.read())["records"]) == 2
+        conn.request("GET", "/health")
+        resp = conn.getresponse()
+        assert json.loads(resp.read()) == {
+            "kinds": ["bestiary", "pf2e", "spells"]
+        }
+    finally:
+        conn.close()
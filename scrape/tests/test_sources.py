@@ -0,0 +1,170 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from scrape.output import read_records
+from scrape.pf2e.sources import ArchiveSource, DirectorySource, GitSource
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+FIXTURES = os.path.join(os.path.dirname(HERE), "fixtures", "pf2e")
+
+FIREBALL = "packs/spells/rank-3/fireball.json"
+SHIELD = "packs/spells/rank-1/shield.json"
+CALM = "packs/spells/rank-2/calm.json"
+
+def git(repo, *args):
+    return subprocess.check_output(
+        [
+            "git", "-C", str(repo), "-c", "user.name=test",
+            "-c", "user.email=test@example.com", *args
+        ],
+        text=True
+    ).strip()
+
+def commit(repo, message):
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", message)
+    return git(repo, "rev-parse", "HEAD")
+
+@pytest.fixture
+def repo(tmp_path):
+    # A throwaway repository with the fixture spells in one commit.
+    repo = tmp_path / "pf2e"
+    shutil.copytree(FIXTURES, repo)
+    git(repo, "init", "-q")
+    commit(repo, "Add spells")
+    return repo
+
+def checkout(repo):
+    # Files of a checkout as other sources give them: (path, contents).
+    return [
+        (file.relative_to(repo).as_posix(), file.read_bytes())
+        for file in DirectorySource(repo).read()
+    ]
+
+def change(repo):
+    """Renames Fireball, adds a copy of it and deletes Shield."""
+
+    fireball = repo / FIREBALL
+    fireball.write_text(
+        fireball.read_text().replace('"Fireball"', '"Fireball II"')
+    )
+    shutil.copy(fireball, repo / CALM.replace("calm", "fireball-ii"))
+    (repo / SHIELD).unlink()
+
+def test_git_source_reads_a_revision(repo, tmp_path):
+    files = checkout(repo)
+    assert len(files) == 11
+    assert list(GitSource(repo).read()) == files
+
+    bare = tmp_path / "pf2e.git"
+    subprocess.check_call(["git", "clone", "-q", "--bare", str(repo), bare])
+    assert list(GitSource(bare).read()) == files
+
+    change(repo)
+    commit(repo, "Change spells")
+    assert list(GitSource(repo, "HEAD~1").read()) == files
+    assert list(GitSource(repo).read()) == checkout(repo)
+
+def test_git_source_changes(repo):
+    since = git(repo, "rev-parse", "HEAD")
+    change(repo)
+    commit(repo, "Change spells")
+    assert GitSource(repo).changes(since) == [
+        ("D", SHIELD),
+        ("A", CALM.replace("calm", "fireball-ii")),
+        ("M", FIREBALL)
+    ]
+    paths = [FIREBALL, CALM]
+    assert list(GitSource(repo).read_paths(paths)) == [
+        (path, (repo / path).read_bytes()) for path in paths
+    ]
+
+def test_git_source_missing_path(repo):
+    # Followed by enough files to fill the pipes both ways, which once made
+    # it hang instead of raising.
+    paths = ["packs/spells/rank-1/missing.json"] + [FIREBALL] * 3000
+    errors = []
+
+    def read():
+        try:
+            list(GitSource(repo).read_paths(paths))
+        except ValueError as e:
+            errors.append(e)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    reader.join(30)
+    assert not reader.is_alive()
+    assert len(errors) == 1
+
+@pytest.mark.parametrize("format", ["tar.gz", "zip"])
+@pytest.mark.parametrize("prefix", ["", "pf2e-master/"])
+def test_archive_source(repo, tmp_path, format, prefix):
+    archive = tmp_path / ("pf2e." + format)
+    git(
+        repo, "archive", "--format", format, "--prefix", prefix,
+        "-o", str(archive), "HEAD"
+    )
+    assert list(ArchiveSource(archive).read()) == checkout(repo)
+
+def forgevtt(cwd, *args):
+    subprocess.check_call(
+        [
+            sys.executable, "-m", "scrape.pf2e.forgevtt", *args,
+            "--cache-dir", str(cwd / "cache"), "--quiet"
+        ],
+        cwd=cwd,
+        env=dict(os.environ, PYTHONPATH=ROOT)
+    )
+    with open(cwd / "stats.json", "r") as f:
+        return json.load(f)["counters"]
+
+@pytest.mark.parametrize("format", ["json", "jsonl"])
+def test_incremental_build_matches_full_build(repo, tmp_path, format):
+    work = tmp_path / "work"
+    work.mkdir()
+    output = work / ("incremental." + format)
+    # --rev so the work tree is read as a git repository.
+    args = ["--rev", "HEAD", "--format", format, "--stats", "stats.json"]
+
+    counters = forgevtt(work, str(repo), "--output", output.name, *args)
+    assert counters["files"] == 11
+    change(repo)
+    commit(repo, "Change spells")
+    counters = forgevtt(
+        work, str(repo), "--output", output.name, "--incremental", *args
+    )
+    # Only what changed was read: Fireball and its copy.
+    assert counters["files"] == 2
+    assert counters["files.deleted"] == 1
+
+    forgevtt(work, str(repo), "--output", "full." + format, *args)
+    records = read_records(str(output))
+    assert records == read_records(str(work / ("full." + format)))
+    names = [record["name"] for record in records]
+    assert "Fireball II" in names
+    assert "Shield" not in names
+
+def test_formats_keep_separate_manifests(repo, tmp_path):
+    work = tmp_path / "work"
+    work.mkdir()
+    args = ["--rev", "HEAD", "--stats", "stats.json"]
+    forgevtt(work, str(repo), "--output", "out.json", *args)
+    # Changed without renaming it, so only the manifest tells it changed.
+    fireball = repo / FIREBALL
+    fireball.write_text(fireball.read_text().replace("roaring", "roiling"))
+    commit(repo, "Change Fireball")
+    forgevtt(
+        work, str(repo), "--output", "out.json", "--format", "jsonl", *args
+    )
+    forgevtt(work, str(repo), "--output", "out.json", "--incremental", *args)
+    records = read_records(str(work / "out.json"))
+    [spell] = [r for r in records if r["name"] == "Fireball"]
+    assert "roiling" in spell["description"]
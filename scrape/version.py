@@ -0,0 +1,11 @@
+import hashlib
+
+def parser_version(*paths):
+    """Hash of the source of the parser, so any change to it invalidates the
+    records previously parsed with it."""
+
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
@@ -0,0 +1,39 @@
+import os
+
+from .pf2e import heightened_description
+from .reader import Dataset
+from .schema import Creature, Pf2eSpell, Pf2eSpellValues, Spell, \
+    SpellValues, Trait
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SPELLS = os.path.join(DATA_DIR, "spells.json")
+BESTIARY = os.path.join(DATA_DIR, "bestiary.json")
+PF2E_SPELLS = os.path.join(DATA_DIR, "pf2e", "spells.json")
+
+def spells() -> Dataset:
+    return Dataset(SPELLS)
+
+def bestiary() -> Dataset:
+    return Dataset(BESTIARY)
+
+def pf2e_spells() -> Dataset:
+    return Dataset(PF2E_SPELLS)
+
+__all__ = [
+    "BESTIARY",
+    "Creature",
+    "DATA_DIR",
+    "Dataset",
+    "PF2E_SPELLS",
+    "Pf2eSpell",
+    "Pf2eSpellValues",
+    "SPELLS",
+    "Spell",
+    "SpellValues",
+    "Trait",
+    "bestiary",
+    "heightened_description",
+    "pf2e_spells",
+    "spells",
+]
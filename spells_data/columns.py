@@ -0,0 +1,164 @@
+import math
+import re
+import zipfile
+from typing import IO, Any, Iterable
+
+import numpy as np
+
+from . import sidecar
+
+# The numeric stats of every creature in a bestiary as NumPy arrays, one per
+# stat with a row per record in the dataset's order, so that encounter math
+# over thousands of creatures is array operations instead of parsing each
+# record's strings again. Written next to a dataset as <name>.columns.npz,
+# with the sha256 of the dataset as "hash".
+#
+# Unknown values are NaN, e.g. the hp of a summon whose hit points depend on
+# its summoner. This is the only module that needs NumPy, and nothing imports
+# it unless asked for columns.
+
+SUFFIX = ".columns.npz"
+
+ABILITIES = ["str", "dex", "con", "int", "wis", "cha"]
+
+# XP awarded for a creature of each challenge rating.
+XP_BY_CR = {
+    0: 10, 0.125: 25, 0.25: 50, 0.5: 100, 1: 200, 2: 450, 3: 700, 4: 1100,
+    5: 1800, 6: 2300, 7: 2900, 8: 3900, 9: 5000, 10: 5900, 11: 7200,
+    12: 8400, 13: 10000, 14: 11500, 15: 13000, 16: 15000, 17: 18000,
+    18: 20000, 19: 22000, 20: 25000, 21: 33000, 22: 41000, 23: 50000,
+    24: 62000, 25: 75000, 26: 90000, 27: 105000, 28: 120000, 29: 135000,
+    30: 155000
+}
+
+LEADING_INT = re.compile(r"\s*(\d+)")
+HP = re.compile(r"(\d+)(?: \((\d+)d(\d+)(?: *([+-]) *(\d+))?\))?")
+
+def parse_cr(cr: Any) -> float:
+    """A challenge rating such as "1/4" or {"cr": "5", "lair": "6"} as a
+    number, or NaN if it's unknown."""
+
+    if isinstance(cr, dict):
+        cr = cr.get("cr")
+    if not isinstance(cr, str):
+        return math.nan
+    num, _, den = cr.partition("/")
+    try:
+        return int(num) / int(den) if den else float(int(num))
+    except (ValueError, ZeroDivisionError):
+        return math.nan
+
+def parse_ac(ac: Any) -> float:
+    # The first AC listed, e.g. 12 of "12; 15 (with mage armor)".
+    match = LEADING_INT.match(ac) if isinstance(ac, str) else None
+    return float(match.group(1)) if match else math.nan
+
+def parse_hp(hp: Any) -> tuple[float, float, float, float]:
+    """(average, dice, die size, bonus) of hit points such as
+    "52 (8d8 + 16)". Hit points that scale, as with "40 + 10 for each spell
+    level above 4th", are unknown."""
+
+    match = HP.fullmatch(hp.strip()) if isinstance(hp, str) else None
+    if match is None:
+        return math.nan, math.nan, math.nan, math.nan
+    average, dice, die, sign, bonus = match.groups()
+    if dice is None:
+        return float(average), math.nan, math.nan, math.nan
+    bonus = int(bonus or 0) * (-1 if sign == "-" else 1)
+    return float(average), float(dice), float(die), float(bonus)
+
+def parse_bonus(bonuses: Any, name: str) -> float:
+    # A save or skill bonus such as "+7", or NaN if it has none.
+    value = bonuses.get(name) if isinstance(bonuses, dict) else None
+    try:
+        return float(int(value))
+    except (TypeError, ValueError):
+        return math.nan
+
+def score(record: dict, ability: str) -> float:
+    value = record.get(ability)
+    return float(value) if isinstance(value, (int, float)) else math.nan
+
+def extract(records: Iterable[dict]) -> dict[str, list[float]]:
+    """The numeric stats of each record, as they're given, in one pass."""
+
+    columns = {
+        name: [] for name in [
+            *ABILITIES, "cr", "ac", "hp", "hp_dice", "hp_die", "hp_bonus",
+            *(f"save_{a}" for a in ABILITIES), "perception"
+        ]
+    }
+    appends = {name: column.append for name, column in columns.items()}
+    hp_columns = [appends[c] for c in ["hp", "hp_dice", "hp_die", "hp_bonus"]]
+    for record in records:
+        for a in ABILITIES:
+            appends[a](score(record, a))
+        appends["cr"](parse_cr(record.get("cr")))
+        appends["ac"](parse_ac(record.get("ac")))
+        for append, value in zip(hp_columns, parse_hp(record.get("hp"))):
+            append(value)
+        saves = record.get("saves")
+        for a in ABILITIES:
+            appends[f"save_{a}"](parse_bonus(saves, a))
+        appends["perception"](parse_bonus(record.get("skills"), "perception"))
+    return columns
+
+def build(records: Iterable[dict]) -> dict[str, np.ndarray]:
+    """Arrays of the stats of records, and of what's derived from them:
+
+        <ability>_mod   ability modifier
+        pb              proficiency bonus, from cr
+        xp              XP for defeating the creature, from cr
+        save_<ability>  saving throw bonus, the modifier if not proficient
+        perception      Perception bonus, the Wisdom modifier if untrained
+        passive_perception
+    """
+
+    columns = {
+        name: np.array(values, dtype=np.float64)
+        for name, values in extract(records).items()
+    }
+
+    for a in ABILITIES:
+        columns[f"{a}_mod"] = np.floor((columns[a] - 10) / 2)
+        save = columns[f"save_{a}"]
+        columns[f"save_{a}"] = np.where(
+            np.isnan(save), columns[f"{a}_mod"], save
+        )
+    perception = columns["perception"]
+    columns["perception"] = np.where(
+        np.isnan(perception), columns["wis_mod"], perception
+    )
+    columns["passive_perception"] = 10 + columns["perception"]
+
+    cr = columns["cr"]
+    columns["pb"] = 2 + np.maximum(np.ceil(cr) - 1, 0) // 4
+
+    # Challenge ratings between those in the table have no XP.
+    crs = np.array(list(XP_BY_CR), dtype=np.float64)
+    xps = np.array(list(XP_BY_CR.values()), dtype=np.float64)
+    i = np.clip(np.searchsorted(crs, cr), 0, len(crs) - 1)
+    columns["xp"] = np.where(crs[i] == cr, xps[i], np.nan)
+    return columns
+
+def write(columns: dict[str, np.ndarray], digest: str, f: IO[bytes]):
+    np.savez(f, hash=np.array(digest), **columns)
+
+def read(f: IO[bytes]) -> tuple[dict[str, np.ndarray], str]:
+    try:
+        with np.load(f) as npz:
+            columns = {name: npz[name] for name in npz.files}
+    except zipfile.BadZipFile as e:
+        raise ValueError(e)
+    return columns, str(columns.pop("hash", ""))
+
+def export(path: str, records: Iterable[dict] | None = None) -> str:
+    """Writes the columns of the bestiary at path next to it."""
+
+    return sidecar.export(path, SUFFIX, build, write, records)
+
+def load(path: str) -> dict[str, np.ndarray] | None:
+    """The columns saved next to the bestiary at path, or None if there are
+    none or they're out of date."""
+
+    return sidecar.load(path, SUFFIX, read)
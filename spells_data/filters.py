@@ -0,0 +1,98 @@
+import json
+from typing import Any, Callable, Iterable
+
+from . import sidecar
+
+# Inverted indexes over the fields datasets are usually filtered by, written
+# next to each dataset as <name>.filters.json:
+#
+#   {"hash": sha256 of the dataset, "schema": ..., "count": records,
+#    "fields": {field: {key: [record positions]}}}
+#
+# where key is the JSON of the normalised value, so that e.g. level 3 and
+# school "evocation" become "3" and "\"evocation\"".
+
+SUFFIX = ".filters.json"
+
+def creature_cr(record: dict) -> list:
+    cr = record.get("cr")
+    if isinstance(cr, dict):
+        cr = cr.get("cr")
+    return [] if cr is None else [cr]
+
+def creature_type(record: dict) -> list:
+    ty = record.get("type")
+    if isinstance(ty, dict):
+        ty = ty.get("type")
+    if isinstance(ty, dict):
+        return ty.get("choose", [])
+    return [] if ty is None else [ty]
+
+def field(name: str) -> Callable[[dict], list]:
+    def values(record: dict) -> list:
+        value = record.get(name)
+        if value is None:
+            return []
+        return value if isinstance(value, list) else [value]
+    return values
+
+# Fields indexed for each schema, and how to get the values of each.
+FIELDS = {
+    "spell": {
+        "level": field("level"),
+        "school": field("school"),
+        "classes": field("classes"),
+        "subclasses": field("subclasses"),
+        "ritual": field("ritual")
+    },
+    "creature": {
+        "cr": creature_cr,
+        "type": creature_type,
+        "size": field("size")
+    },
+    "pf2e_spell": {
+        "rank": field("rank"),
+        "traditions": field("traditions"),
+        "traits": field("traits"),
+        "rarity": field("rarity")
+    }
+}
+
+def schema_of(record: dict) -> str:
+    if "school" in record:
+        return "spell"
+    elif "cr" in record:
+        return "creature"
+    elif "traditions" in record:
+        return "pf2e_spell"
+    raise ValueError("Unknown record schema: " + record.get("name", ""))
+
+def key(value: Any) -> str:
+    if isinstance(value, str):
+        value = " ".join(value.casefold().split())
+    return json.dumps(value)
+
+def build(records: Iterable[dict]) -> dict:
+    schema = None
+    fields = {}
+    count = 0
+    for i, record in enumerate(records):
+        if schema is None:
+            schema = schema_of(record)
+            fields = {name: {} for name in FIELDS[schema]}
+        for name, values in FIELDS[schema].items():
+            for value in values(record):
+                fields[name].setdefault(key(value), []).append(i)
+        count += 1
+    return {"schema": schema, "count": count, "fields": fields}
+
+def export(path: str, records: Iterable[dict] | None = None) -> str:
+    """Writes the filter indexes of the dataset at path next to it."""
+
+    return sidecar.export(path, SUFFIX, build, sidecar.write_json, records)
+
+def load(path: str) -> dict | None:
+    """The filter indexes saved next to the dataset at path, or None if
+    there are none or they're out of date."""
+
+    return sidecar.load(path, SUFFIX, sidecar.read_json)
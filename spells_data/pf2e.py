@@ -0,0 +1,29 @@
+from typing import Iterable
+
+from .schema import Pf2eSpell
+
+def apply_edits(text: str, edits: Iterable[tuple[int, int, str]]) -> str:
+    """text with each (start, end, replacement) edit made, given in order
+    of start and not overlapping."""
+
+    parts = []
+    pos = 0
+    for start, end, replacement in edits:
+        parts.append(text[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts)
+
+def heightened_description(spell: Pf2eSpell, rank: int) -> str:
+    """The description of spell heightened to rank, for spells scraped with
+    forgevtt.py --heightened.
+
+    Only the damage in the description is heightened, both that given by
+    its formula and that Foundry heightens through system.heightening.
+    Anything else the spell gains at a higher rank, such as more targets or
+    a larger area, is only in its "Heightened" entries. Ranks at which the
+    damage doesn't change read as the spell's own."""
+
+    edits = spell.get("heightened", {}).get(str(rank), [])
+    return apply_edits(spell["description"], edits)
@@ -0,0 +1,216 @@
+import json
+import mmap
+import os
+import re
+from typing import Any, Iterable, Iterator
+
+from . import filters, search
+
+# In the indented arrays written by the scrapers every record starts and ends
+# on a line of its own at depth one. JSON strings can't span lines, so these
+# lines can't appear anywhere else.
+INDENTED_RECORD = re.compile(rb"^    \{$.*?^    \}", re.M | re.S)
+LINE = re.compile(rb"^.+$", re.M)
+
+INDEX_SUFFIX = ".index.json"
+
+def lookup_key(name: str) -> str:
+    return " ".join(name.casefold().split())
+
+def record_spans(buf) -> Iterator[tuple[int, int]]:
+    """Yields the (start, end) byte offsets of each record in buf, which is
+    either an array of records or JSON Lines."""
+
+    head = buf[:64].lstrip()
+    if not head.startswith(b"["):
+        for match in LINE.finditer(buf):
+            if match.group().strip():
+                yield match.span()
+        return
+
+    if INDENTED_RECORD.search(buf):
+        for match in INDENTED_RECORD.finditer(buf):
+            yield match.span()
+        return
+
+    # Any other array: decode one record at a time. Offsets into the text
+    # are converted to byte offsets as we go, in case it isn't ASCII.
+    text = buf[:].decode()
+    decoder = json.JSONDecoder()
+    ws = re.compile(r"[\s,]*")
+    i = ws.match(text, text.index("[") + 1).end()
+    pos = len(text[:i].encode())
+    while i < len(text) and text[i] != "]":
+        _, end = decoder.raw_decode(text, i)
+        start = pos
+        pos += len(text[i:end].encode())
+        yield start, pos
+        nxt = ws.match(text, end).end()
+        pos += len(text[end:nxt].encode())
+        i = nxt
+
+class Dataset:
+    """Read only view of one of the datasets, such as spells.json.
+
+    The file is memory mapped and only an index of where each record lies is
+    kept in memory, so a record is decoded only when it's asked for. The
+    index is saved next to the file the first time it's built, and rebuilt
+    whenever the file changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        if os.fstat(self.file.fileno()).st_size:
+            self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.buf = b""
+        self.spans, self.names = self.load_index()
+        self._filters = None
+        self._search = None
+        self._columns = None
+
+    def index_path(self) -> str:
+        return os.path.splitext(self.path)[0] + INDEX_SUFFIX
+
+    def load_index(self) -> tuple[list[list[int]], dict[str, list[int]]]:
+        stat = os.fstat(self.file.fileno())
+        stamp = [stat.st_size, stat.st_mtime_ns]
+
+        try:
+            with open(self.index_path(), "r") as f:
+                index = json.load(f)
+            if index["stamp"] == stamp:
+                return index["spans"], index["names"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        spans = []
+        names = {}
+        for start, end in record_spans(self.buf):
+            record = json.loads(self.buf[start:end])
+            key = lookup_key(record["name"])
+            names.setdefault(key, []).append(len(spans))
+            spans.append([start, end])
+
+        try:
+            tmp = self.index_path() + ".partial"
+            with open(tmp, "w") as f:
+                json.dump({"stamp": stamp, "spans": spans, "names": names}, f)
+            os.replace(tmp, self.index_path())
+        except OSError:
+            # Read only location, the index just won't be reused.
+            pass
+
+        return spans, names
+
+    def record(self, i: int) -> dict[str, Any]:
+        start, end = self.spans[i]
+        return json.loads(self.buf[start:end])
+
+    def get(self, name: str, default: Any = None) -> dict[str, Any] | None:
+        matches = self.names.get(lookup_key(name))
+        return self.record(matches[0]) if matches else default
+
+    def get_all(self, name: str) -> list[dict[str, Any]]:
+        """Every record with name, for names shared by several records, as
+        with creatures from different books."""
+
+        return [self.record(i) for i in self.names.get(lookup_key(name), [])]
+
+    def __getitem__(self, name: str) -> dict[str, Any]:
+        record = self.get(name)
+        if record is None:
+            raise KeyError(name)
+        return record
+
+    def __contains__(self, name: str) -> bool:
+        return lookup_key(name) in self.names
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        for i in range(len(self.spans)):
+            yield self.record(i)
+
+    @property
+    def filters(self) -> dict:
+        """Indexes of the values of the fields records are filtered by, from
+        the file shipped next to the dataset or built on first use."""
+
+        if self._filters is None:
+            self._filters = filters.load(self.path) or filters.build(self)
+        return self._filters
+
+    def find(self, **criteria: Any) -> list[int]:
+        """Positions of the records matching every criterion, each a field
+        and either a value or a list of values any of which may match."""
+
+        indexed = self.filters["fields"]
+        result = None
+        for field, wanted in criteria.items():
+            if field not in indexed:
+                raise ValueError(f"{field} is not an indexed field")
+            if isinstance(wanted, str) or not isinstance(wanted, Iterable):
+                wanted = [wanted]
+
+            matches = set()
+            for value in wanted:
+                matches.update(indexed[field].get(filters.key(value), ()))
+            result = matches if result is None else result & matches
+            if not result:
+                break
+
+        if result is None:
+            return list(range(len(self.spans)))
+        return sorted(result)
+
+    def query(self, **criteria: Any) -> list[dict[str, Any]]:
+        """Records matching criteria, e.g. query(level=3, classes="Wizard")
+        or query(cr="5", type="undead")."""
+
+        return [self.record(i) for i in self.find(**criteria)]
+
+    @property
+    def search_index(self) -> search.SearchIndex:
+        """Full text index of the dataset, from the file shipped next to it
+        or built on first use."""
+
+        if self._search is None:
+            index = search.load(self.path) or search.build(self)
+            self._search = search.SearchIndex(index)
+        return self._search
+
+    def search(
+        self,
+        query: str,
+        limit: int | None = 20
+    ) -> list[tuple[float, dict[str, Any]]]:
+        """(score, record) of the best matches for query, which may quote
+        phrases, e.g. search('"saving throw" fire')."""
+
+        results = self.search_index.search(query)[:limit]
+        return [(score, self.record(i)) for score, i in results]
+
+    @property
+    def columns(self) -> dict:
+        """Numeric stats of every creature as NumPy arrays, e.g. columns["cr"],
+        from the file shipped next to the bestiary or built on first use.
+        Needs NumPy, unlike the rest of the reader."""
+
+        if self._columns is None:
+            from . import columns
+            self._columns = columns.load(self.path) or columns.build(self)
+        return self._columns
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,117 @@
+from typing import Any, NotRequired, TypedDict
+
+# Records as written by the scrapers. Creature fields are as 5etools has them
+# where the parser passes them through unchanged.
+
+# Only with --structured: the fields below as values rather than text. Units
+# and types are 5etools' own, e.g. "bonus" for a bonus action.
+
+class CastTimeValues(TypedDict):
+    amount: int
+    unit: str
+    seconds: int | None # None for actions, bonus actions and reactions.
+    condition: str | None # When a reaction is taken.
+
+class RangeValues(TypedDict):
+    # Of the area around the caster, for spells with a shape.
+    distance: int | None
+    unit: str | None # "feet", "miles", "touch", "self", "sight", ...
+    feet: int | None
+    shape: str | None # "radius", "sphere", "cone", "line", "cube", ...
+
+class ComponentsValues(TypedDict):
+    v: bool
+    s: bool
+    m: bool
+    material: str | None
+    cost: int | None # In copper pieces.
+    consumed: bool | str # Or "optional".
+
+class DurationValues(TypedDict):
+    type: str # "timed", "instant", "permanent" or "special".
+    amount: int | None
+    unit: str | None
+    seconds: int | None
+    concentration: bool
+    ends: list[str] # What ends a permanent spell, e.g. "dispel".
+
+class SpellValues(TypedDict):
+    cast: CastTimeValues
+    range: RangeValues
+    components: ComponentsValues
+    duration: DurationValues
+
+class Spell(TypedDict):
+    # scrape/fivetools/scrape_spells.py parse_spell
+    name: str
+    school: str
+    level: int
+    cast: str
+    range: str
+    components: str
+    duration: str
+    description: str
+    ritual: bool
+    classes: list[str]
+    subclasses: list[str]
+    alt_names: list[str]
+    structured: NotRequired[SpellValues]
+
+class Trait(TypedDict):
+    name: str
+    text: str
+
+class Creature(TypedDict):
+    # scrape/fivetools/parse_bestiary.py parse_json
+    name: str
+    size: str
+    type: str | dict[str, Any]
+    str: int
+    dex: int
+    con: int
+    int: int
+    wis: int
+    cha: int
+    languages: list[str] | None
+    cr: str | dict[str, Any] | None
+    speed: str
+    senses: list[str] | None
+    saves: dict[str, str] | None
+    skills: dict[str, Any] | None
+    ac: str
+    hp: str
+    alignment: str
+    traits: list[Trait]
+    actions: list[Trait]
+    legendary_actions: list[Trait] | None
+
+class DamageRoll(TypedDict):
+    roll: str # As rendered in the description, e.g. "1d4 + 1".
+    # (count, die, bonus), e.g. (0, 0, 3) for a flat 3, or None if the roll
+    # is some other expression.
+    dice: tuple[int, int, int] | None
+    types: list[str] # E.g. ["persistent", "fire"].
+
+class Pf2eSpellValues(TypedDict):
+    # Every damage roll in the description at the spell's rank, in order.
+    damage: list[DamageRoll]
+
+class Pf2eSpell(TypedDict):
+    # scrape/pf2e/forgevtt.py parse_spell_file
+    name: str
+    rank: int
+    rarity: str
+    target: str
+    range: str
+    time: str
+    duration: str
+    sustained: bool
+    description: str
+    traditions: list[str]
+    traits: list[str]
+    publication: str
+    # Only with --heightened: edits (start, end, text) of the damage in
+    # description for each rank above rank at which it differs.
+    heightened: NotRequired[dict[str, list[tuple[int, int, str]]]]
+    # Only with --structured.
+    structured: NotRequired[Pf2eSpellValues]
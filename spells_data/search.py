@@ -0,0 +1,184 @@
+import math
+import re
+from typing import Iterable
+
+from . import sidecar
+from .filters import schema_of
+
+# Full text index over the descriptions of a dataset, written next to it as
+# <name>.search.json:
+#
+#   {"hash": sha256 of the dataset, "lengths": [tokens in each record],
+#    "terms": {stem: [record, n, p1, p2 - p1, ..., pn - pn-1, record, ...]}}
+#
+# where p1..pn are the positions of the stem in the record's text.
+
+SUFFIX = ".search.json"
+
+TAG = re.compile(r"<[^>]*>")
+TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)*")
+PHRASE = re.compile(r'"([^"]*)"')
+
+# Okapi BM25 parameters.
+K1 = 1.2
+B = 0.75
+
+# Longest suffixes first, each with the shortest stem it may leave.
+SUFFIXES = [
+    ("ational", "ate", 3), ("ization", "ize", 3), ("fulness", "ful", 3),
+    ("iveness", "ive", 3), ("ousness", "ous", 3), ("ically", "ic", 3),
+    ("ments", "", 4), ("ement", "", 4), ("ingly", "", 4), ("ation", "ate", 3),
+    ("ness", "", 3), ("ment", "", 4), ("able", "", 4), ("ible", "", 4),
+    ("ally", "al", 3), ("ing", "", 3), ("ies", "y", 2), ("ied", "y", 2),
+    ("ly", "", 4), ("ed", "", 3), ("s", "", 3)
+]
+
+def stem(word: str) -> str:
+    """Light suffix stripping stemmer, so that e.g. "burning", "burns" and
+    "burned" all become "burn" and "save", "saves" and "saving" "sav"."""
+
+    if word.isdigit() or "'" in word:
+        return word.split("'")[0]
+    if word.endswith("ss"):
+        return word
+    for suffix, replacement, min_stem in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+            word = word[:-len(suffix)] + replacement
+            break
+    # A doubled final consonant left by -ing/-ed, as in "hitting", or a
+    # final e which -ing/-ed would have replaced, as in "saving".
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeioulsz":
+        return word[:-1]
+    if len(word) > 3 and word.endswith("e"):
+        return word[:-1]
+    return word
+
+def tokens(text: str) -> list[str]:
+    return [stem(t) for t in TOKEN.findall(TAG.sub(" ", text).lower())]
+
+def record_text(record: dict) -> str:
+    schema = schema_of(record)
+    if schema == "creature":
+        parts = [record["name"]]
+        for key in ["traits", "actions", "legendary_actions"]:
+            for trait in record.get(key) or []:
+                parts.append(trait["name"])
+                parts.append(trait["text"])
+        return "\n".join(parts)
+    return record["name"] + "\n" + record["description"]
+
+def build(records: Iterable[dict]) -> dict:
+    lengths = []
+    terms = {}
+    for i, record in enumerate(records):
+        positions = {}
+        words = tokens(record_text(record))
+        for pos, word in enumerate(words):
+            positions.setdefault(word, []).append(pos)
+        lengths.append(len(words))
+
+        for word, ps in positions.items():
+            postings = terms.setdefault(word, [])
+            postings.append(i)
+            postings.append(len(ps))
+            prev = 0
+            for p in ps:
+                postings.append(p - prev)
+                prev = p
+    return {"lengths": lengths, "terms": terms}
+
+def export(path: str, records: Iterable[dict] | None = None) -> str:
+    """Writes the search index of the dataset at path next to it."""
+
+    return sidecar.export(path, SUFFIX, build, sidecar.write_json, records)
+
+def load(path: str) -> dict | None:
+    return sidecar.load(path, SUFFIX, sidecar.read_json)
+
+class SearchIndex:
+    def __init__(self, index: dict):
+        self.lengths = index["lengths"]
+        self.terms = index["terms"]
+        self.average = sum(self.lengths) / max(1, len(self.lengths))
+        self.decoded = {}
+
+    def postings(self, term: str) -> dict[int, list[int]]:
+        """Positions of term in each record it appears in."""
+
+        if term not in self.decoded:
+            postings = {}
+            flat = self.terms.get(term, [])
+            i = 0
+            while i < len(flat):
+                record, n = flat[i], flat[i + 1]
+                positions = []
+                pos = 0
+                for delta in flat[i + 2:i + 2 + n]:
+                    pos += delta
+                    positions.append(pos)
+                postings[record] = positions
+                i += 2 + n
+            self.decoded[term] = postings
+        return self.decoded[term]
+
+    def phrase(self, words: list[str]) -> dict[int, int]:
+        """Number of times the phrase occurs in each record containing it."""
+
+        postings = [self.postings(w) for w in words]
+        if not postings:
+            return {}
+        candidates = set(postings[0])
+        for p in postings[1:]:
+            candidates &= p.keys()
+
+        counts = {}
+        for record in candidates:
+            starts = set(postings[0][record])
+            for offset, p in enumerate(postings[1:], 1):
+                starts &= {pos - offset for pos in p[record]}
+            if starts:
+                counts[record] = len(starts)
+        return counts
+
+    def score(self, frequency: int, documents: int, record: int) -> float:
+        n = len(self.lengths)
+        idf = math.log(1 + (n - documents + 0.5) / (documents + 0.5))
+        norm = K1 * (1 - B + B * self.lengths[record] / self.average)
+        return idf * frequency * (K1 + 1) / (frequency + norm)
+
+    def search(self, query: str) -> list[tuple[float, int]]:
+        """(score, record) of the records matching query, best first.
+
+        Quoted phrases must all appear in a record for it to match, and are
+        scored as a single term. Other words are optional, and rank records
+        containing more of them higher.
+        """
+
+        phrases = [tokens(p) for p in PHRASE.findall(query)]
+        words = tokens(PHRASE.sub(" ", query))
+
+        scores = {}
+        required = None
+        for phrase in phrases:
+            counts = self.phrase(phrase)
+            if required is None:
+                required = set(counts)
+            else:
+                required &= counts.keys()
+            for record, count in counts.items():
+                scores[record] = scores.get(record, 0) + \
+                    self.score(count, len(counts), record)
+
+        for word in dict.fromkeys(words):
+            postings = self.postings(word)
+            for record, positions in postings.items():
+                if required is None or record in required:
+                    scores[record] = scores.get(record, 0) + \
+                        self.score(len(positions), len(postings), record)
+
+        if required is not None:
+            scores = {r: s for r, s in scores.items() if r in required}
+        return sorted(
+            ((s, r) for r, s in scores.items()),
+            key=lambda sr: (-sr[0], sr[1])
+        )
@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+from typing import IO, Any, Callable, Iterable
+
+# Data derived from a dataset, such as its filter and search indexes, saved
+# next to it as <name><suffix> along with the sha256 of the dataset, so that
+# it's only loaded while the dataset is the one it was built from.
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def sidecar_path(path: str, suffix: str) -> str:
+    return os.path.splitext(path)[0] + suffix
+
+def export(
+    path: str,
+    suffix: str,
+    build: Callable[[Iterable[dict]], Any],
+    write: Callable[[Any, str, IO[bytes]], None],
+    records: Iterable[dict] | None = None
+) -> str:
+    """Builds the sidecar of the dataset at path from its records, which are
+    read from it unless given, and writes it and the dataset's hash with
+    write(data, hash, file). Returns the path written."""
+
+    if records is None:
+        from .reader import Dataset
+        with Dataset(path) as dataset:
+            data = build(dataset)
+    else:
+        data = build(records)
+    out = sidecar_path(path, suffix)
+    with open(out + ".partial", "wb") as f:
+        write(data, file_hash(path), f)
+    os.replace(out + ".partial", out)
+    return out
+
+def load(
+    path: str,
+    suffix: str,
+    read: Callable[[IO[bytes]], tuple[Any, str | None]]
+) -> Any | None:
+    """The sidecar of the dataset at path, given read(file) returning it and
+    the hash it was saved with, or None if there's none or it's out of
+    date."""
+
+    try:
+        with open(sidecar_path(path, suffix), "rb") as f:
+            data, digest = read(f)
+    except (OSError, ValueError):
+        return None
+    if digest != file_hash(path):
+        return None
+    return data
+
+def write_json(data: dict, digest: str, f: IO[bytes]):
+    text = json.dumps({**data, "hash": digest}, separators=(",", ":"))
+    f.write(text.encode())
+
+def read_json(f: IO[bytes]) -> tuple[dict, str | None]:
+    data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    return data, data.get("hash")
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import spells_data
+from spells_data import Dataset, filters
+
+CREATURES = [
+    {"name": "Goblin", "cr": "1/4", "type": {"type": "humanoid",
+        "tags": ["goblinoid"]}, "size": "Small"},
+    {"name": "Wolf", "cr": "1/4", "type": "beast", "size": "Medium"},
+    {"name": "Adult Red Dragon", "cr": {"cr": "17", "lair": "18"},
+        "type": "dragon", "size": "Huge"},
+    {"name": "Shapechanger", "cr": "1",
+        "type": {"type": {"choose": ["beast", "monstrosity"]}},
+        "size": ["Small", "Medium"]},
+    {"name": "Summon", "cr": None, "type": "construct", "size": "Medium"}
+]
+
+SPELLS = [
+    {"name": "Fireball", "school": "Evocation", "level": 3,
+        "classes": ["Sorcerer", "Wizard"], "subclasses": [], "ritual": False},
+    {"name": "Alarm", "school": "Abjuration", "level": 1,
+        "classes": ["Ranger", "Wizard"], "subclasses": [], "ritual": True},
+    {"name": "Counterspell", "school": "Abjuration", "level": 3,
+        "classes": ["Sorcerer", "Warlock", "Wizard"], "subclasses": [],
+        "ritual": False}
+]
+
+def dataset(tmp_path, records):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(records, indent=4))
+    return Dataset(str(path))
+
+def names(records):
+    return [record["name"] for record in records]
+
+def test_creatures(tmp_path):
+    with dataset(tmp_path, CREATURES) as bestiary:
+        assert bestiary.filters["schema"] == "creature"
+        assert names(bestiary.query(cr="1/4")) == ["Goblin", "Wolf"]
+        # The creature's own CR, not that in its lair.
+        assert names(bestiary.query(cr="17")) == ["Adult Red Dragon"]
+        assert bestiary.query(cr="18") == []
+        assert names(bestiary.query(type="Humanoid")) == ["Goblin"]
+        assert names(bestiary.query(type="beast")) == ["Wolf", "Shapechanger"]
+        assert names(bestiary.query(size="medium")) == \
+            ["Wolf", "Shapechanger", "Summon"]
+        assert names(bestiary.query(type="beast", size="Small")) == \
+            ["Shapechanger"]
+
+def test_spells(tmp_path):
+    with dataset(tmp_path, SPELLS) as spells:
+        assert spells.find(level=3) == [0, 2]
+        assert names(spells.query(school="abjuration")) == \
+            ["Alarm", "Counterspell"]
+        assert names(spells.query(ritual=True)) == ["Alarm"]
+        # Any of a list of values matches, and every criterion must.
+        assert names(spells.query(classes=["Ranger", "Warlock"])) == \
+            ["Alarm", "Counterspell"]
+        assert names(spells.query(classes="Wizard", level=[1, 3])) == \
+            ["Fireball", "Alarm", "Counterspell"]
+        assert spells.find(classes="Sorcerer", school="Abjuration") == [2]
+        assert spells.find(classes="Cleric") == []
+        assert spells.find() == [0, 1, 2]
+        with pytest.raises(ValueError):
+            spells.find(range="60 feet")
+
+def test_saved_filters(tmp_path):
+    with dataset(tmp_path, SPELLS) as spells:
+        filters.export(spells.path)
+        saved = filters.load(spells.path)
+        assert saved["fields"] == spells.filters["fields"]
+        assert saved["fields"]["school"]['"evocation"'] == [0]
+
+    # Out of date once the dataset changes.
+    with dataset(tmp_path, SPELLS[:2]) as spells:
+        assert filters.load(spells.path) is None
+        assert spells.find(level=3) == [0]
+
+@pytest.mark.parametrize("open_dataset,criteria", [
+    (spells_data.spells, {"level": 3, "classes": "Wizard"}),
+    (spells_data.bestiary, {"cr": "1/4", "type": "undead"}),
+    (spells_data.pf2e_spells, {"rank": 2, "traditions": "occult"})
+])
+def test_shipped_filters(open_dataset, criteria):
+    # The shipped filters match filtering every record.
+    with open_dataset() as data:
+        assert filters.load(data.path) is not None
+        fields = filters.FIELDS[data.filters["schema"]]
+        expected = [
+            i for i, record in enumerate(data)
+            if all(
+                filters.key(value) in
+                    {filters.key(v) for v in fields[field](record)}
+                for field, value in criteria.items()
+            )
+        ]
+        assert expected
+        assert data.find(**criteria) == expected
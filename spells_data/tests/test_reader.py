@@ -0,0 +1,116 @@
+import json
+import math
+import os
+
+import pytest
+
+import spells_data
+from spells_data import Dataset, reader
+from spells_data.reader import record_spans
+
+RECORDS = [
+    {"name": "Fireball", "school": "Evocation", "level": 3},
+    {"name": "Fire  Bolt", "school": "Evocation", "level": 0},
+    {"name": "Shield", "school": "Abjuration", "level": 1,
+        "description": "Un bouclier d’énergie"},
+    {"name": "fireball", "school": "Evocation", "level": 3, "source": "XGE"}
+]
+
+def write(path, records, style):
+    with open(path, "w") as f:
+        if style == "indented":
+            json.dump(records, f, indent=4)
+        elif style == "jsonl":
+            f.writelines(json.dumps(r) + "\n" for r in records)
+        else:
+            # Neither, so each record has to be decoded to find its end.
+            json.dump(records, f, ensure_ascii=False)
+    return str(path)
+
+@pytest.mark.parametrize("style", ["indented", "jsonl", "inline"])
+def test_record_spans(tmp_path, style):
+    path = write(tmp_path / "spells.json", RECORDS, style)
+    with open(path, "rb") as f:
+        buf = f.read()
+    records = [json.loads(buf[start:end]) for start, end in record_spans(buf)]
+    assert records == RECORDS
+
+@pytest.mark.parametrize("style", ["indented", "jsonl", "inline"])
+def test_dataset(tmp_path, style):
+    path = write(tmp_path / "spells.json", RECORDS, style)
+    with Dataset(path) as dataset:
+        assert len(dataset) == 4
+        assert list(dataset) == RECORDS
+        assert dataset.record(2) == RECORDS[2]
+        # Names are looked up ignoring case and spacing.
+        assert dataset["FIRE bolt"] == RECORDS[1]
+        assert "shield" in dataset
+        assert "Magic Missile" not in dataset
+        assert dataset.get("Magic Missile") is None
+        with pytest.raises(KeyError):
+            dataset["Magic Missile"]
+        assert dataset.get_all("Fireball") == [RECORDS[0], RECORDS[3]]
+
+def test_empty_dataset(tmp_path):
+    path = tmp_path / "spells.json"
+    path.write_text("")
+    with Dataset(str(path)) as dataset:
+        assert len(dataset) == 0
+
+def test_saves_its_index(tmp_path, monkeypatch):
+    path = write(tmp_path / "spells.json", RECORDS, "indented")
+    with Dataset(path) as dataset:
+        spans = dataset.spans
+    assert os.path.isfile(tmp_path / "spells.index.json")
+
+    def rebuild(buf):
+        raise AssertionError("Index rebuilt")
+
+    monkeypatch.setattr(reader, "record_spans", rebuild)
+    with Dataset(path) as dataset:
+        assert dataset.spans == spans
+        assert dataset["Shield"] == RECORDS[2]
+
+def test_rebuilds_a_stale_index(tmp_path):
+    path = write(tmp_path / "spells.json", RECORDS, "indented")
+    Dataset(path).close()
+    changed = RECORDS[:2] + [{"name": "Haste", "level": 3}]
+    write(path, changed, "jsonl")
+    with Dataset(path) as dataset:
+        assert list(dataset) == changed
+        assert dataset["Haste"] == changed[2]
+        assert "Shield" not in dataset
+
+    # Saved again, for the dataset as it is now.
+    with open(tmp_path / "spells.index.json", "r") as f:
+        index = json.load(f)
+    stat = os.stat(path)
+    assert index["stamp"] == [stat.st_size, stat.st_mtime_ns]
+    assert len(index["spans"]) == 3
+
+@pytest.mark.parametrize("open_dataset", [
+    spells_data.spells,
+    spells_data.bestiary,
+    spells_data.pf2e_spells
+])
+def test_shipped_datasets(open_dataset):
+    with open_dataset() as dataset:
+        with open(dataset.path, "r") as f:
+            records = json.load(f)
+        assert list(dataset) == records
+        for record in records[::97]:
+            assert record in dataset.get_all(record["name"])
+
+def test_columns():
+    pytest.importorskip("numpy")
+    with spells_data.bestiary() as bestiary:
+        columns = bestiary.columns
+        assert len(columns["cr"]) == len(bestiary)
+        i = bestiary.names["goblin"][0]
+        goblin = bestiary.record(i)
+        assert columns["cr"][i] == 0.25
+        assert columns["xp"][i] == 50
+        assert columns["dex"][i] == goblin["dex"]
+        assert columns["dex_mod"][i] == (goblin["dex"] - 10) // 2
+        assert columns["pb"][i] == 2
+        assert not math.isnan(columns["hp"][i])
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+import spells_data
+from spells_data import Dataset, search
+from spells_data.search import SearchIndex, stem, tokens
+
+SPELLS = [
+    {"name": "Fireball", "school": "Evocation", "description":
+        "A bright streak flashes to a point you choose, then blossoms into "
+        "an explosion of flame. Each creature in the sphere must make a "
+        "Dexterity saving throw, taking fire damage on a failed save."},
+    {"name": "Burning Hands", "school": "Evocation", "description":
+        "A thin sheet of flames shoots forth. Each creature in the cone "
+        "burns, taking fire damage. The fire ignites burned objects."},
+    {"name": "Shield", "school": "Abjuration", "description":
+        "An invisible barrier of magical force protects you."},
+    {"name": "Fire Bolt", "school": "Evocation", "description":
+        "You hurl a mote of fire. Fire fire."},
+    {"name": "Resistance", "school": "Abjuration", "description":
+        "The target can roll a d4 and add it to one saving throw of its "
+        "choice. It has a <b>throw</b> and a save."}
+]
+
+def index(records):
+    return SearchIndex(search.build(records))
+
+def names(results):
+    return [SPELLS[i]["name"] for _, i in results]
+
+@pytest.mark.parametrize("words,stemmed", [
+    (["burn", "burns", "burning", "burned"], "burn"),
+    (["save", "saves", "saving", "saved"], "sav"),
+    (["hit", "hitting"], "hit"),
+    (["creature's"], "creature"),
+    (["quickly"], "quick"),
+    (["class", "darkness"], None),
+    (["10"], "10")
+])
+def test_stem(words, stemmed):
+    # None for words left as they are.
+    expected = words if stemmed is None else [stemmed] * len(words)
+    assert [stem(word) for word in words] == expected
+
+def test_tokens():
+    assert tokens("<b>Burning</b> hands, 3d6!") == ["burn", "hand", "3d6"]
+
+def test_ranks_by_bm25():
+    spells = index(SPELLS)
+    results = spells.search("fire")
+    # Fire Bolt says it most, in the fewest words.
+    assert names(results) == \
+        ["Fire Bolt", "Burning Hands", "Fireball"]
+    scores = [score for score, _ in results]
+    assert scores == sorted(scores, reverse=True)
+
+    # A rarer word counts for more than a common one.
+    assert names(spells.search("fire barrier"))[0] == "Shield"
+
+def test_stemming_matches_other_forms():
+    assert names(index(SPELLS).search("burning")) == ["Burning Hands"]
+    assert names(index(SPELLS).search("flame")) == \
+        ["Burning Hands", "Fireball"]
+
+def test_phrases():
+    spells = index(SPELLS)
+    # Both words, but only in order next to each other.
+    assert names(spells.search('"saving throw"')) == \
+        ["Resistance", "Fireball"]
+    assert names(spells.search('"throw saving"')) == []
+    # Every phrase must match, and other words only rank what does.
+    assert names(spells.search('"saving throw" fire')) == \
+        ["Fireball", "Resistance"]
+    assert names(spells.search('"saving throw" "fire damage"')) == \
+        ["Fireball"]
+    assert spells.search('"no such phrase"') == []
+    assert spells.search("") == []
+
+def test_saved_index(tmp_path):
+    path = tmp_path / "spells.json"
+    path.write_text(json.dumps(SPELLS, indent=4))
+    search.export(str(path))
+    with Dataset(str(path)) as dataset:
+        assert search.load(dataset.path) is not None
+        results = dataset.search("fire", limit=2)
+        assert [record["name"] for _, record in results] == \
+            ["Fire Bolt", "Burning Hands"]
+
+    path.write_text(json.dumps(SPELLS[:2], indent=4))
+    assert search.load(str(path)) is None
+
+def test_shipped_search():
+    with spells_data.spells() as spells:
+        [(_, fireball)] = spells.search('"bright streak"', limit=None)
+        assert fireball["name"] == "Fireball"
+    with spells_data.bestiary() as bestiary:
+        results = bestiary.search('"breath weapon" fire', limit=10)
+        assert len(results) == 10
+        assert all(
+            "breath weapon" in search.record_text(record).lower()
+            for _, record in results
+        )